@@ -0,0 +1,146 @@
+"""In-memory media assets and the message trigger table.
+
+AssetRegistry reads each registered file once and hands out discord.File
+objects backed by io.BytesIO, so sending a trigger response touches no disk.
+At most every check_interval seconds per asset it stats the file and reloads
+it when the mtime or size changed; a file that disappears stops being sent
+(the same as the old os.path.exists checks) until it comes back.
+
+    media = AssetRegistry()
+    media.register("bark", "bark.png")
+    await channel.send(file=media.file("bark"))   # None if bark.png is missing
+
+TriggerTable compiles every trigger phrase into one regex. match() case-folds
+the message once, scans it once, and returns the triggers it contains in
+table order, so the first entry still wins when a message has several.
+
+    triggers = TriggerTable([Trigger("bark", ("!>bark", "!>bork"), asset="bark")])
+    triggers.match("Good boy !>BARK")   # [Trigger("bark", ...)]
+"""
+import io
+import os
+import re
+import time
+from dataclasses import dataclass
+
+import discord
+
+
+class Asset:
+    __slots__ = ("key", "path", "filename", "data", "mtime", "size", "checked_at")
+
+    def __init__(self, key: str, path: str, filename: str):
+        self.key = key
+        self.path = path
+        self.filename = filename
+        self.data = None
+        self.mtime = None
+        self.size = None
+        self.checked_at = 0.0
+
+
+class AssetRegistry:
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self._assets = {}  # {key: Asset}
+        self.stats = {"loads": 0, "reloads": 0, "sends": 0, "missing": 0}
+
+    def register(self, key: str, path: str, filename: str = None) -> Asset:
+        """Register and load a file; filename is the name it is sent under."""
+        asset = Asset(key, path, filename or os.path.basename(path))
+        self._assets[key] = asset
+        self._refresh(asset, time.monotonic())
+        return asset
+
+    def load_all(self):
+        now = time.monotonic()
+        for asset in self._assets.values():
+            self._refresh(asset, now)
+
+    def _refresh(self, asset: Asset, now: float):
+        asset.checked_at = now
+        try:
+            st = os.stat(asset.path)
+        except OSError:
+            asset.data = asset.mtime = asset.size = None
+            return
+        if asset.data is not None and (st.st_mtime_ns, st.st_size) == (asset.mtime, asset.size):
+            return
+        try:
+            with open(asset.path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print(f"⚠️ Could not load asset {asset.key} ({asset.path}): {e}")
+            return
+        self.stats["reloads" if asset.data is not None else "loads"] += 1
+        asset.data, asset.mtime, asset.size = data, st.st_mtime_ns, st.st_size
+
+    def get(self, key: str):
+        """The Asset with its bytes loaded, or None if unknown or missing on disk."""
+        asset = self._assets.get(key)
+        if asset is None:
+            return None
+        now = time.monotonic()
+        if now - asset.checked_at >= self.check_interval:
+            self._refresh(asset, now)
+        if asset.data is None:
+            self.stats["missing"] += 1
+            return None
+        return asset
+
+    def buffer(self, key: str):
+        asset = self.get(key)
+        return io.BytesIO(asset.data) if asset else None
+
+    def file(self, key: str, filename: str = None):
+        """A discord.File over a fresh BytesIO (Files can't be re-sent), or None."""
+        asset = self.get(key)
+        if asset is None:
+            return None
+        self.stats["sends"] += 1
+        return discord.File(io.BytesIO(asset.data), filename=filename or asset.filename)
+
+    def format_stats(self) -> str:
+        loaded = [a for a in self._assets.values() if a.data is not None]
+        size = sum(a.size for a in loaded)
+        s = self.stats
+        return (
+            f"🖼️ **Assets:** {len(loaded)}/{len(self._assets)} loaded ({size / 1024:.0f} KiB) | "
+            f"sends `{s['sends']}` loads `{s['loads']}` reloads `{s['reloads']}` missing `{s['missing']}`"
+        )
+
+
+# --- Triggers ---
+
+@dataclass(frozen=True)
+class Trigger:
+    name: str
+    phrases: tuple
+    asset: str = None
+    filename: str = None  # Name to send the asset under; defaults to the asset's
+    stage: str = "triggers"
+
+
+class TriggerTable:
+    def __init__(self, triggers):
+        self.triggers = tuple(triggers)
+        self._by_phrase = {}  # {case-folded phrase: index into triggers}
+        for i, trigger in enumerate(self.triggers):
+            for phrase in trigger.phrases:
+                self._by_phrase.setdefault(phrase.casefold(), i)
+        # Longest first; the caller wraps it in a zero-width lookahead so
+        # overlapping phrases ("*click*collar*") are all seen
+        phrases = sorted(self._by_phrase, key=len, reverse=True)
+        self.pattern = "|".join(map(re.escape, phrases))
+        self._regex = re.compile("(?=(" + self.pattern + "))") if phrases else None
+
+    def index(self, phrase: str) -> int:
+        """Table position of the trigger a matched phrase belongs to."""
+        return self._by_phrase[phrase.casefold()]
+
+    def match(self, content: str) -> list:
+        """Triggers whose phrases occur in content, in table order."""
+        if self._regex is None or not content:
+            return []
+        hits = {self._by_phrase[m.group(1)] for m in self._regex.finditer(content.casefold())}
+        return [self.triggers[i] for i in sorted(hits)]
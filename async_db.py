@@ -0,0 +1,274 @@
+"""Off-loop SQLite access: one worker thread per database file.
+
+Jobs for the same file run in submission order on that file's thread, so the
+event loop never blocks on a query or a commit fsync. Workers open their own
+WAL connection and exit after sitting idle; the next job restarts them.
+
+    rows = await shared.db(guild_id).execute("SELECT ...", params)
+    async with shared.db(guild_id).transaction() as tx:
+        tx.execute("UPDATE ...", params)
+    new_balance = await shared.db(guild_id).run_in_transaction(fn)  # fn(conn)
+
+Several handles can share one file's worker: bind(prepare) returns a handle
+whose jobs run prepare(conn) first (the consolidated store uses it to point
+the worker's connection at the job's guild).
+"""
+import time
+import queue
+import sqlite3
+import asyncio
+import threading
+
+WORKER_IDLE_TIMEOUT = 300  # seconds before an idle worker thread exits
+BUSY_TIMEOUT_MS = 10000
+
+
+class AsyncDB:
+    def __init__(self, path: str, name: str = None, connect=None):
+        self.path = path
+        self.name = name or path
+        self._connect = connect        # optional () -> sqlite3.Connection for the worker
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "run_total": 0.0,
+        }
+
+    # --- Worker thread ---
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._worker, name=f"db-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> sqlite3.Connection:
+        if self._connect is not None:
+            return self._connect()
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _fail_queued(self, error: Exception):
+        """Fail every queued job with error and let the next submit() start a fresh worker."""
+        with self._lock:
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    continue
+                _, loop, future, _ = job
+                self.stats["completed"] += 1
+                self.stats["failed"] += 1
+                loop.call_soon_threadsafe(_resolve, future, None, error)
+            self._thread = None
+
+    def _worker(self):
+        try:
+            conn = self._open()
+        except Exception as e:
+            print(f"[AsyncDB] {self.name}: could not open {self.path}: {e}")
+            self._fail_queued(e)
+            return
+        try:
+            while True:
+                try:
+                    job = self._queue.get(timeout=WORKER_IDLE_TIMEOUT)
+                except queue.Empty:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+                    continue
+
+                if job is None:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+                    continue
+
+                fn, loop, future, enqueued_at = job
+                started = time.perf_counter()
+                waited = started - enqueued_at
+                try:
+                    result = fn(conn)
+                    error = None
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    result, error = None, e
+                finished = time.perf_counter()
+
+                with self._lock:
+                    self.stats["completed"] += 1
+                    self.stats["wait_total"] += waited
+                    self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+                    self.stats["run_total"] += finished - started
+                    if error is not None:
+                        self.stats["failed"] += 1
+
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+        finally:
+            conn.close()
+
+    # --- Submission ---
+
+    def submit(self, fn) -> asyncio.Future:
+        """Run fn(conn) on this file's worker thread and return a future for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._queue.put((fn, loop, future, time.perf_counter()))
+            if self._thread is None:
+                self._start()
+        return future
+
+    async def run(self, fn):
+        return await self.submit(fn)
+
+    async def execute(self, sql: str, params=()) -> list:
+        """Execute one statement, commit if it wrote anything, and return all rows."""
+        def job(conn):
+            rows = conn.execute(sql, params).fetchall()
+            if conn.in_transaction:
+                conn.commit()
+            return rows
+        return await self.submit(job)
+
+    async def fetchone(self, sql: str, params=()):
+        def job(conn):
+            return conn.execute(sql, params).fetchone()
+        return await self.submit(job)
+
+    async def executemany(self, sql: str, seq_of_params) -> int:
+        seq_of_params = list(seq_of_params)
+
+        def job(conn):
+            cur = conn.executemany(sql, seq_of_params)
+            conn.commit()
+            return cur.rowcount
+        return await self.submit(job)
+
+    async def run_in_transaction(self, fn):
+        """Run fn(conn) between BEGIN IMMEDIATE and COMMIT; roll back if it raises."""
+        def job(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+        return await self.submit(job)
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def bind(self, prepare):
+        """A handle on this worker whose jobs run prepare(conn) before their own work."""
+        return _BoundAsyncDB(self, prepare)
+
+    # --- Lifecycle / metrics ---
+
+    def stop(self):
+        """Let queued jobs finish, then end the worker thread."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+
+    def join(self, timeout: float = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue_depth()
+        stats["running"] = self._thread is not None
+        completed = stats["completed"]
+        stats["wait_avg"] = stats["wait_total"] / completed if completed else 0.0
+        return stats
+
+
+class _BoundAsyncDB(AsyncDB):
+    """AsyncDB.bind(): same thread, queue and stats, one extra step per job."""
+
+    def __init__(self, worker: AsyncDB, prepare):
+        self.path = worker.path
+        self.name = worker.name
+        self._worker_db = worker
+        self._prepare = prepare
+
+    def submit(self, fn) -> asyncio.Future:
+        prepare = self._prepare
+
+        def job(conn):
+            prepare(conn)
+            return fn(conn)
+        return self._worker_db.submit(job)
+
+    def stop(self):
+        self._worker_db.stop()
+
+    def join(self, timeout: float = None):
+        self._worker_db.join(timeout)
+
+    def queue_depth(self) -> int:
+        return self._worker_db.queue_depth()
+
+    def snapshot(self) -> dict:
+        return self._worker_db.snapshot()
+
+
+class _Transaction:
+    """Collects statements and runs them atomically on the worker when the block exits."""
+
+    def __init__(self, database: AsyncDB):
+        self._db = database
+        self._statements = []
+
+    def execute(self, sql: str, params=()):
+        self._statements.append((sql, params, False))
+
+    def executemany(self, sql: str, seq_of_params):
+        self._statements.append((sql, list(seq_of_params), True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None or not self._statements:
+            return False
+        statements = self._statements
+
+        def apply(conn):
+            for sql, params, many in statements:
+                if many:
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+
+        await self._db.run_in_transaction(apply)
+        return False
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,67 @@
+"""Benchmark every gag style on long messages.
+
+    python bench_gags.py                          # 2,000-character messages
+    python bench_gags.py --chars 500 2000 --messages 500
+
+For every length a seeded stream of chat-like messages (words, punctuation,
+names the CMU dictionary doesn't know, the odd URL) is generated, then each
+style in gag_engine.STYLES is timed over the same messages. Each style is also
+run twice with the same seed to check its output is reproducible.
+"""
+import time
+import random
+import string
+import argparse
+
+import gag_engine
+
+WORDS = (
+    "please let me talk I promise to be good this is not fair you are so mean "
+    "wait what happened to my message why does everything come out muffled"
+).split()
+PUNCTUATION = ("", "", "", ",", ".", "!", "?", "...", "~")
+
+
+def make_message(chars: int, rng: random.Random) -> str:
+    tokens = []
+    length = 0
+    while length < chars:
+        roll = rng.random()
+        if roll < 0.1:
+            word = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 10)))
+        elif roll < 0.12:
+            word = "https://example.com/" + "".join(rng.choice(string.ascii_lowercase) for _ in range(8))
+        else:
+            word = rng.choice(WORDS)
+        word = ("(" if rng.random() < 0.03 else "") + word + rng.choice(PUNCTUATION)
+        tokens.append(word)
+        length += len(word) + 1
+    return " ".join(tokens)[:chars]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every gag style on long messages.")
+    parser.add_argument("--chars", type=int, nargs="+", default=[2000])
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    gag_engine.load_muffled_words()
+    print(f"muffled words ready in {(time.perf_counter() - started) * 1000:.0f}ms\n")
+
+    print(f"{'chars':>7}  {'style':<12}{'us/msg':>10}{'msg/s':>10}{'out chars':>11}")
+    for chars in args.chars:
+        rng = random.Random(chars)
+        messages = [make_message(chars, rng) for _ in range(args.messages)]
+        for name, func in gag_engine.STYLES.items():
+            if func(messages[0], seed=1) != func(messages[0], seed=1):
+                raise SystemExit(f"❌ {name} is not reproducible with a seed")
+            started = time.perf_counter()
+            out = [func(content) for content in messages]
+            per = (time.perf_counter() - started) / len(messages)
+            size = sum(map(len, out)) / len(out)
+            print(f"{chars:>7}  {name:<12}{per * 1e6:>10.1f}{1 / per:>10.0f}{size:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
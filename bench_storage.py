@@ -0,0 +1,161 @@
+"""Benchmark the storage backends in storage.py against each other.
+
+    python bench_storage.py                              # 10, 1000 and 10000 guilds
+    python bench_storage.py --guilds 10 1000 --messages 5000
+
+For every backend and guild count a throwaway data set is built in a temp
+directory, then three things are timed:
+
+    startup      migrate_all() + opening the first guild connection
+    message      the per-message reads and one counter write from on_message,
+                 against random guilds through an LRU of --max-open connections
+                 (the same cap as shared.SERVER_DB_MAX_OPEN)
+    maintenance  prune_command_logs() across every guild
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import storage
+
+USERS_PER_GUILD = 20
+LOGS_PER_GUILD = 50
+
+MESSAGE_READS = (
+    "SELECT type FROM gagged_users WHERE user_id = ?",
+    "SELECT word FROM enforced_words WHERE user_id = ?",
+    "SELECT word FROM banned_words WHERE user_id = ?",
+    "SELECT 1 FROM ignored_users WHERE user_id = ?",
+    "SELECT lines_written FROM active_line_writers WHERE user_id = ?",
+)
+MESSAGE_WRITE = "UPDATE enforcement_offenses SET count = count + 1 WHERE user_id = ?"
+
+
+def _guild_rows(guild_id: int, old: str, new: str) -> dict:
+    users = [guild_id * 1000 + i for i in range(USERS_PER_GUILD)]
+    return {
+        "gagged_users": [(u, "loose", "active") for u in users[::4]],
+        "enforced_words": [(u, "please", 0, 0) for u in users[::2]],
+        "user_wallets": [(u, 1000) for u in users],
+        "enforcement_offenses": [(u, 0) for u in users],
+        "command_logs": [(i, users[i % len(users)], "ping", old if i % 2 else new, "")
+                         for i in range(1, LOGS_PER_GUILD + 1)],
+    }
+
+
+def _insert_sql(table: str, width: int) -> str:
+    return f"INSERT INTO {table} VALUES ({', '.join('?' for _ in range(width))})"
+
+
+def seed(backend, guild_ids: list):
+    old = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    new = datetime.now(timezone.utc).isoformat()
+
+    if isinstance(backend, storage.ConsolidatedStorage):
+        conn = backend._open()
+        shapes = storage.server_table_shapes()
+        with conn:
+            conn.executemany("INSERT INTO storage_guilds (guild_id) VALUES (?)", ((g,) for g in guild_ids))
+            for guild_id in guild_ids:
+                for table, rows in _guild_rows(guild_id, old, new).items():
+                    columns = ", ".join(["guild_id"] + shapes[table].data_columns)
+                    placeholders = ", ".join("?" for _ in range(len(rows[0]) + 1))
+                    conn.executemany(f"INSERT INTO {shapes[table].base} ({columns}) VALUES ({placeholders})",
+                                     ((guild_id, *row) for row in rows))
+        conn.close()
+        return
+
+    for guild_id in guild_ids:
+        conn = backend.connect(guild_id)
+        with conn:
+            for table, rows in _guild_rows(guild_id, old, new).items():
+                conn.executemany(_insert_sql(table, len(rows[0])), rows)
+        conn.close()
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run(backend, guild_ids: list, messages: int, max_open: int) -> dict:
+    result = {}
+
+    started = time.perf_counter()
+    backend.migrate_all()
+    backend.connect(guild_ids[0]).close()
+    result["startup"] = time.perf_counter() - started
+
+    pool = OrderedDict()
+    samples = []
+    misses = 0
+    rng = random.Random(1234)
+    for _ in range(messages):
+        guild_id = rng.choice(guild_ids)
+        user_id = guild_id * 1000 + rng.randrange(USERS_PER_GUILD)
+        started = time.perf_counter()
+
+        conn = pool.get(guild_id)
+        if conn is None:
+            misses += 1
+            conn = pool[guild_id] = backend.connect(guild_id)
+            if len(pool) > max_open:
+                pool.popitem(last=False)[1].close()
+        else:
+            pool.move_to_end(guild_id)
+        for sql in MESSAGE_READS:
+            conn.execute(sql, (user_id,)).fetchall()
+        conn.execute(MESSAGE_WRITE, (user_id,))
+        conn.commit()
+
+        samples.append(time.perf_counter() - started)
+    for conn in pool.values():
+        conn.close()
+
+    result["p50"] = _percentile(samples, 0.50)
+    result["p99"] = _percentile(samples, 0.99)
+    result["mean"] = statistics.fmean(samples)
+    result["miss_ratio"] = misses / messages
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    started = time.perf_counter()
+    result["pruned"] = backend.prune_command_logs(cutoff)
+    result["maintenance"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-guild files with the consolidated DB.")
+    parser.add_argument("--guilds", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--messages", type=int, default=2000, help="Simulated messages per run")
+    parser.add_argument("--max-open", type=int, default=128, help="Pooled guild connections")
+    args = parser.parse_args()
+
+    print(f"{'backend':<13}{'guilds':>7}{'seed s':>9}{'startup ms':>12}{'msg p50 ms':>12}"
+          f"{'msg p99 ms':>12}{'miss %':>8}{'maint ms':>10}")
+    for count in args.guilds:
+        guild_ids = list(range(1, count + 1))
+        for mode in (storage.PerGuildFileStorage.mode, storage.ConsolidatedStorage.mode):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                if mode == storage.PerGuildFileStorage.mode:
+                    backend = storage.PerGuildFileStorage(os.path.join(tmp_dir, "servers"))
+                else:
+                    backend = storage.ConsolidatedStorage(os.path.join(tmp_dir, "servers.db"))
+
+                started = time.perf_counter()
+                seed(backend, guild_ids)
+                seeded = time.perf_counter() - started
+
+                r = run(backend, guild_ids, args.messages, args.max_open)
+                print(f"{mode:<13}{count:>7}{seeded:>9.1f}{r['startup'] * 1000:>12.1f}"
+                      f"{r['p50'] * 1000:>12.3f}{r['p99'] * 1000:>12.3f}{r['miss_ratio'] * 100:>8.1f}"
+                      f"{r['maintenance'] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
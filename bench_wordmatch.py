@@ -0,0 +1,108 @@
+"""Benchmark the banned/enforced word check: per-word substring scans vs wordmatch.
+
+    python bench_wordmatch.py                      # 10, 100, 500 and 2000 words
+    python bench_wordmatch.py --words 500 5000 --messages 20000
+
+For every list size a random word list and a stream of chat-length messages
+(some containing listed words) are generated, then three checks are timed over
+the same messages:
+
+    naive       content.lower() + `word in content` per word (the old check)
+    matcher     content.lower() + WordMatcher.find
+    normalized  wordmatch.normalize(content) + a normalized WordMatcher.find
+                (the opt-in mode; a third of the hits are disguised)
+"""
+import time
+import random
+import string
+import argparse
+
+import wordmatch
+
+
+def make_words(count: int, rng: random.Random) -> list:
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))))
+    return sorted(words)
+
+
+DISGUISES = {"a": "\u0430", "e": "3", "o": "0", "i": "1", "s": "$"}
+
+
+def disguise(word: str) -> str:
+    """Homoglyphs, leetspeak and a zero-width space, the way users dodge filters."""
+    return "\u200b".join([word[:1], "".join(DISGUISES.get(ch, ch) for ch in word[1:]).upper()])
+
+
+def make_messages(count: int, words: list, rng: random.Random) -> list:
+    filler = make_words(200, rng)
+    messages = []
+    for i in range(count):
+        tokens = [rng.choice(filler) for _ in range(rng.randint(4, 30))]
+        if i % 4 == 0:
+            word = rng.choice(words)
+            tokens.insert(rng.randrange(len(tokens) + 1), disguise(word) if i % 3 == 0 else word)
+        messages.append(" ".join(tokens))
+    return messages
+
+
+def naive(words: list, messages: list) -> list:
+    found = []
+    for content in messages:
+        content = content.lower()
+        found.append({w for w in words if w in content})
+    return found
+
+
+def automaton(matcher: wordmatch.WordMatcher, messages: list) -> list:
+    return [matcher.find(content.lower()) for content in messages]
+
+
+def normalized(matcher: wordmatch.WordMatcher, messages: list) -> list:
+    return [matcher.find(wordmatch.normalize(content)) for content in messages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-word scans with the Aho–Corasick and normalized matchers.")
+    parser.add_argument("--words", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'words':>7}{'build ms':>10}{'naive us/msg':>14}{'matcher us/msg':>16}{'speedup':>9}"
+          f"{'norm build ms':>15}{'norm us/msg':>13}{'hits':>7}{'norm hits':>11}")
+    for count in args.words:
+        rng = random.Random(count)
+        words = make_words(count, rng)
+        messages = make_messages(args.messages, words, rng)
+
+        started = time.perf_counter()
+        matcher = wordmatch.WordMatcher(words)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        expected = naive(words, messages)
+        slow = (time.perf_counter() - started) / len(messages)
+
+        started = time.perf_counter()
+        found = automaton(matcher, messages)
+        fast = (time.perf_counter() - started) / len(messages)
+
+        started = time.perf_counter()
+        norm_matcher = wordmatch.WordMatcher(words, normalized=True)
+        norm_build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        norm_found = normalized(norm_matcher, messages)
+        norm = (time.perf_counter() - started) / len(messages)
+
+        if found != expected:
+            raise SystemExit(f"❌ Results differ at {count} words")
+        hits = sum(1 for f in found if f)
+        norm_hits = sum(1 for f in norm_found if f)
+        print(f"{count:>7}{build * 1000:>10.1f}{slow * 1e6:>14.1f}{fast * 1e6:>16.1f}{slow / fast:>8.1f}x"
+              f"{norm_build * 1000:>15.1f}{norm * 1e6:>13.1f}{hits:>7}{norm_hits:>11}")
+
+
+if __name__ == "__main__":
+    main()
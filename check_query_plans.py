@@ -0,0 +1,216 @@
+"""Query-plan regression check for every SQL statement the bot issues.
+
+Collects the literal SQL strings from the bot's source (execute() arguments
+and repository constants alike), builds throwaway server and global DBs at
+the current migration head filled with ROWS synthetic rows per table, runs
+ANALYZE, then EXPLAIN QUERY PLAN for each statement. A statement that
+filters or sorts (WHERE / GROUP BY / ORDER BY needing a sort) but still does a
+plain SCAN of one of the big tables is a failure.
+
+    python check_query_plans.py                  # exit 1 on any full scan
+    python check_query_plans.py --rows 50000 --verbose
+"""
+import os
+import re
+import ast
+import sys
+import random
+import sqlite3
+import argparse
+import tempfile
+
+import migrations
+
+SOURCES = ("muzzled.py", "shared.py", "repositories.py", "write_behind.py")
+ROWS = 20000
+
+# Tables that grow with guild membership or activity
+BIG_TABLES = {
+    "command_logs", "user_wallets", "bets", "daily_claims", "timer_logs", "line_assignments",
+    "active_line_writers", "enforced_words", "banned_words", "allowed_users", "nonbypass_users",
+    "gagged_users", "user_settings", "enforcement_offenses", "cooldown_users", "pishock_users",
+    "server_config", "moderators",
+}
+
+# Statements assembled at runtime (not visible as literals in the source)
+EXTRA_STATEMENTS = (
+    # commandlogs filters
+    "SELECT user_id, command, arguments FROM command_logs WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+    "SELECT user_id, command, arguments FROM command_logs WHERE LOWER(command) IN (?, ?) ORDER BY id DESC LIMIT ?",
+    "SELECT user_id, command, arguments FROM command_logs "
+    "WHERE user_id = ? AND LOWER(command) IN (?, ?) ORDER BY id DESC LIMIT ?",
+    "SELECT guild_id, user_id, command, arguments FROM command_logs WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+    "SELECT guild_id, user_id, command, arguments FROM command_logs "
+    "WHERE LOWER(command) IN (?, ?) ORDER BY id DESC LIMIT ?",
+    "SELECT user_id, command, arguments FROM command_logs WHERE LOWER(command) NOT IN (?, ?) ORDER BY id DESC LIMIT ?",
+)
+
+# Full scans that are the point of the statement: {statement prefix: reason}
+ALLOWED_SCANS = {
+    "SELECT user_id, command, arguments FROM command_logs WHERE LOWER(command) NOT IN":
+        "exclusion filter; walks newest-first and stops at LIMIT",
+    "SELECT user_id, type FROM gagged_users WHERE status = 'active'":
+        "startup load of every active gag",
+}
+
+# Upper-case keywords only: the source also has prose like "Select a cog to toggle"
+SQL_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE)\s")
+WHERE_RE = re.compile(r"\b(WHERE|GROUP\s+BY)\b", re.IGNORECASE)
+ORDER_RE = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+SCAN_RE = re.compile(r"^SCAN (\w+)$")
+# Errors that only mean the literal is a fragment of SQL assembled at runtime
+FRAGMENT_ERRORS = ("incomplete input", "syntax error")
+
+
+# --- Statement collection ---
+
+def collect_statements(paths=SOURCES) -> dict:
+    """{normalized SQL: [file:line, ...]} for every SQL string literal in paths."""
+    found = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_RE.match(node.value):
+                statement = " ".join(node.value.split())
+                found.setdefault(statement, []).append(f"{os.path.basename(path)}:{node.lineno}")
+    for statement in EXTRA_STATEMENTS:
+        found.setdefault(statement, []).append("(runtime)")
+    return found
+
+
+# --- Synthetic data ---
+
+def _value(column_type: str, i: int, rows: int, rng: random.Random):
+    column_type = (column_type or "").upper()
+    if "INT" in column_type:
+        return rng.randrange(1, rows * 10) if i % 3 else i
+    if "TIME" in column_type or "DATE" in column_type:
+        return f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}T12:00:00"
+    return f"v{rng.randrange(rows)}"
+
+
+def fill(conn: sqlite3.Connection, rows: int, rng: random.Random):
+    """Insert `rows` synthetic rows into every table; key columns get unique values."""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    for table in tables:
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()  # cid, name, type, notnull, dflt, pk
+        if any(col[1] == "id" and col[5] for col in info) and "CHECK(id = 1)" in (
+            conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+        ):
+            continue  # single-row tables (pot)
+        columns = [col[1] for col in info]
+        pk = {col[1] for col in info if col[5]}
+        placeholders = ", ".join("?" for _ in columns)
+
+        def row(i):
+            return tuple(i if name in pk else _value(col_type, i, rows, rng)
+                         for name, col_type in ((col[1], col[2]) for col in info))
+        try:
+            conn.executemany(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                             (row(i) for i in range(1, rows + 1)))
+        except sqlite3.IntegrityError:
+            pass  # CHECK constraints on a few settings tables; their size doesn't matter here
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def build_databases(directory: str, rows: int) -> dict:
+    rng = random.Random(42)
+    databases = {}
+    for name, steps in (("server", migrations.SERVER_MIGRATIONS), ("global", migrations.GLOBAL_MIGRATIONS)):
+        conn = sqlite3.connect(os.path.join(directory, f"{name}.db"))
+        migrations.migrate(conn, steps)
+        fill(conn, rows, rng)
+        databases[name] = conn
+    return databases
+
+
+# --- Plans ---
+
+def explain(conn: sqlite3.Connection, statement: str) -> list:
+    params = [None] * statement.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", params)]
+
+
+def full_scans(statement: str, plan: list) -> list:
+    """Big tables read in full although the statement filters or sorts them.
+
+    An unfiltered ORDER BY ... LIMIT that walks the table in order (no temp
+    B-tree sort) reads only LIMIT rows and is fine.
+    """
+    if WHERE_RE.search(statement):
+        pass
+    elif ORDER_RE.search(statement):
+        if not any("USE TEMP B-TREE" in detail for detail in plan):
+            return []
+    else:
+        return []
+    return [m.group(1) for m in map(SCAN_RE.match, plan) if m and m.group(1) in BIG_TABLES]
+
+
+def check(rows: int = ROWS, paths=SOURCES) -> dict:
+    """Returns {"checked": n, "failures": [...], "allowed": [...], "unplanned": [...], "plans": {...}}."""
+    report = {"checked": 0, "failures": [], "allowed": [], "unplanned": [], "plans": {}}
+    statements = collect_statements(paths)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        databases = build_databases(tmp_dir, rows)
+        try:
+            for statement, where in sorted(statements.items()):
+                plan, errors = None, []
+                for conn in databases.values():
+                    try:
+                        plan = explain(conn, statement)
+                        break
+                    except sqlite3.Error as e:
+                        errors.append(str(e))
+                if plan is None:
+                    if not any(marker in error for error in errors for marker in FRAGMENT_ERRORS):
+                        error = next((e for e in errors if not e.startswith("no such table")), errors[0])
+                        report["unplanned"].append((statement, where, error))
+                    continue
+
+                report["checked"] += 1
+                report["plans"][statement] = plan
+                scans = full_scans(statement, plan)
+                if not scans:
+                    continue
+                reason = next((why for prefix, why in ALLOWED_SCANS.items() if statement.startswith(prefix)), None)
+                entry = (statement, where, scans, reason)
+                (report["allowed"] if reason else report["failures"]).append(entry)
+        finally:
+            for conn in databases.values():
+                conn.close()
+    return report
+
+
+def format_report(report: dict, verbose: bool = False) -> str:
+    lines = [
+        f"🔎 Checked {report['checked']} statement(s): {len(report['failures'])} full scan(s), "
+        f"{len(report['allowed'])} allowed, {len(report['unplanned'])} could not be planned"
+    ]
+    for statement, where, scans, _ in report["failures"]:
+        lines.append(f"  ❌ SCAN {', '.join(scans)} ({', '.join(where)}): {statement}")
+    for statement, where, scans, reason in report["allowed"]:
+        lines.append(f"  ⚪ SCAN {', '.join(scans)} allowed, {reason}: {statement}")
+    if verbose:
+        for statement, where, error in report["unplanned"]:
+            lines.append(f"  ❓ {error} ({', '.join(where)}): {statement}")
+        for statement, plan in report["plans"].items():
+            lines.append(f"  {statement}\n      " + "\n      ".join(plan))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail on full-table scans in the bot's SQL.")
+    parser.add_argument("--rows", type=int, default=ROWS, help="Synthetic rows per table")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan and unplannable statement")
+    args = parser.parse_args()
+
+    result = check(rows=args.rows)
+    print(format_report(result, verbose=args.verbose))
+    sys.exit(1 if result["failures"] else 0)
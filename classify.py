@@ -0,0 +1,124 @@
+"""One-pass classification of a message's content for the pipeline stages.
+
+MessageClassifier folds URLs, custom emoji, the bypass markers and every
+trigger phrase into one case-insensitive regex and makes a single finditer
+pass over the message; the prefixes (this guild's command prefix, the default
+"!>", the bypass prefixes) are one anchored match on its first characters,
+compiled per prefix and cached. Every body part is an optional zero-width
+lookahead behind a first-character guard, so overlapping hits
+("*click*collar*") are all seen, a URL and a trigger starting at the same
+character are both reported, and most positions fail on a single test.
+Trigger phrases starting at the same character are one alternation, so only
+the longest of them counts there (as in assets.TriggerTable.match).
+
+    classifier = MessageClassifier(shared.TRIGGERS, ("((", "owo"), ("\\u200b",))
+    cls = classifier.classify(message, "!>")
+    cls.is_command, cls.bypass, cls.has_url, cls.trigger, cls.media
+
+`python -m doctest classify.py` runs the examples on classify_text().
+"""
+import re
+
+DEFAULT_PREFIX = "!>"
+# URLs match in any case (the old check searched the lowercased content);
+# custom emoji stay case-sensitive inside the IGNORECASE body, as before
+URL_PATTERN = r"https?://\S"
+CUSTOM_EMOJI_PATTERN = r"(?-i:<a?:\w+:\d+>)"
+
+
+class MessageClass:
+    __slots__ = ("is_command", "default_prefix", "bypass", "has_url", "custom_emoji", "triggers", "media")
+
+    def __init__(self):
+        self.is_command = False
+        self.default_prefix = False  # Starts with "!>" (another guild's prefix if this one differs)
+        self.bypass = False          # Bypass prefix or marker: leave the message alone
+        self.has_url = False
+        self.custom_emoji = False
+        self.triggers = ()           # assets.Trigger entries, in table order
+        self.media = False           # Attachments or stickers
+
+    @property
+    def trigger(self):
+        """Name of the trigger that wins (first in table order), or None."""
+        return self.triggers[0].name if self.triggers else None
+
+    def __repr__(self):
+        flags = " ".join(name for name in self.__slots__[:-2] if getattr(self, name))
+        return f"<MessageClass {flags or '-'} trigger={self.trigger} media={self.media}>"
+
+
+class MessageClassifier:
+    def __init__(self, triggers, bypass_prefixes=(), bypass_markers=()):
+        self.triggers = triggers  # assets.TriggerTable
+        self.bypass_prefixes = tuple(bypass_prefixes)
+        self.bypass_markers = tuple(bypass_markers)
+        self._body = self._compile_body()
+        self._heads = {}  # {prefix: re.Pattern}
+        self.stats = {"classified": 0, "compiled": 1}
+
+    def _compile_body(self):
+        anywhere = [("url", URL_PATTERN), ("emoji", CUSTOM_EMOJI_PATTERN)]
+        first_chars = {"h", "<"}
+        if self.bypass_markers:
+            anywhere.append(("marker", "|".join(map(re.escape, self.bypass_markers))))
+            first_chars.update(marker[0] for marker in self.bypass_markers)
+        if self.triggers.pattern:
+            anywhere.append(("trigger", self.triggers.pattern))
+            first_chars.update(phrase[0] for trigger in self.triggers.triggers for phrase in trigger.phrases)
+        guard = "[" + "".join(re.escape(ch) for ch in sorted(first_chars)) + "]"
+        # Optional lookaheads, not alternatives: every part is tried at each guarded position
+        body = "".join(f"(?=(?P<{name}>{p}))?" for name, p in anywhere)
+        return re.compile(f"(?={guard}){body}", re.IGNORECASE)
+
+    def _head(self, prefix: str):
+        regex = self._heads.get(prefix)
+        if regex is None:
+            # Bypass prefixes are case-sensitive ("Owo"/"owo"/"OWO", not "oWo")
+            start = [
+                ("command", re.escape(prefix)),
+                ("default", re.escape(DEFAULT_PREFIX)),
+                ("bypass", "|".join(map(re.escape, self.bypass_prefixes)) or "(?!)"),
+            ]
+            regex = self._heads[prefix] = re.compile("".join(f"(?=(?P<{name}>{p}))?" for name, p in start))
+            self.stats["compiled"] += 1
+        return regex
+
+    def classify_text(self, content: str, prefix: str = DEFAULT_PREFIX) -> MessageClass:
+        """Classify message text; classify() adds the attachment/sticker check.
+
+        >>> from types import SimpleNamespace
+        >>> classifier = MessageClassifier(SimpleNamespace(pattern="", triggers=()), ("((",), ("\\u200b",))
+        >>> classifier.classify_text("HTTPS://Example.com/x").has_url
+        True
+        >>> classifier.classify_text("<a:wave:123>").custom_emoji, classifier.classify_text("<A:wave:123>").custom_emoji
+        (True, False)
+        >>> classifier.classify_text("see https://x.com\\u200b").bypass
+        True
+        """
+        cls = MessageClass()
+        head = self._head(prefix).match(content)
+        cls.is_command = head.group("command") is not None
+        cls.default_prefix = head.group("default") is not None
+        cls.bypass = head.group("bypass") is not None
+
+        hits = set()
+        for m in self._body.finditer(content):
+            found = m.groupdict()  # marker/trigger are absent when there are none
+            if found.get("trigger") is not None:
+                hits.add(self.triggers.index(found["trigger"]))
+            if found.get("marker") is not None:
+                cls.bypass = True
+            if found["url"] is not None:
+                cls.has_url = True
+            if found["emoji"] is not None:
+                cls.custom_emoji = True
+        if hits:
+            cls.triggers = tuple(self.triggers.triggers[i] for i in sorted(hits))
+        self.stats["classified"] += 1
+        return cls
+
+    def classify(self, message, prefix: str = DEFAULT_PREFIX) -> MessageClass:
+        cls = self.classify_text(message.content, prefix)
+        cls.media = bool(message.attachments or message.stickers)
+        return cls
@@ -0,0 +1,355 @@
+import discord
+from discord.ext import commands
+from discord.commands import slash_command, Option
+import shared
+import asyncio
+import gag_engine
+from pipeline import STOP
+from shared import gagged_users, AUTHORIZED_LOCK_MANAGERS, check_auth, conn, gagged_messages, cog_enabled, with_config, unpack_config, safe_send, silent_executions
+c = None  # local DB cursor
+
+class GagCog(commands.Cog):
+    def __init__(self, bot):
+
+
+        self.bot = bot
+        global c
+        if conn:
+            c = conn.cursor()
+
+        gag_engine.load_muffled_words()
+
+        shared.message_pipeline.add_stage(
+            "gag", self.gag_stage, order=800, needs=("guild_id", "user_id", "is_command"), cog_column="gags_enabled"
+        )
+        shared.enforcement_gag_send = self.gag_and_send
+        shared.handle_gag_reaction = self.handle_gag_reaction
+
+
+
+        shared.gag_functions.update(gag_engine.STYLES)
+
+    def cog_unload(self):
+
+
+        shared.message_pipeline.remove_stage("gag")
+        shared.enforcement_gag_send = None
+        shared.handle_gag_reaction = None
+        shared.gag_functions = {}
+
+    async def handle_gag_reaction(self, reaction, user):
+
+
+        message = reaction.message
+        guild = message.guild
+        if not guild:
+            return
+
+        # ✅ Respect cog enable/disable toggle
+        if not shared.is_cog_enabled(guild.id, "gags_enabled"):
+            return
+
+        msg_id = message.id
+        record = shared.gagged_messages.get(msg_id)
+        if record is None:
+            return
+
+        try:
+            users = await reaction.users().flatten()
+
+            # Ignore if only the bot reacted
+            if self.bot.user in users and len(users) == 1:
+                return
+
+            # Gagged message details
+            author_id, original_content = record.author_id, record.content
+            author = guild.get_member(author_id)
+            emoji = str(reaction.emoji)
+
+            parent_channel = message.channel.parent if isinstance(message.channel, discord.Thread) else message.channel
+            thread = message.channel if isinstance(message.channel, discord.Thread) else None
+
+            # Only the reveal/hide edits need the webhook
+            webhook = None
+            if emoji in ("👁️", "⬆️"):
+                webhook = await shared.gag_webhooks.find(parent_channel, record.webhook_id)
+
+            # 💣 Delete
+            if emoji == "💣":
+                if author_id == user.id or user.id in shared.AUTHORIZED_LOCK_MANAGERS or message.channel.permissions_for(user).manage_messages:
+                    shared.outbound.cancel_decoration(msg_id)
+                    await message.delete()
+                    shared.gagged_messages.remove(msg_id)
+
+            # 👁️ Reveal
+            elif emoji == "👁️" and webhook:
+                gag_type = shared.gagged_users.get(guild.id, {}).get(author_id, "loose")
+                color = gag_colors.get(gag_type, discord.Color.default())
+                embed = discord.Embed(description=original_content, color=color)
+                embed.set_author(name=f"{author.display_name}", icon_url=author.display_avatar.url)
+                
+
+                if thread:
+                    await webhook.edit_message(msg_id, embed=embed, thread=thread)
+                else:
+                    await webhook.edit_message(msg_id, embed=embed)
+
+                shared.outbound.cancel_decoration(msg_id)
+                await message.clear_reactions()
+                shared.outbound.decorate(message, ("💣", "⬆️"))
+
+            # ⬆️ Hide
+            elif emoji == "⬆️" and webhook:
+                if thread:
+                    await webhook.edit_message(msg_id, embed=None, thread=thread)
+                else:
+                    await webhook.edit_message(msg_id, embed=None)
+
+                shared.outbound.cancel_decoration(msg_id)
+                await message.clear_reactions()
+                shared.outbound.decorate(message, ("💣", "👁️"))
+
+        except Exception as e:
+            print(f"[GagCog] Reaction handling failed:")
+            import traceback
+            traceback.print_exc()
+
+
+
+
+
+
+    @commands.command()
+    async def gag(self, ctx, user: discord.Member = None, gag_type = "loose"):
+        # Check if the cog is enabled for this guild
+        if not shared.is_cog_enabled(ctx.guild.id, "gags_enabled"):
+            return
+
+        # Apply config manually
+        await with_config(self._gag)(ctx, user, gag_type)
+
+
+
+    @slash_command(name="gag", description="Apply a gag type to yourself or another user")
+    async def gag_slash(
+        self,
+        ctx,
+        user: Option(discord.Member, "Select a user", required=False) = None,
+        gag_type: Option(str, "Type of gag", required=False, default="loose") = "loose"
+    ):
+        if not shared.is_cog_enabled(ctx.guild.id, "gags_enabled"):
+            return
+        
+        await ctx.defer()
+        # Manually prepare config and server_db (like with_config would do)
+        guild_id = ctx.guild.id
+        ctx.config = shared.get_server_config(guild_id)
+        if not ctx.config:
+            await ctx.followup.send("⚠️ No config found for this server.", ephemeral=True)
+            return
+
+        with shared.checkout_server_db(guild_id) as ctx.server_db:
+            await self._gag(ctx, user, gag_type)
+
+
+
+    @slash_command(name="ungag", description="Remove a user's gag status")
+    async def ungag_slash(
+        self,
+        ctx,
+        user: Option(discord.Member, "User to ungag", required=False) = None
+    ):
+        if not shared.is_cog_enabled(ctx.guild.id, "gags_enabled"):
+            return
+
+        await ctx.defer()
+        # Manually prepare config and server_db (like with_config would do)
+        guild_id = ctx.guild.id
+        ctx.config = shared.get_server_config(guild_id)
+        if not ctx.config:
+            await ctx.followup.send("⚠️ No config found for this server.", ephemeral=True)
+            return
+
+        with shared.checkout_server_db(guild_id) as ctx.server_db:
+            await self._ungag(ctx, user)
+
+    
+    async def _gag(self, ctx, user: discord.Member, gag_type: str):
+        guild_id = ctx.guild.id
+        config = unpack_config(ctx)
+        c = ctx.server_db.cursor()
+        valid_gags = ["loose", "medium", "harsh", "puppy", "kitty", "toy", "base64", "zalgo", "piglatin","ferret", "ungag"]
+        target = user or ctx.author
+
+
+        if target.id in shared.locked_users[ctx.guild.id] and ctx.author.id not in AUTHORIZED_LOCK_MANAGERS:
+            await safe_send(ctx, "❌ The target is currently locked and cannot be gagged.")
+            return
+
+        if target.bot:
+            await safe_send(ctx, "❌ Cannot gag a bot.")
+            return
+
+        if gag_type.lower() not in valid_gags:
+            await safe_send(ctx, f"❌ Invalid gag type. Valid types: `{', '.join(valid_gags)}`")
+            return
+
+        if not await check_auth(ctx, target):
+            await safe_send(ctx, "❌ You do not have permission to gag this user.")
+            return
+
+        user_id = target.id
+
+        if gag_type.lower() == "ungag":
+            c.execute("UPDATE gagged_users SET status = 'inactive' WHERE user_id = ?", (user_id,))
+            shared.gagged_users[ctx.guild.id].pop(user_id, None)
+            await safe_send(ctx, "🗣️ User has been ungagged.")
+        else:
+            c.execute(
+                "INSERT OR REPLACE INTO gagged_users (user_id, type, status) VALUES (?, ?, 'active')",
+                (user_id, gag_type)
+            )
+            shared.gagged_users[ctx.guild.id][user_id] = gag_type
+            await safe_send(ctx, f"🔇 {target.mention} has been gagged with `{gag_type}`.")
+
+        ctx.server_db.commit()
+
+    @commands.command()
+    async def ungag(self, ctx, user: discord.Member = None):
+        # Check if the cog is enabled for this guild
+        if not shared.is_cog_enabled(ctx.guild.id, "gags_enabled"):
+            return
+
+        # Apply config manually
+        await with_config(self._ungag)(ctx, user)
+
+
+    
+    async def _ungag(self, ctx, user: discord.Member):
+        guild_id = ctx.guild.id
+        config = unpack_config(ctx)
+        c = ctx.server_db.cursor()
+
+        target = user or ctx.author
+
+        if target.id in shared.locked_users[ctx.guild.id] and ctx.author.id not in AUTHORIZED_LOCK_MANAGERS:
+            await safe_send(ctx, "❌ The target is currently locked and cannot be ungagged.")
+            return
+
+        if not await check_auth(ctx, target):
+            await safe_send(ctx, "❌ You do not have permission to ungag this user.")
+            return
+
+        user_id = target.id
+        c.execute("SELECT type FROM gagged_users WHERE user_id = ? AND status = 'active'", (user_id,))
+        row = c.fetchone()
+
+        if row:
+            c.execute("UPDATE gagged_users SET status = 'inactive' WHERE user_id = ?", (user_id,))
+            shared.gagged_users[guild_id].pop(user_id, None)
+            ctx.server_db.commit()
+            await safe_send(ctx, "🗣️ User has been ungagged.")
+        else:
+            await safe_send(ctx, "❌ That user is not currently gagged.")
+
+
+
+    async def gag_stage(self, ctx):
+        """Message pipeline stage: replace a gagged user's message with its gagged echo."""
+        if ctx.deleted:
+            return STOP  # Already removed (prison); nothing to echo
+        if ctx.is_command or ctx.user_id not in shared.gagged_users[ctx.guild_id]:
+            return
+        try:
+            await self.handle_gagged_message(ctx.message)
+        except Exception as e:
+            print(f"[GagCog] Gag handling failed for user {ctx.user_id}: {e}")
+
+    async def handle_gagged_message(self, message):
+        if not message.guild or not shared.is_cog_enabled(message.guild.id, "gags_enabled"):
+            return
+
+        user_id = message.author.id
+        gag_type = shared.gagged_users[message.guild.id][user_id]
+
+        try:
+            shared.outbound.delete(message)
+
+            gag_func = shared.gag_functions.get(gag_type)
+            gagged_text = gag_func(message.content) if gag_func else "🤐 [Unknown gag style]"
+            await self.send_gagged(message, gagged_text)
+
+        except Exception as e:
+            print(f"Gag handling failed for user {user_id}: {e}")
+
+    async def gag_and_send(self, message, gag_type: str = "loose"):
+        if not message.guild or not shared.is_cog_enabled(message.guild.id, "gags_enabled"):
+            return
+
+        gag_func = shared.gag_functions.get(gag_type)
+        gagged_text = gag_func(message.content) if gag_func else "[🤐 gagged]"
+        await self.send_gagged(message, gagged_text)
+
+    async def send_gagged(self, message, gagged_text):
+        """Echo gagged_text as the author through the channel's webhook and track it for reactions."""
+        parent_channel = message.channel.parent if isinstance(message.channel, discord.Thread) else message.channel
+
+        send_args = {
+            "content": gagged_text,
+            "username": message.author.display_name,
+            "avatar_url": message.author.display_avatar.url,
+            "wait": True,
+        }
+        if isinstance(message.channel, discord.Thread):
+            send_args["thread"] = message.channel
+
+        # wait=True returns the WebhookMessage; it takes reactions directly, no fetch needed
+        webhook, gag_msg = await shared.gag_webhooks.send(parent_channel, **send_args)
+        shared.gag_latency.record((gag_msg.created_at - message.created_at).total_seconds())
+
+        # Expires (reactions cleared) with the store's sweeper, GAG_REACTION_TTL after sending
+        shared.gagged_messages.add(
+            message.guild.id, message.channel, gag_msg.id, message.author.id, message.content, webhook.id
+        )
+
+        shared.outbound.decorate(gag_msg, ("💣", "👁️"))
+
+
+# ------------------- Gag Setup -------------------
+
+async def safe_send(ctx, message, ephemeral=False):
+    try:
+        if hasattr(ctx, "respond"):  # Slash command context
+            if ctx.response.is_done():
+                await ctx.followup.send(message, ephemeral=ephemeral)
+            else:
+                await ctx.respond(message, ephemeral=ephemeral)
+        else:  # Regular text command
+            await ctx.send(message)
+    except Exception as e:
+        print(f"[safe_send] Failed to send message: {e}")
+
+
+# ---- GAG FUNCTION TREE
+# The styles themselves live in gag_engine.py
+gag_functions = gag_engine.STYLES
+
+gag_colors = {
+    "loose": discord.Color.green(),
+    "medium": discord.Color.gold(),
+    "harsh": discord.Color.red(),
+    "puppy": discord.Color.teal(),
+    "ferret": discord.Color.gold(),
+    "kitty": discord.Color.magenta(),
+    "toy": discord.Color.purple(),
+    "base64": discord.Color.dark_blue(),
+    "zalgo": discord.Color.dark_red(),
+    "piglatin": discord.Color.orange(),
+    "youtube": discord.Color.blurple()
+            }
+
+
+
+
+def setup(bot):
+    bot.add_cog(GagCog(bot))
@@ -0,0 +1,92 @@
+import discord
+from discord.ext import commands
+import shared
+import time
+from repositories import PishockRepository
+import traceback
+
+class PrisonCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.conn = shared.conn
+        self.cursor = self.conn.cursor() if self.conn else None
+        shared.message_pipeline.add_stage(
+            "prison", self.prison_stage, order=700, needs=("is_command",), cog_column="prison_enabled"
+        )
+
+    def cog_unload(self):
+        print("[Prison] Unloading Prison Cog")
+        shared.message_pipeline.remove_stage("prison")
+
+    async def prison_stage(self, ctx):
+        """Message pipeline stage. Never stops the pipeline: the cooldown stage still runs,
+        and the gag stage skips messages this deleted (ctx.deleted)."""
+        if not ctx.is_command and await self.enforce_prison_restrictions(ctx):
+            ctx.deleted = True
+
+    async def enforce_prison_restrictions(self, ctx):
+        """Returns True if the message was deleted for being outside the prison channel."""
+        message = ctx.message
+        deleted = False
+        try:
+            if not message.guild or message.author.bot:
+                return
+
+            guild_id = message.guild.id
+            user_id = message.author.id
+            channel_id = message.channel.id
+
+            # ✅ Check if this cog is enabled for the guild
+            if not shared.is_cog_enabled(guild_id, "prison_enabled"):
+                return
+
+            # ✅ Get per-guild data safely
+            guild_prison_users = shared.prison_users.get(guild_id)
+
+
+            if guild_prison_users is None or user_id not in guild_prison_users:
+                return
+
+            guild_temp_freed = shared.temporarily_freed.get(guild_id)
+            if guild_temp_freed and user_id in guild_temp_freed and time.time() < guild_temp_freed[user_id]:
+                return  # temporarily freed
+
+            prison_channel_id = guild_prison_users[user_id]
+            if channel_id != prison_channel_id:
+                try:
+                    shared.outbound.delete(message)
+                    deleted = True
+                    prison_channel = self.bot.get_channel(prison_channel_id)
+
+                    # ⚡ PiShock integration
+                    if user_id in shared.user_pishock_codes.get(guild_id, {}) and shared.pishock_command:
+                        try:
+                            row = PishockRepository(guild_id).shock_for(user_id, "enforcement_action")
+                            if not row:
+                                return deleted
+
+                            intensity, duration = row
+
+                            ctx.after_lane(lambda: shared.pishock_and_announce(
+                                guild_id, user_id, intensity, duration, message.channel,
+                                f"⚡ Shocked {message.author.display_name} for typing outside of prison!", delete_after = 20
+                            ))
+                        except Exception as e:
+                            print(f"[PiShock] Error triggering prison break shock: {e}")
+
+
+                    shared.outbound.warn(
+                        message.channel, user_id,
+                        f"🔒 You're restricted to {prison_channel.mention if prison_channel else '#prison'}",
+                        delete_after=10, kind="prison"
+                    )
+
+                except Exception as e:
+                    print(f"[PrisonCog] Prison restriction failed: {e}")
+        except Exception as e:
+            print(f"[PrisonCog] Prison enforcement crashed: {e}")
+            traceback.print_exc()
+        return deleted
+
+def setup(bot):
+    bot.add_cog(PrisonCog(bot))
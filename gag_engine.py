@@ -0,0 +1,418 @@
+"""Gag styles: one tokenizer, batched randomness, one join per message.
+
+Every word-based style used to split the text, run two or three re.match /
+re.sub calls per word and draw random.choice / random.random per word. Now
+tokenize() scans the message once with TOKEN_RE into (prefix, core, suffix)
+spans (leading punctuation, the word, trailing punctuation), each style draws
+all the randomness it needs for the message in one or two random.choices(k=n)
+calls, and the output is built with a single join.
+
+    gag_engine.STYLES["puppy"]("Good boy!")           # "bork yip!"
+    gag_engine.STYLES["puppy"]("Good boy!", seed=7)   # the same output every time
+
+Every style takes (text, seed=None); with a seed it draws from its own
+random.Random(seed), so tests and benchmarks are reproducible.
+`python bench_gags.py` times every style on 2,000-character messages.
+
+The loose style looks words up in the CMU dictionary, pre-muffled and pickled
+next to this module by load_muffled_words().
+"""
+import os
+import re
+import time
+import base64
+import pickle
+import random
+
+import pronouncing
+
+# A whitespace-separated word: leading punctuation, the word, trailing punctuation.
+# "(hello," -> ("(", "hello", ","); "!!!" -> ("!!!", "", "")
+TOKEN_RE = re.compile(r"(?<!\S)(?=\S)([^\w\s]*)(\S*?)([^\w\s]*)(?!\S)")
+# kitty: runs of word characters and single punctuation marks
+PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+STYLES = {}  # {name: fn(text, seed=None) -> str}
+
+
+def style(name: str):
+    def decorator(func):
+        STYLES[name] = func
+        return func
+    return decorator
+
+
+def tokenize(text: str) -> list:
+    """[(prefix, core, suffix), ...] for every whitespace-separated word."""
+    return TOKEN_RE.findall(text)
+
+
+def rng_for(seed=None):
+    """The shared random module, or a private generator when a seed is given."""
+    return random if seed is None else random.Random(seed)
+
+
+# -------- LOOSE
+# Map CMU phonemes to muffled equivalents
+phoneme_to_gag = {
+    'AA': 'ah', 'AE': 'aeh', 'AH': 'uh', 'AO': 'aw', 'AW': 'ow', 'AY': 'ai',
+    'B': 'bmm', 'CH': 'chh', 'D': 'dgh', 'DH': 'thh', 'EH': 'eh', 'ER': 'urr',
+    'EY': 'ei', 'F': 'fff', 'G': 'gg', 'HH': 'hm', 'IH': 'ih', 'IY': 'ee',
+    'JH': 'jj', 'K': 'kk', 'L': 'll', 'M': 'mm', 'N': 'nn', 'NG': 'ngh',
+    'OW': 'ow', 'OY': 'oy', 'P': 'pph', 'R': 'rr', 'S': 'sss', 'SH': 'shh',
+    'T': 'tt', 'TH': 'th', 'UH': 'uh', 'UW': 'oo', 'V': 'vv', 'W': 'wh', 'Y': 'yuh', 'Z': 'zz', 'ZH': 'zhh'
+}
+UNKNOWN_PHONEME_SOUNDS = ['mm', 'hnn', 'rrgh']
+LOOSE_FILLER = "mmphhgrhn"
+
+def phonemes_to_gag(phonemes, rng=random):
+    return ''.join(phoneme_to_gag.get(p.strip("012")) or rng.choice(UNKNOWN_PHONEME_SOUNDS) for p in phonemes)
+
+# The CMU dictionary pre-muffled: {word: gagged text}, or the phoneme list for
+# the rare word with a phoneme missing from phoneme_to_gag (random per call).
+# Built once from pronouncing and pickled next to this module; a changed
+# phoneme_to_gag invalidates the pickle.
+MUFFLED_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "muffled_words.pickle")
+muffled_words = None
+
+def load_muffled_words():
+    global muffled_words
+    if muffled_words is not None:
+        return
+    started = time.perf_counter()
+    key = sorted(phoneme_to_gag.items())
+    try:
+        with open(MUFFLED_WORDS_PATH, "rb") as f:
+            data = pickle.load(f)
+        if data.get("key") == key:
+            muffled_words = data["words"]
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError):
+        pass
+
+    if muffled_words is None:
+        pronouncing.init_cmu()
+        words = {}
+        for word, phones in pronouncing.pronunciations:
+            if word in words:
+                continue  # phones_for_word()[0]: the first pronunciation wins
+            phonemes = phones.split()
+            if all(p.strip("012") in phoneme_to_gag for p in phonemes):
+                words[word] = phonemes_to_gag(phonemes)
+            else:
+                words[word] = tuple(phonemes)
+        muffled_words = words
+        try:
+            tmp_path = MUFFLED_WORDS_PATH + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"key": key, "words": words}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, MUFFLED_WORDS_PATH)
+        except OSError as e:
+            print(f"[Gags] Could not save {MUFFLED_WORDS_PATH}: {e}")
+    print(f"[Gags] Loaded {len(muffled_words)} muffled words in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+@style("loose")
+def loose(text, seed=None):
+    rng = rng_for(seed)
+    if muffled_words is None:
+        load_muffled_words()
+    spans = tokenize(text)
+    # No per-word lru_cache (the old loose_word): tokenize() already did the
+    # punctuation split it memoized, and muffled_words is a precomputed
+    # {word: muffled} for the whole dictionary, so a cache in front of this
+    # .get() only adds a call per word
+    found = [muffled_words.get(core.lower()) for _, core, _ in spans]
+    # fallback for weird words or names: one filler draw for the whole message
+    fillers = [max(3, len(core) // 2) for (_, core, _), gagged in zip(spans, found) if gagged is None]
+    filler = ''.join(rng.choices(LOOSE_FILLER, k=sum(fillers)))
+
+    parts = []
+    pos = 0
+    for (prefix, core, suffix), gagged in zip(spans, found):
+        if gagged is None:
+            end = pos + max(3, len(core) // 2)
+            gagged, pos = filler[pos:end], end
+        elif isinstance(gagged, tuple):
+            gagged = phonemes_to_gag(gagged, rng)
+        parts.append(prefix + gagged + suffix)
+    return ' '.join(parts)
+
+
+# --------- MEDIUM
+MEDIUM_SOUNDS = ["mmf", "hnn", "rrg", "bmm", "mph", "nng", "ghh", "uhh"]
+
+@style("medium")
+def medium(text, seed=None):
+    rng = rng_for(seed)
+    spans = tokenize(text)
+    n = len(spans)
+    rolls = rng.choices(range(100), k=n)
+    sounds = rng.choices(MEDIUM_SOUNDS, k=2 * n)
+
+    parts = []
+    for i, (prefix, core, suffix) in enumerate(spans):
+        roll = rolls[i]
+        # 30% chance to preserve the starting letter
+        if len(core) > 2 and roll < 30:
+            gagged = core[0] + sounds[2 * i]
+        else:
+            # 1–2 muffled syllables
+            gagged = ''.join(sounds[2 * i:2 * i + 1 + roll % 2])
+        parts.append(prefix + gagged + suffix)
+    return ' '.join(parts)
+
+
+# --------- HARSH
+HARSH_SOUNDS = ["mmph", "hnn", "rrgh", "bmm", "nngh", "gmph", "mph", "ghh", "fff", "zrr"]
+
+@style("harsh")
+def harsh(text, seed=None):
+    rng = rng_for(seed)
+    counts = rng.choices((1, 2, 3), k=len(text.split()))
+    sounds = rng.choices(HARSH_SOUNDS, k=sum(counts))
+
+    parts = []
+    pos = 0
+    for count in counts:
+        parts.append(''.join(sounds[pos:pos + count]))
+        pos += count
+    return ' '.join(parts)
+
+
+# --------- PUPPY / FERRET
+PUPPY_SOUNDS = ["woof", "bork", "grrr", "awoo", "yip", "snrf", "ruff", "whine", "arf", "bark"]
+FERRET_SOUNDS = ["dook", "*hiss*", "*squeal*"]
+
+def animal(text, sounds, seed=None):
+    """Each word becomes an animal sound; some stutter or keep a few letters."""
+    rng = rng_for(seed)
+    spans = tokenize(text)
+    # One roll per word: roll // 3 is the percentile, roll % 3 + 1 the kept letters
+    rolls = rng.choices(range(300), k=len(spans))
+    picked = rng.choices(sounds, k=len(spans))
+
+    parts = []
+    for (prefix, core, suffix), roll, sound in zip(spans, rolls, picked):
+        pct = roll // 3
+        if len(core) > 2 and pct < 10:
+            # 10% chance to stutter the first letter
+            first = core[0].lower()
+            gagged = first + '-' + first + '-' + sound
+        elif pct < 10 or (len(core) > 2 and pct < 19):
+            # otherwise 10% chance to leave part of the word + sound
+            gagged = core[:roll % 3 + 1] + sound
+        else:
+            gagged = sound
+        parts.append(prefix + gagged + suffix)
+    return ' '.join(parts)
+
+@style("puppy")
+def puppy(text, seed=None):
+    return animal(text, PUPPY_SOUNDS, seed)
+
+@style("ferret")
+def ferret(text, seed=None):
+    return animal(text, FERRET_SOUNDS, seed)
+
+
+# ------- BASE64
+@style("base64")
+def gag_base64(text, seed=None):
+    return base64.b64encode(text.encode("utf-8")).decode("utf-8")
+
+
+# ------- ZALGO
+ZALGO_UP = ['̍','̎','̄','̅','̿','̑','̆','̐','͒','͗','͑','̇','̈','̊','͂','̓','̈́','͊','͋','͌','̃','̂','̌','͐','́','̋','̏','̽','̉','ͣ','ͤ','ͥ','ͦ','ͧ','ͨ','ͩ','ͪ','ͫ','ͬ','ͭ','ͮ','ͯ','̾','͛','͆','̚']
+ZALGO_DOWN = ['̖','̗','̘','̙','̜','̝','̞','̟','̠','̤','̥','̦','̩','̪','̫','̬','̭','̮','̯','̰','̱','̲','̳','̹','̺','̻','̼','ͅ','͇','͈','͉','͍','͎','͓','͔','͕','͖','͙','͚']
+ZALGO_MID = ['̕','̛','̀','́','͘','̡','̢','̧','̨','̴','̵','̶','͜','͝','͞','͟','͠','͢','̸','̷','͡','҉']
+ZALGO_MARKS = ZALGO_UP + ZALGO_MID + ZALGO_DOWN
+
+@style("zalgo")
+def zalgo(text, seed=None):
+    rng = rng_for(seed)
+    letters = sum(1 for c in text if c.isalpha())
+    counts = rng.choices(range(2, 7), k=letters)
+    marks = rng.choices(ZALGO_MARKS, k=sum(counts))
+
+    parts = []
+    i = pos = 0
+    for c in text:
+        parts.append(c)
+        if c.isalpha():
+            end = pos + counts[i]
+            parts.extend(marks[pos:end])
+            i, pos = i + 1, end
+    return ''.join(parts)
+
+
+# -------- PIG LATIN
+def piglatin_word(word):
+    if not word.isalpha():
+        return word
+    word = word.lower()
+    if word[0] in "aeiou":
+        return word + "yay"
+    for i, c in enumerate(word):
+        if c in "aeiou":
+            return word[i:] + word[:i] + "ay"
+    return word + "ay"  # fallback
+
+@style("piglatin")
+def piglatin(text, seed=None):
+    # No randomness and words with punctuation stay as they are: a plain split will do
+    return ' '.join(map(piglatin_word, text.split()))
+
+
+# --------- KITTY
+KITTY_SOUNDS = [
+    "nya", "mew", "purr", "rawr", "nyaa", ":3", "^w^", "meow",
+    "nya~", "purr~", "paw", "hiss", "blep", "nom", "snuggle", "meow~",
+    "rawr~", "mew~", "kitten", "furr", "nyan", "cuddle"
+]
+
+@style("kitty")
+def kitty(text, seed=None):
+    rng = rng_for(seed)
+    # Words and punctuation marks as separate tokens
+    tokens = PIECE_RE.findall(text)
+    words = sum(1 for token in tokens if token.isalpha())
+    # Plus 1-3 extra kitten-like sounds dropped in at random places
+    inserts = rng.randint(1, 3)
+    sounds = rng.choices(KITTY_SOUNDS, k=words + inserts)
+    spots = sorted(rng.choices(range(len(tokens) + 1), k=inserts))
+
+    result = []
+    next_sound = inserts  # sounds[:inserts] are the insertions
+    spot = 0
+    for i, token in enumerate(tokens):
+        while spot < inserts and spots[spot] == i:
+            result.append(sounds[spot])
+            spot += 1
+        if token.isalpha():
+            result.append(sounds[next_sound])
+            next_sound += 1
+        else:
+            result.append(token)
+    result.extend(sounds[spot:inserts])
+    return ' '.join(result)
+
+
+# ---------- TOY
+TOY_PHRASES = [
+    "Toy is ready for playtime!",
+    "Toy loves being your toy~",
+    "Toy is waiting for instructions.",
+    "Toy would like to be punished.",
+    "Toy feels so happy when you use it!",
+    "Toy is happy to serve.",
+    "Toy does not want to be freed.",
+    "Toy is ready to please!",
+    "Toy is here for your enjoyment~",
+    "Toy cannot wait to be used!",
+    "Toy has no purpose but to please~",
+    "Toy loves being your little helper~",
+    "Toy is very happy in its toy suit!",
+    "Toy wants to be kept forever.",
+    "Toy is obedient and will follow your commands!",
+    "Toy is ready for its next task.",
+    "Toy will never disappoint.",
+    "Toy will be the best toy for you.",
+    "Toy conversion in progress...",
+    "Toy will never break or refuse.",
+    "Toy is here to make you smile!",
+    "Toy wants to play forever.",
+    "Toy would like to be punished",
+    "keep toy forever.",
+    "Toy is very happy in its toysuit",
+    "Toy does not want to be freed.",
+    "please don't let toy cum.",
+    "toy conversion in progress",
+    "please punish toy"
+]
+
+@style("toy")
+def toy(text, seed=None):
+    # Replaces the whole message
+    return rng_for(seed).choice(TOY_PHRASES)
+
+
+# ----------- YOUTUBE
+@style("youtube")
+def youtube(text, seed=None):
+    return f"https://www.youtube.com/watch?v={gag_base64(text)}"
+
+
+# ----------- SELMA
+SELMA_PHRASES = [
+    "omg",
+    "wait i forgot 🩷",
+    "wait",
+    "waitwait",
+    "waitwaitwait",
+    "wwait",
+    "WHAT",
+    "onnygomdgh",
+    "WRUFFWRUFFWERRUFFFF",
+    "i",
+    "no wait",
+    "WAIT",
+    "omgomgomgomgomgomg",
+    "nmghfmh",
+    "fmhhjjh",
+    "omynkfjgnmfdfgfb",
+    "nfgkl;dskjd,bfdk.jks,fgkljfd",
+    "wiait",
+    "wkwajggkmnfsk",
+    "✋",
+    "✋💪",
+    "💪",
+    "🙀",
+    ">fnjfbgfkjpdojfkgs",
+    "WWAIT",
+    "wa it",
+    "i think",
+    "shUSHH",
+    "shhushh>:(",
+    "shusjgjghfjgnghhhs",
+    "omyoygmgmymgkdhgshushhdhgngmdmgndjshhommdfkhmfmn",
+    "omhkdjgjjgnfmgdhghmdkdhghhwrufffwruff!",
+    "fuckguvfkcvkhkfgukccknfnndkksjf",
+    "omgjgomgudhhffgnnnnonno"
+]
+
+@style("selma")
+def selma(text, seed=None):
+    return rng_for(seed).choice(SELMA_PHRASES)
+
+
+# -------- CHKDJFL BKDJFLJSD
+CHIEF_BEEF_SPAM = [
+    "CHJDJDKFJS BEKJFDLSJ", "CHIEFJDKLSJFS BEEEFFFFFFFFF", "CHFJDLSKFJDSLFJS BFFJSDKL", "CHHFFFFJJJJFJK BEFSJDKFLJ",
+    "CKSJDKFJS CHHFFFBEBE", "CHFJDLSKJDF BEEFBEEEEE", "CHDKSJFDK BEFFKDL", "CHJDSKFJ BEEFJSKDFL",
+    "CHIEEFFJKLD BEFJDKLSJ", "CCHHHHFFFJJ BEEEEEEEEEEE", "CHHEHEJDKF BEEEEFFF", "CHDJKLS BEFEFEFJKLJ",
+    "CHEEEEFFFJJJJFJJ BEEEEEF", "CHFFFJJJDS BEEEEFGKJ", "CHHHHFJDK BEEEFFJKL", "CHIEEFFJ BEEEEFFFFJKD",
+    "CHHHHFJJ BEFJDJDJDK", "CHEFFJDKL BEEEEFFFFF", "CHFKDKFJ BEEEFFJKLDS", "CHHHHHFFFFJJJJ BEEEFFFF",
+    "CHEEKDLD BEEFJKLS", "CHFFJSKL BEEEFFJDLF", "CHFJSKLDJ BEEFFFJF", "CHIEEFJS BEEEFFFF",
+    "CHHHHFFFFF BEEEFFFFFJKLS", "CHJDKLJ BEEFFFKDK", "CHFJDKLFJ BEEFFJDKF", "CHFFFJDKL BEEEEFFFJ",
+    "CHHFJFJ BEEFJDKL", "CHFFFFJDJDJDJ BEEEFFFF", "CHHFFJJJJJ BEEEFFJDKF", "CHEEFJDKL BEFFJDSFJ",
+    "CHIEFFFFJK BEEFJJJJJ", "CHJDLSKJF BEEFJJDKF", "CHIEFFFJDJD BEEEFFFF", "CHFJKLSDFJ BEEEFFFFFJK",
+    "CHJJJFFF BEFJJJJKDK", "CHJDJDLSKJ BEEEFFFFFF", "CHEEFJKLDJ BEFFJKL", "CHIEEFFJD BEEFJKLSJ",
+    "CHFFJDKLSJ BEEEEFJKLJ", "CHEEFJKLD BEEEFFFJDK", "CHIEFFFJJJJJ BEEFJKLDJ", "CHHFFFFJJJ BEEFJDJDJ",
+    "CHIEFFFJDKL BEEFFFFF", "CHFFFFJDKL BEEFFJKDK", "CHJDSKLDJ BEEEFFFJDKL", "CHJDKLFJS BEEFJKLDSF",
+    "CHEEFFFJKLD BEEEFFFF", "CHFFFFJJJJ BEEFFFJDK", "CHEEFJDJDKL BEEFJDKLS", "CHJJFJDKLS BEEFFFDKLD",
+    "CHHFFFJKLJ BEEEFJKLJ", "CHJFDJKLFJ BEEEEFFDKJ", "CHIEFFFJDK BEEEFFFFFJK", "CHHEEEFFFJ BEEFJKDKD",
+    "CHEFJKLD BEEFJKLSJ", "CHIEFFFJ BEEEEFFFJDK", "CHHHFJKLS BEEEFFJKLDJ", "CHIEFFFFJKLD BEEFJDKLDJ",
+    "CHJDLKFJ BEEFJDKLFDJ", "CHFJDKLFJ BEEEFFFFJDK", "CHJJJJFFF BEEEFFFJKLJ", "CHIEFFFJKLJ BEEFJJJJJ",
+    "CHHHHFFJDKL BEEFFFJKLD", "CHFJDKL BEEFJJJKLD", "CHJJJFFFJ BEEEFJDKLJ", "CHFFFFFJ BEEEFFJKLDJ",
+    "CHIEJJJJJFFF BEEFJJDJDJ", "CHJJDJDKL BEEFFFF", "CHIEFFJDJDKL BEEFFJDKLF", "CHFJFJDKL BEEEFFJKLD",
+    "CHIEEFJFJDKL BEEFFJKLD", "CHIEFFFJKL BEEFFJKDL", "CHFJDKLJF BEEEFFFFJKLJ", "CHJJDKLJ BEEFFJKLDJ",
+    "CHJDKFJDKL BEEFFFFJKLD", "CHHHFJFJDK BEEFFJKLDJ", "CHFFFJJDKLF BEEFFFJKLD", "CHIEFFFJKLDJ BEEFJKLFD",
+    "CHFJFJDKLS BEEEFFFFJKD", "CHJJJFFFJKL BEEEFJKLD", "CHHHFFFJDKLF BEEFJKLFD", "CHEEFJDKLS BEEFFFJKLD",
+    "CHFJJJKL BEEFFFJDKLD", "CHJFJFJKL BEEFFJDKLSJ", "CHFFJJJKLD BEEFJKLDJ", "CHIEEFFFJDKLS BEEFJKLFDJ",
+    "CHJJJFFJDKL BEEEFFFFJK", "CHEEFJDKL BEEFFFFJKLJ", "CHFFFJJDKLSJ BEEEFFFF", "CHJDJDKLSJ BEEFFFFJDKL",
+    "CHEEFJKL BEEEFJKLDJ", "CHIEFFFJDKLSJ BEEEFFJKDL", "CHJFJDKLFJ BEEEFFJKLD", "CHJFJDKL BEEEFFJKDLS",
+    "CHIEEFFJDKL BEEFJKLDJF", "CHJFJFJKLDS BEEFJDKLDJ", "CHFFJJJKL BEEEFJKLDJ"
+]
+
+@style("chief_beef")
+def chief_beef(text, seed=None):
+    return rng_for(seed).choice(CHIEF_BEEF_SPAM)
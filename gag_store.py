@@ -0,0 +1,155 @@
+"""Expiring index of gag echoes, for the 💣/👁️/⬆️ reactions.
+
+Every echo used to get its own task sleeping 300s before clearing its
+reactions and forgetting the original message, and the originals were kept
+as per-guild tuples with no bound. GaggedMessageStore keeps one slotted
+record per echo, indexed by message id, and one min-heap of expiry times.
+A single sweeper task wakes at most every sweep_interval seconds, drops every
+record that has expired, and hands their clear_reactions calls to the
+outbound dispatcher grouped per channel.
+
+The store is capped by entry count and by (approximate) bytes; going over
+either evicts the oldest echoes first, which lose their controls early the
+same way expired ones do.
+
+    store = GaggedMessageStore(outbound, ttl=300)
+    store.add(message.guild.id, message.channel, gag_msg.id, message.author.id, message.content, webhook.id)
+    record = store.get(gag_msg.id)    # None once expired or removed
+    store.remove(gag_msg.id)
+"""
+import sys
+import time
+import heapq
+import asyncio
+
+
+class GaggedMessage:
+    __slots__ = ("message_id", "guild_id", "channel", "author_id", "content", "webhook_id", "expires", "size")
+
+    def __init__(self, message_id, guild_id, channel, author_id, content, webhook_id, expires):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel = channel        # Where the echo is (the thread, for threads)
+        self.author_id = author_id    # Who was gagged
+        self.content = content        # What they actually wrote
+        self.webhook_id = webhook_id  # Webhook that sent the echo, for reveal/hide edits
+        self.expires = expires
+        self.size = sys.getsizeof(self) + sys.getsizeof(content)
+
+
+class GaggedMessageStore:
+    def __init__(self, outbound, ttl: float = 300.0, max_entries: int = 20000,
+                 max_bytes: int = 16 * 1024 * 1024, sweep_interval: float = 5.0):
+        self.outbound = outbound  # OutboundDispatcher; clears the expired echoes' reactions
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._records = {}  # {message_id: GaggedMessage}
+        self._heap = []     # (expires, message_id); entries of removed records are skipped when popped
+        self._sweeper = None
+        self.bytes = 0
+        self.stats = {"added": 0, "removed": 0, "expired": 0, "evicted": 0, "sweeps": 0, "peak": 0}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, message_id):
+        return self.get(message_id) is not None
+
+    # --- Records ---
+
+    def add(self, guild_id, channel, message_id, author_id, content, webhook_id) -> GaggedMessage:
+        self.remove(message_id)
+        record = GaggedMessage(message_id, guild_id, channel, author_id, content, webhook_id, time.monotonic() + self.ttl)
+        self._records[message_id] = record
+        heapq.heappush(self._heap, (record.expires, message_id))
+        self.bytes += record.size
+        self.stats["added"] += 1
+        if len(self._records) > self.max_entries or self.bytes > self.max_bytes:
+            self._evict()
+        self.stats["peak"] = max(self.stats["peak"], len(self._records))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+        return record
+
+    def get(self, message_id):
+        """The record for a gag echo, or None if unknown or past its ttl."""
+        record = self._records.get(message_id)
+        if record is None or record.expires <= time.monotonic():
+            return None
+        return record
+
+    def remove(self, message_id):
+        record = self._records.pop(message_id, None)
+        if record is not None:
+            self.bytes -= record.size
+            self.stats["removed"] += 1
+            if len(self._heap) > 2 * len(self._records) + 64:
+                self._compact()
+        return record
+
+    def clear_guild(self, guild_id):
+        for message_id in [mid for mid, record in self._records.items() if record.guild_id == guild_id]:
+            self.remove(message_id)
+
+    def _compact(self):
+        """Rebuild the heap from the live records, dropping entries of removed ones."""
+        self._heap = [(record.expires, mid) for mid, record in self._records.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_head(self):
+        """Pop the heap's head; its record (now dropped), or None if it was already removed."""
+        expires, message_id = heapq.heappop(self._heap)
+        record = self._records.get(message_id)
+        if record is None or record.expires != expires:
+            return None
+        del self._records[message_id]
+        self.bytes -= record.size
+        return record
+
+    # --- Expiry ---
+
+    def _evict(self):
+        evicted = []
+        while len(self._records) > self.max_entries or self.bytes > self.max_bytes:
+            if not self._heap:
+                break
+            record = self._pop_head()
+            if record is not None:
+                evicted.append(record)
+        self.stats["evicted"] += len(evicted)
+        self._clear_reactions(evicted)
+
+    async def _sweep(self):
+        # The ttl is fixed, so nothing added later can expire before the heap's head
+        while self._heap:
+            delay = self._heap[0][0] - time.monotonic()
+            await asyncio.sleep(max(delay, self.sweep_interval))
+            now = time.monotonic()
+            expired = []
+            while self._heap and self._heap[0][0] <= now:
+                record = self._pop_head()
+                if record is not None:
+                    expired.append(record)
+            self.stats["sweeps"] += 1
+            self.stats["expired"] += len(expired)
+            self._clear_reactions(expired)
+
+    def _clear_reactions(self, records):
+        by_channel = {}
+        for record in records:
+            by_channel.setdefault(record.channel.id, (record.channel, []))[1].append(record.message_id)
+        for channel, message_ids in by_channel.values():
+            self.outbound.clear_reactions(channel, message_ids)
+
+    # --- Reporting ---
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (
+            f"💣 **Gag echoes:** {len(self._records)} tracked (peak {s['peak']}, cap {self.max_entries}), "
+            f"~{self.bytes / 1024:.0f}/{self.max_bytes / 1024:.0f} KiB, ttl {self.ttl:g}s | "
+            f"added `{s['added']}` removed `{s['removed']}` expired `{s['expired']}` evicted `{s['evicted']}` "
+            f"sweeps `{s['sweeps']}`"
+        )
@@ -0,0 +1,364 @@
+"""Versioned schema migrations for global.db and db/servers/*.db.
+
+Every database stores its schema version in PRAGMA user_version. A connection
+that is already at head costs a single PRAGMA read; anything older gets the
+missing numbered migrations applied in order, one transaction each.
+
+Run `python migrations.py --dry-run` to see what would be applied without
+touching any file.
+"""
+import os
+import sys
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SERVER_DB_DIR = os.path.join("db", "servers")
+GLOBAL_DB_PATH = os.path.join("db", "global.db")
+
+# [(version, description, fn(conn))], kept sorted by version
+SERVER_MIGRATIONS = []
+GLOBAL_MIGRATIONS = []
+
+# Cogs that existed when the cog toggle columns became a migration
+BUNDLED_COGS = ("gags", "prison", "pishock", "lovense")
+
+
+def server_migration(version, description):
+    def decorator(fn):
+        SERVER_MIGRATIONS.append((version, description, fn))
+        SERVER_MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def global_migration(version, description):
+    def decorator(fn):
+        GLOBAL_MIGRATIONS.append((version, description, fn))
+        GLOBAL_MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+# --- Helpers ---
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def head_version(migrations) -> int:
+    return migrations[-1][0] if migrations else 0
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, decl: str):
+    """ALTER TABLE ADD COLUMN that tolerates databases which already have it."""
+    if column not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def pending_migrations(conn: sqlite3.Connection, migrations) -> list:
+    current = get_version(conn)
+    return [m for m in migrations if m[0] > current]
+
+
+def migrate(conn: sqlite3.Connection, migrations, dry_run: bool = False) -> list:
+    """Bring conn up to head. Returns the [(version, description)] applied (or due, on dry run)."""
+    if get_version(conn) >= head_version(migrations):
+        return []
+
+    todo = pending_migrations(conn, migrations)
+    if dry_run:
+        return [(version, description) for version, description, _ in todo]
+
+    applied = []
+    for version, description, fn in todo:
+        if conn.in_transaction:
+            # The caller's pending writes (a pooled connection); BEGIN would fail inside them
+            conn.commit()
+        conn.execute("BEGIN")
+        try:
+            fn(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def migrate_server_db(conn: sqlite3.Connection) -> list:
+    return migrate(conn, SERVER_MIGRATIONS)
+
+
+def migrate_global_db(conn: sqlite3.Connection) -> list:
+    return migrate(conn, GLOBAL_MIGRATIONS)
+
+
+def ensure_cog_columns(conn: sqlite3.Connection, cogs) -> list:
+    """Add {cog}_enabled columns for cogs newer than the last migration. Returns the columns added."""
+    existing = set(table_columns(conn, "server_config"))
+    missing = [f"{cog}_enabled" for cog in cogs if f"{cog}_enabled" not in existing]
+    for column in missing:
+        conn.execute(f"ALTER TABLE server_config ADD COLUMN {column} INTEGER DEFAULT 1")
+    if missing:
+        conn.commit()
+    return missing
+
+
+# --- Bulk migration across server files ---
+
+def _migrate_file(path: str, dry_run: bool) -> list:
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if not dry_run:
+            conn.execute("PRAGMA journal_mode=WAL")
+        return migrate(conn, SERVER_MIGRATIONS, dry_run=dry_run)
+    finally:
+        conn.close()
+
+
+def migrate_all_servers(directory: str = SERVER_DB_DIR, dry_run: bool = False, workers: int = None) -> dict:
+    """Migrate every *.db in directory on a thread pool.
+
+    Returns {"head": int, "checked": int, "migrated": {path: [(version, description)]},
+    "errors": {path: str}}.
+    """
+    report = {"head": head_version(SERVER_MIGRATIONS), "checked": 0, "migrated": {}, "errors": {}}
+    if not os.path.isdir(directory):
+        return report
+
+    paths = [
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(".db")
+    ]
+    report["checked"] = len(paths)
+    if not paths:
+        return report
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrate") as pool:
+        futures = {pool.submit(_migrate_file, path, dry_run): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                applied = future.result()
+                if applied:
+                    report["migrated"][path] = applied
+            except Exception as e:
+                report["errors"][path] = str(e)
+    return report
+
+
+def format_report(report: dict, dry_run: bool = False, max_lines: int = 25) -> str:
+    verb = "would migrate" if dry_run else "migrated"
+    lines = [
+        f"🗄️ Server schema head: v{report['head']} | checked {report['checked']} DB(s), "
+        f"{verb} {len(report['migrated'])}, {len(report['errors'])} error(s)"
+    ]
+    details = [f"  ❌ {os.path.basename(path)}: {error}" for path, error in sorted(report["errors"].items())]
+    for path, applied in sorted(report["migrated"].items()):
+        steps = ", ".join(f"v{version} {description}" for version, description in applied)
+        details.append(f"  {os.path.basename(path)}: {steps}")
+    if max_lines is not None and len(details) > max_lines:
+        hidden = len(details) - max_lines
+        details = details[:max_lines] + [f"  ... and {hidden} more"]
+    return "\n".join(lines + details)
+
+
+# --- Server migrations ---
+
+@server_migration(1, "baseline schema")
+def _server_v1(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS gagged_users (
+        user_id INTEGER PRIMARY KEY, type TEXT, status TEXT DEFAULT 'active')''')
+    c.execute('''CREATE TABLE IF NOT EXISTS double_type_users (
+            user_id INTEGER PRIMARY KEY)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS prison_users (
+        user_id INTEGER PRIMARY KEY, channel_id INTEGER, balance INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_auth (
+        user_id INTEGER PRIMARY KEY, auth_level TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS cooldown_users (
+        user_id INTEGER PRIMARY KEY, cooldown INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS solitary_confinement (
+        user_id INTEGER PRIMARY KEY, thread_id INTEGER, archive_date TIMESTAMP)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS enforced_words (
+        user_id INTEGER, word TEXT, initial_time INTEGER, added_time INTEGER,
+        PRIMARY KEY(user_id, word))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS enforcement_offenses (
+        user_id INTEGER PRIMARY KEY, count INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS banned_words (
+        user_id INTEGER, word TEXT, initial_time INTEGER, added_time INTEGER,
+        PRIMARY KEY(user_id, word))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS ignored_users (user_id INTEGER PRIMARY KEY)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_settings (
+        user_id INTEGER PRIMARY KEY, enforcement_action TEXT DEFAULT 'timeout')''')
+    c.execute('''CREATE TABLE IF NOT EXISTS line_assignments (
+        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+        line TEXT, lines_required INTEGER, penalty_lines INTEGER DEFAULT 0,
+        last_submission TEXT, assigned_by INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS active_line_writers (
+        user_id INTEGER, line TEXT, lines_required INTEGER,
+        lines_written INTEGER DEFAULT 0, penalty_lines INTEGER DEFAULT 0,
+        assignment_id INTEGER, assigned_by INTEGER,
+        PRIMARY KEY (user_id, assignment_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_wallets (
+        user_id INTEGER PRIMARY KEY, balance INTEGER DEFAULT 1000)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS bets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, initiator_id INTEGER, opponent_id INTEGER,
+        amount INTEGER, game TEXT, status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS daily_claims (
+        user_id INTEGER PRIMARY KEY, last_claim TIMESTAMP, claim_count INTEGER DEFAULT 0, streak_days INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS timer_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+        timer_name TEXT, start_time TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS command_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+        command TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, arguments TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS allowed_users (
+        user_id INTEGER, channel_id INTEGER, PRIMARY KEY (user_id, channel_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS locked_users (
+        user_id INTEGER PRIMARY KEY, locked_by INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS pishock_users (
+        user_id INTEGER PRIMARY KEY,
+        code TEXT NOT NULL,
+        shock_min INTEGER DEFAULT 1 CHECK(shock_min BETWEEN 1 AND 100),
+        shock_max INTEGER DEFAULT 100 CHECK(shock_max BETWEEN 1 AND 100),
+        vibrate_min INTEGER DEFAULT 1 CHECK(vibrate_min BETWEEN 1 AND 100),
+        vibrate_max INTEGER DEFAULT 100 CHECK(vibrate_max BETWEEN 1 AND 100),
+        duration_min INTEGER DEFAULT 1 CHECK(duration_min BETWEEN 1 AND 15),
+        duration_max INTEGER DEFAULT 15 CHECK(duration_max BETWEEN 1 AND 15),
+        line_writing_shock_intensity INTEGER DEFAULT 50 CHECK(line_writing_shock_intensity BETWEEN 0 AND 100),
+        line_writing_shock_duration INTEGER DEFAULT 2 CHECK(line_writing_shock_duration BETWEEN 1 AND 15),
+        enforcement_action_shock_intensity INTEGER DEFAULT 50 CHECK(enforcement_action_shock_intensity BETWEEN 0 AND 100),
+        enforcement_action_shock_duration INTEGER DEFAULT 2 CHECK(enforcement_action_shock_duration BETWEEN 1 AND 15),
+        lightning_reaction_shock_intensity INTEGER DEFAULT 50 CHECK(lightning_reaction_shock_intensity BETWEEN 0 AND 100),
+        lightning_reaction_shock_duration INTEGER DEFAULT 2 CHECK(lightning_reaction_shock_duration BETWEEN 1 AND 15)
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS lovense_users (
+        user_id INTEGER PRIMARY KEY, token TEXT NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS solitary_pings (
+        thread_id INTEGER PRIMARY KEY, last_ping TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS bot_status (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, restart_status TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS pot (
+        id INTEGER PRIMARY KEY CHECK(id = 1), pot INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS command_bans (
+        user_id INTEGER PRIMARY KEY)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS nonbypass_users (
+        guild_id INTEGER,
+        user_id INTEGER,
+        PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS word_length_limits (
+            user_id INTEGER,
+            min_length INTEGER DEFAULT 0,
+            max_length INTEGER DEFAULT 0
+        )
+    ''')
+
+
+@server_migration(2, "indexes for hot lookups")
+def _server_v2(conn):
+    c = conn.cursor()
+    # command_logs: cleanup_old_logs (timestamp), commandlogs filters (user, command name)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_timestamp ON command_logs (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_user ON command_logs (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_command ON command_logs (LOWER(command))")
+    # leaderboard: ORDER BY balance DESC, user_id ASC LIMIT 10
+    c.execute("CREATE INDEX IF NOT EXISTS idx_user_wallets_balance ON user_wallets (balance DESC, user_id)")
+    # pending bets per game
+    c.execute("CREATE INDEX IF NOT EXISTS idx_bets_game_status ON bets (game, status)")
+    # line writing: by assignment and by assigner
+    c.execute("CREATE INDEX IF NOT EXISTS idx_line_assignments_assigned_by ON line_assignments (assigned_by)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_active_line_writers_assignment ON active_line_writers (assignment_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_active_line_writers_assigned_by ON active_line_writers (assigned_by)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_timer_logs_user ON timer_logs (user_id, timer_name)")
+
+
+# --- Global migrations ---
+
+@global_migration(1, "server_config table")
+def _global_v1(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS server_config (
+        guild_id INTEGER PRIMARY KEY,
+        prison_channel_id INTEGER,
+        line_writing_id INTEGER,
+        counting_id INTEGER,
+        gambling_id INTEGER,
+        solitary_role_id INTEGER,
+        prisoner_role_id INTEGER,
+        sc_role_id INTEGER,
+        botstatus_id INTEGER,
+        task_channel_id INTEGER,
+        log_channel_id INTEGER,
+        gags_enabled INTEGER DEFAULT 1,
+        prison_enabled INTEGER DEFAULT 1,
+        pishock_enabled INTEGER DEFAULT 1
+    )
+    ''')
+
+
+@global_migration(2, "server_config prefix and bundled cog columns")
+def _global_v2(conn):
+    add_column(conn, "server_config", "prefix", "TEXT DEFAULT '!>'")
+    for cog in BUNDLED_COGS:
+        add_column(conn, "server_config", f"{cog}_enabled", "INTEGER DEFAULT 1")
+
+
+@global_migration(3, "bot status, moderators, pot and log tables")
+def _global_v3(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS prison_status_last_sent (
+        guild_id INTEGER PRIMARY KEY, last_sent TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS bot_status (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, restart_status TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS moderators (
+        guild_id INTEGER, user_id INTEGER, PRIMARY KEY (guild_id, user_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS pot (
+        id INTEGER PRIMARY KEY CHECK(id = 1), pot INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS command_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER,
+        command TEXT, arguments TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+
+
+@global_migration(4, "command_logs indexes")
+def _global_v4(conn):
+    c = conn.cursor()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_timestamp ON command_logs (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_user ON command_logs (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_logs_command ON command_logs (LOWER(command))")
+
+
+
+@global_migration(5, "server_config word_normalization")
+def _global_v5(conn):
+    add_column(conn, "server_config", "word_normalization", "INTEGER DEFAULT 0")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or preview TetherBot schema migrations.")
+    parser.add_argument("--dry-run", action="store_true", help="Report pending migrations without applying them")
+    parser.add_argument("--workers", type=int, default=None, help="Worker threads for server DBs")
+    args = parser.parse_args()
+
+    if os.path.isfile(GLOBAL_DB_PATH):
+        global_conn = sqlite3.connect(GLOBAL_DB_PATH)
+        try:
+            applied = migrate(global_conn, GLOBAL_MIGRATIONS, dry_run=args.dry_run)
+        finally:
+            global_conn.close()
+        steps = ", ".join(f"v{version} {description}" for version, description in applied) or "at head"
+        print(f"🗄️ global.db (head v{head_version(GLOBAL_MIGRATIONS)}): {steps}")
+
+    report = migrate_all_servers(dry_run=args.dry_run, workers=args.workers)
+    print(format_report(report, dry_run=args.dry_run, max_lines=None))
+    sys.exit(1 if report["errors"] else 0)
@@ -14,8 +14,8 @@ import traceback
 import subprocess
 import asyncio
 import requests
-import pronouncing
 import zipfile
+import tempfile
 from datetime import datetime, timedelta, timezone
 from collections import deque
 
@@ -30,6 +30,15 @@ from gtts import gTTS
 
 # Custom project-specific import
 import shared
+import migrations
+import repositories
+import snapshots
+import storage
+import wordmatch
+import pipeline
+import classify
+from repositories import WalletRepository, RestrictionRepository, PishockRepository, LogRepository
+from pipeline import STOP
 from shared import (
     with_config,
     unpack_config,
@@ -52,20 +61,6 @@ ARCHIVE_DIR = "archive"
 os.makedirs(ARCHIVE_DIR, exist_ok=True)
 os.makedirs("cogs", exist_ok=True)
 
-# Assuming you have this global connection already
-global_conn = sqlite3.connect("db/global.db")
-
-def create_last_sent_table():
-    cur = global_conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS prison_status_last_sent (
-        guild_id INTEGER PRIMARY KEY,
-        last_sent TEXT
-    )
-    """)
-    global_conn.commit()
-
-
 async def run_launch_and_report(bot):
     proc = await asyncio.create_subprocess_exec(
         sys.executable, "launch.py",
@@ -90,22 +85,22 @@ async def run_launch_and_report(bot):
         await channel.send("✅ launch.py ran successfully with no errors.")
 
 def get_available_databases(bot):
-    dbs = {"Global (global)": "db/global.db"}
-    servers_path = "db/servers"
-    if os.path.isdir(servers_path):
-        for filename in os.listdir(servers_path):
-            if filename.endswith(".db"):
-                server_id = filename[:-3]
-                try:
-                    guild = bot.get_guild(int(server_id))
-                    name = guild.name if guild else f"Unknown Server"
-                    label = f"{name} ({server_id})"
-                    dbs[label] = os.path.join(servers_path, filename)
-                except Exception:
-                    continue
+    """{label: guild_id}, with None standing for global.db."""
+    dbs = {"Global (global)": None}
+    for server_id in shared.storage.guild_ids():
+        guild = bot.get_guild(server_id)
+        name = guild.name if guild else f"Unknown Server"
+        dbs[f"{name} ({server_id})"] = server_id
     return dbs
 
 
+def open_log_database(guild_id):
+    """Fresh connection to global.db (guild_id None) or a guild's tables."""
+    if guild_id is None:
+        return sqlite3.connect("db/global.db")
+    return shared.storage.connect(guild_id)
+
+
 
 # Autocomplete function for database names
 async def database_autocomplete(ctx: discord.AutocompleteContext):
@@ -113,20 +108,6 @@ async def database_autocomplete(ctx: discord.AutocompleteContext):
     return list(databases.keys())[:25]  # Discord limits choices to 25
 
 
-def ensure_prefix_column():
-    try:
-        shared.c.execute("PRAGMA table_info(server_config)")
-        existing_columns = [row[1] for row in shared.c.fetchall()]
-
-        if "prefix" not in existing_columns:
-            shared.c.execute("ALTER TABLE server_config ADD COLUMN prefix TEXT DEFAULT '!>'")
-            shared.conn.commit()
-            print("✅ Added 'prefix' column to server_config")
-    except Exception as e:
-        print(f"[ensure_prefix_column] Error: {e}")
-
-
-
 async def load_prefixes():
     shared.prefixes = {}  # Make sure this dict exists
 
@@ -282,6 +263,7 @@ async def column_autocomplete(ctx: AutocompleteContext):
 
 # ------------------- Configuration -------------------
 load_dotenv(dotenv_path="tetherbot.env")
+shared.storage = storage.from_env()
 
 # Read values from the environment
 BOT_TOKEN = os.getenv('BOT_TOKEN')
@@ -515,6 +497,10 @@ async def on_application_command_error(ctx, error):
 
 
 URL_REGEX = re.compile(r'https?://\S+')
+BYPASS_PREFIXES = ("((", "-# ((", "# ((", "Owo", "owo", "OWO")
+BYPASS_MARKERS = ("\u200b",)
+# Prefix, bypass, URL, custom emoji and trigger checks for a message in one scan
+message_classifier = classify.MessageClassifier(shared.TRIGGERS, BYPASS_PREFIXES, BYPASS_MARKERS)
 NITRO_EMOJI_REGEX = re.compile(r'<a?:\w+:\d+>')
 
 LOG_CHANNEL_ID = 1376990411742117919
@@ -537,8 +523,6 @@ async def on_ready():
     shared.c.execute("SELECT restart_status FROM bot_status WHERE id = 1")
     restart_status = shared.c.fetchone()
 
-
-    ensure_prefix_column()
     # Send online status if not a restart
     if not (restart_status and restart_status[0] == "restarting"):
         new_channel_name = "✅bot-online"
@@ -568,7 +552,7 @@ async def on_ready():
         shared.c.execute("UPDATE bot_status SET restart_status = NULL WHERE id = 1")
         shared.conn.commit()
 
-    # Ensure server_config columns exist
+    # Add toggle columns for cogs newer than the last migration
     ensure_cog_columns_from_files()
 
 
@@ -578,6 +562,9 @@ async def on_ready():
     if not process_command_logs.is_running():
         process_command_logs.start()
 
+    if not flush_write_behind.is_running():
+        flush_write_behind.start()
+
     
 
 
@@ -594,8 +581,7 @@ async def on_ready():
         
 
         # PiShock users (global dict)
-        cur.execute("SELECT user_id, code FROM pishock_users")
-        pishock_code = {row[0]: row[1] for row in cur.fetchall()}
+        pishock_code = PishockRepository(conn=db).codes()
         shared.user_pishock_codes[guild_id].update(pishock_code)
 
         # Prison users
@@ -650,6 +636,9 @@ async def on_ready():
         cur.execute("SELECT user_id FROM ignored_users")
         for row in cur.fetchall():
             shared.ignored_users[guild_id].add(row[0])
+
+        # Bypass channels and non-bypass users
+        shared.load_bypass_users(guild_id, db)
         
         cur.execute("SELECT user_id, min_length, max_length FROM word_length_limits")
         for row in cur.fetchall():
@@ -723,8 +712,7 @@ async def on_ready():
     # Final summary
     if not send_prison_status_periodically.is_running():
         send_prison_status_periodically.start()
-    
-    create_last_sent_table()
+
     print("✅ on_ready complete.")
 
 
@@ -739,6 +727,11 @@ async def on_typing(channel, user, when):
         await channel.send(f"{user.mention} I see you typing... 👀", delete_after=5)
     '''
 
+@bot.event
+async def on_webhooks_update(channel):
+    # Someone added/edited/deleted a webhook here; resolve ours again next time
+    shared.gag_webhooks.invalidate(channel.id)
+
 @bot.event
 async def on_message_edit(before, after):
     # Avoid bot messages and partials
@@ -747,966 +740,978 @@ async def on_message_edit(before, after):
     if before.content == after.content:
         return
 
+    if after.guild:
+        decision = edit_cache.check(after.channel.id, after.id, pipeline.content_key(after.content))
+        if decision == "same":
+            return
+        if decision == "debounce":
+            # Judge the burst once, on whatever the message says when it settles
+            edit_cache.defer(after.channel.id, after.id, lambda: recheck_edit(after))
+            return
+
     # Reuse your enforcement logic
     await on_message_or_edit(after, edited = True)
 
+async def recheck_edit(message):
+    latest = message.channel.get_partial_message(message.id)
+    try:
+        latest = await latest.fetch()
+    except discord.NotFound:
+        return  # Deleted while the edits settled
+    except discord.HTTPException:
+        latest = message
+    entry = edit_cache.get(latest.channel.id, latest.id)
+    if entry and entry[0] == pipeline.content_key(latest.content):
+        return
+    await on_message_or_edit(latest, edited = True)
+
 @bot.event
 async def on_message(message):
     await on_message_or_edit(message, edited = False)
 
 
-async def on_message_or_edit(message, edited: bool = False):
-    try:
+# --- Message pipeline ---
+# on_message_or_edit runs shared.message_pipeline: the stages below plus the
+# ones cogs register (prison at 700, gags at 800). A stage returns STOP to end
+# processing; otherwise the message falls through to bot.process_commands.
+# A stage that stops but still wants the message handled as a command sets
+# ctx.run_commands instead of calling process_commands itself: the pipeline
+# runs inside the author's lane, commands run after it is released.
 
-        if not message.author.bot and message.guild:
-             # ✅ Load server-specific database
-            guild_id = message.guild.id
-            user_id = message.author.id
-            db = shared.get_server_db(guild_id)
-            c = db.cursor()
-            config = shared.get_server_config(message.guild.id)  # or message.guild.id
-            conn = c.connection
+message_pipeline = shared.message_pipeline
+message_lanes = shared.message_lanes
+outbound = shared.outbound
+edit_cache = shared.edit_cache
 
 
+@message_pipeline.loader("guild_id")
+def _ctx_guild_id(ctx):
+    return ctx.message.guild.id if ctx.message.guild else None
 
-            if not config:
-                if message.author.guild_permissions.administrator:
-                    try:
-                        await message.author.send(
-                            f"⚠️ No configuration found for **{message.guild.name}**.\n"
-                            f"Please use `/setup_ids` in your server to set the required channels and roles."
-                            f"Also join the support server for more information and help setting up this bot. https://discord.gg/zeESfuRMf8"
-                        )
-                    except discord.Forbidden:
-                        # User has DMs off or blocked the bot
-                        pass
-                return
+@message_pipeline.loader("user_id")
+def _ctx_user_id(ctx):
+    return ctx.message.author.id
 
-            # Now your variables match the original names
-            (
-                PRISON_CHANNEL_ID,
-                LINE_WRITING_ID,
-                COUNTING_ID,
-                GAMBLING_ID,
-                SOLITARY_ROLE_ID,
-                PRISONER_ROLE_ID,
-                SC_ROLE_ID,
-                BOTSTATUS_ID,
-                TASK_CHANNEL_ID,
-                LOG_CHANNEL_ID
-            ) = shared.unpack_config_from_obj(config)
+@message_pipeline.loader("channel_id")
+def _ctx_channel_id(ctx):
+    return ctx.message.channel.id
 
-            if message.channel.id == LOG_CHANNEL_ID:
-                await bot.process_commands(message)
-                return
+@message_pipeline.loader("config")
+def _ctx_config(ctx):
+    return shared.get_server_config(ctx.guild_id)
 
-        shared.returnvar = False
-        global bot_paused
+@message_pipeline.loader("db")
+def _ctx_db(ctx):
+    # Stages await with it in hand; checked out until the pipeline run ends
+    db = shared.acquire_server_db(ctx.guild_id)
+    ctx.on_close(lambda: shared.release_server_db(db, rollback=ctx.failed))
+    return db
 
-        if bot_paused and not message.content.startswith('!>pause'):
-            return  # Ignore all messages except the unpause command
-        
-        if message.author.bot:
-            return
-        
-        original_author = message.author
-        original_content = message.content
-        user_id = message.author.id
-        guild_id = message.guild.id if message.guild else None
+@message_pipeline.loader("c")
+def _ctx_cursor(ctx):
+    return ctx.db.cursor()
 
-        # If user has a pending silent command in this guild:
-        key = (message.guild.id if message.guild else None, message.author.id)
+@message_pipeline.loader("adb")
+def _ctx_adb(ctx):
+    return shared.db(ctx.guild_id)  # off-loop writes
 
-        if key in shared.pending_silent_commands:
-            # Prevent recursion
-            if getattr(shared, "silent_command_running", False):
-                # If flag is set, we're already running a silent command, skip to normal processing
-                return await bot.process_commands(message)
+@message_pipeline.loader("prefix")
+def _ctx_prefix(ctx):
+    return get_prefix(bot, ctx.message)
 
-            shared.silent_command_running = True
-            try:
-                run_as, silent_cmd = shared.pending_silent_commands[key]
+@message_pipeline.loader("msg_class")
+def _ctx_msg_class(ctx):
+    return message_classifier.classify(ctx.message, ctx.prefix)
 
-                if message.guild and message.guild.id == key[0]:
-                    run_as = message.author
-                    original_author = message.author
-                    original_content = message.content
+@message_pipeline.loader("is_command")
+def _ctx_is_command(ctx):
+    return ctx.msg_class.is_command
 
-                    try:
-                        message.author = run_as
-                        message.content = silent_cmd
+@message_pipeline.loader("content")
+def _ctx_content(ctx):
+    return ctx.message.content.lower()
 
-                        ctx = await bot.get_context(message)
-                        original_ctx_author = ctx.author
-                        ctx.author = run_as
-                        del shared.pending_silent_commands[key]
-                        await bot.invoke(ctx)
+@message_pipeline.loader("triggers")
+def _ctx_triggers(ctx):
+    return ctx.msg_class.triggers
 
-                    finally:
-                        # Restore everything
-                        message.author = original_author
-                        message.content = original_content
-                        ctx.author = original_ctx_author
+@message_pipeline.loader("con_line")
+def _ctx_con_line(ctx):
+    return ctx.message.content.strip()  # The line the user typed
 
+@message_pipeline.loader("forced_filtered")
+def _ctx_forced_filtered(ctx):
+    # Skip forced filter logic if message is in DMs
+    if not ctx.message.guild:
+        return False
+    return ctx.user_id in shared.nonbypass_users[ctx.guild_id]
+
+@message_pipeline.loader("match_content")
+def _ctx_match_content(ctx):
+    # Word checks match against the message normalized once, if the guild opted in
+    if shared.is_word_normalization_enabled(ctx.guild_id):
+        return wordmatch.normalize(ctx.message.content)
+    return ctx.content
+
+
+def is_fast_path_message(message, special_channels, msg_class) -> bool:
+    """True if a guild message needs nothing from on_message_or_edit but command processing."""
+    guild_id = message.guild.id
+    user_id = message.author.id
+    return not (
+        shared.is_restricted(guild_id, user_id)
+        or user_id == RESTRICTED_USER_ID
+        or (guild_id, user_id) in shared.pending_silent_commands
+        or message.channel.id in special_channels
+        or message.thread is not None
+        or message.type not in (discord.MessageType.default, discord.MessageType.reply)
+        or msg_class.media or msg_class.bypass or msg_class.triggers
+        or bot.user in message.mentions
+    )
 
 
-            finally:
-                shared.silent_command_running = False
-        
-        
-        if "*click*" in message.content.lower() or "*clicks*" in message.content.lower():
-            mp3_file_path = "non-suspicious sound.mp3"
-            
-            # Check if the mp3 file exists and send it if it does
-            if os.path.exists(mp3_file_path):
-                # Rename the file when sending (without changing the original filename in the directory)
-                await message.channel.send(file=discord.File(mp3_file_path, filename="wruf.mp3"))
-                return
+async def on_message_or_edit(message, edited: bool = False):
+    if message.author.bot:
+        return
+    try:
+        # One message per (guild, user) at a time, in order; other users run concurrently
+        async with message_lanes.lane((message.guild.id if message.guild else None, message.author.id)):
+            ctx = await message_pipeline.run(message, edited)
+            if message.guild and ctx.stopped_by != "fast_path":
+                # Fast-path messages are cheap to re-run, so only slow-path verdicts are kept
+                edit_cache.record(message.channel.id, message.id, pipeline.content_key(message.content), ctx.stopped_by)
+        # Slow follow-ups (PiShock calls, silent commands) the stages left for after the lane
+        for deferred in ctx.deferred:
+            await deferred()
+        if ctx.stopped_by is None or ctx.run_commands:
+            await bot.process_commands(message)
+    except Exception as e:
+        tb = traceback.format_exc()
 
+        # Use your log_error_to_channels function, adapted for message context
+        try:
+            await log_error_to_channels(
+                bot=bot,
+                error=e,
+                context_label="[on_message_or_edit]",
+                guild=message.guild,
+                user=message.author,
+                extra_info=tb
+            )
+        except Exception as log_exc:
+            print(f"Failed to log error: {log_exc}")
 
-        if "!>bark" in message.content.lower() or "!>bork" in message.content.lower():
-            bark_file_path = "bark.png"
-            if os.path.exists(bark_file_path):
-                await message.channel.send(file=discord.File(bark_file_path, filename="bark.png"))
-                return
+        # Notify in channel with a brief message
+        await message.channel.send(
+            f"❌ An error occurred: `{type(e).__name__}: {e}`",
+            delete_after=15
+        )
 
-        if "!>rigged" in message.content.lower() or "!>unfair" in message.content.lower():
-            rigged_file_path = "rigged.png"
-            if os.path.exists(rigged_file_path):
-                await message.channel.send(file=discord.File(rigged_file_path, filename="rigged.png"))
-                return
 
-        if "*collar*" in message.content.lower() or "!>collar" in message.content.lower():
-            collar_file_path = "collar.mp3"
-            
-            # Check if the mp3 file exists and send it if it does
-            if os.path.exists(collar_file_path):
-                # Rename the file when sending (without changing the original filename in the directory)
-                await message.channel.send(file=discord.File(collar_file_path, filename="jingle.mp3"))
-                return
+@message_pipeline.stage("config", order=100, needs=("config", "channel_id"))
+async def config_stage(ctx):
+    message = ctx.message
+    config = ctx.config
 
+    if not config:
+        if message.author.guild_permissions.administrator:
+            try:
+                await message.author.send(
+                    f"⚠️ No configuration found for **{message.guild.name}**.\n"
+                    f"Please use `/setup_ids` in your server to set the required channels and roles."
+                    f"Also join the support server for more information and help setting up this bot. https://discord.gg/zeESfuRMf8"
+                )
+            except discord.Forbidden:
+                # User has DMs off or blocked the bot
+                pass
+        return STOP
 
-        if (
-            message.attachments and 
-            message.author.id == 1146469921270792326 and 
-            isinstance(message.channel, discord.DMChannel)
-        ):
-            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    if ctx.channel_id == config.LOG_CHANNEL_ID:
+        ctx.run_commands = True
+        return STOP
 
-            for attachment in message.attachments:
-                filename = attachment.filename.lower()
 
-                try:
-                    # Handle database update
-                    if filename.endswith(".db"):
-                        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
-                        os.makedirs("archive", exist_ok=True)
-
-                        if filename == "global.db":
-                            # Backup and replace global DB
-                            shutil.copy("db/global.db", f"archive/global_{timestamp}.db")
-                            await attachment.save("db/global.db")
-                            await message.channel.send("✅ Global database updated and archived.")
-
-                        elif filename.isdigit() and os.path.exists(f"db/servers/{filename}"):
-                            # Backup and replace a known server DB
-                            shutil.copy(f"db/servers/{filename}", f"archive/{filename[:-3]}_{timestamp}.db")
-                            await attachment.save(f"db/servers/{filename}")
-                            await message.channel.send(f"✅ Server DB `{filename}` updated and archived.")
-
-                        else:
-                            # Save unknown/new DB files in db/
-                            await attachment.save(f"db/{filename}")
-                            await message.channel.send(f"📦 Unknown DB `{filename}` saved to `db/`.")
-
-                    # Handle Python files
-                    elif filename.endswith(".py"):
-                        if filename == "muzzled.py" or filename == "muzzled_reset.py":
-                            shutil.copy("muzzled.py", f"archive/muzzled_{timestamp}.py")
-                            await attachment.save("muzzled.py")
-                            await message.channel.send("✅ muzzled.py updated. Restarting...")
-                            subprocess.Popen([sys.executable, "launch.py"])
-                            sys.exit(0)
-                        elif filename == "muzzled_safe.py":
-                            await attachment.save("muzzled_safe.py")
-                            await message.channel.send("✅ muzzled_safe.py updated in the main folder.")
-                        elif filename == "watchdog.py":
-                            await attachment.save("watchdog.py")
-                            await message.channel.send("✅ watchdog.py updated in the main folder.")
-                        elif filename == "launch.py":
-                            await attachment.save("launch.py")
-                            await message.channel.send("✅ launch.py updated in the main folder.") 
-                        elif filename == "launch_safe.py":
-                            await attachment.save("launch_safe.py")
-                            await message.channel.send("✅ launch_safe.py updated in the main folder.")                       
-
-                        elif filename == "shared.py":
-                            await attachment.save("shared.py")
-                            await message.channel.send("✅ shared.py updated in the main folder.")
-                        else:
-                            cog_path = os.path.join("cogs", filename)
-                            await attachment.save(cog_path)
-                            await message.channel.send(f"✅ Python file `{filename}` saved to `cogs/`.")
-
-                    elif filename == "disabled_cogs.json":
-                        shutil.copy("disabled_cogs.json", f"archive/disabled_cogs_{timestamp}.json")
-                        await attachment.save("disabled_cogs.json")
-                        await message.channel.send("✅ `disabled_cogs.json` updated and archived.")
-
-                    # Handle .env file
-                    elif filename.endswith(".env"):
-                        shutil.copy("tetherbot.env", f"archive/tetherbot_{timestamp}.env")
-                        await attachment.save("tetherbot.env")
-                        await message.channel.send("✅ `.env` file saved as `tetherbot.env` and archived.")
-                        subprocess.Popen([sys.executable, "launch.py"])
-                        sys.exit(0)
+@message_pipeline.stage("paused", order=110, guild_only=False)
+async def paused_stage(ctx):
+    if bot_paused and not ctx.message.content.startswith('!>pause'):
+        return STOP  # Ignore all messages except the unpause command
 
-                    # Default handler
-                    else:
-                        save_path = os.path.join(os.getcwd(), attachment.filename)
-                        await attachment.save(save_path)
-                        await message.channel.send(f"✅ File `{attachment.filename}` saved.")
-                        subprocess.Popen([sys.executable, "launch.py"])
-                        sys.exit(0)
 
-                except Exception as e:
-                    await message.channel.send(f"❌ Failed to process `{filename}`: {e}")
-                    
+@message_pipeline.stage("fast_path", order=120, needs=("config", "msg_class"))
+async def fast_path_stage(ctx):
+    # Unrestricted users outside the game/line-writing channels go straight to
+    # command processing with no DB access
+    config = ctx.config
+    special_channels = (config.COUNTING_ID, config.LINE_WRITING_ID, config.GAMBLING_ID)
+    if is_fast_path_message(ctx.message, special_channels, ctx.msg_class):
+        shared.message_path_stats["fast"] += 1
+        ctx.run_commands = True
+        return STOP
+    shared.message_path_stats["slow"] += 1
+
+
+@message_pipeline.stage("silent_command", order=200, guild_only=False)
+async def silent_command_stage(ctx):
+    message = ctx.message
+
+    # If user has a pending silent command in this guild:
+    key = (message.guild.id if message.guild else None, message.author.id)
+
+    if key in shared.pending_silent_commands:
+        # Prevent recursion
+        if getattr(shared, "silent_command_running", False):
+            # If flag is set, we're already running a silent command, skip to normal processing
+            ctx.run_commands = True
+            return STOP
+
+        if message.guild and message.guild.id == key[0]:
+            _, silent_cmd = shared.pending_silent_commands.pop(key)
+            # Commands can wait on replies; run it once the author's lane is released
+            ctx.after_lane(lambda: run_silent_command(message, silent_cmd))
+
+
+async def run_silent_command(message, silent_cmd):
+    """Invoke `silent_cmd` as if the author had sent it instead of `message`."""
+    shared.silent_command_running = True
+    original_content = message.content
+    try:
+        message.content = silent_cmd
+        await bot.invoke(await bot.get_context(message))
+    finally:
+        # Restore everything
+        message.content = original_content
+        shared.silent_command_running = False
 
 
+@message_pipeline.stage("triggers", order=300, needs=("triggers",), guild_only=False)
+async def triggers_stage(ctx):
+    # First trigger (in shared.TRIGGERS order) whose file is present wins
+    for trigger in ctx.triggers:
+        if trigger.stage != "triggers":
+            continue
+        file = shared.media.file(trigger.asset, trigger.filename)
+        if file:
+            await ctx.message.channel.send(file=file)
+            return STOP
 
-        if bot.user in message.mentions:
-            await message.add_reaction("<:goofy:1367975113835810816>")
 
+@message_pipeline.stage("file_deploy", order=310, guild_only=False)
+async def file_deploy_stage(ctx):
+    message = ctx.message
 
-            # Skip messages that just created threads
-        if message.thread is not None:
-            return  # message was used to create a thread
+    if (
+        message.attachments and
+        message.author.id == 1146469921270792326 and
+        isinstance(message.channel, discord.DMChannel)
+    ):
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
 
-        if message.type not in (discord.MessageType.default, discord.MessageType.reply):
-            return
+        for attachment in message.attachments:
+            filename = attachment.filename.lower()
 
+            try:
+                # Handle database update
+                if filename.endswith(".db"):
+                    is_server_db = filename[:-3].isdigit() and shared.storage.has_guild(int(filename[:-3]))
+
+                    if filename == "global.db" or is_server_db:
+                        # Archive the live DB, then swap the upload in through the backup API
+                        upload_path = f"db/.upload_{timestamp}_{filename}"
+                        await attachment.save(upload_path)
+                        try:
+                            before = await shared.restore_database(
+                                upload_path, int(filename[:-3]) if is_server_db else None
+                            )
+                        finally:
+                            os.remove(upload_path)
+                        label = "Global database" if filename == "global.db" else f"Server DB `{filename}`"
+                        await message.channel.send(
+                            f"✅ {label} updated and archived (snapshot `{before.get('stamp', 'none')}`)."
+                        )
 
+                    else:
+                        # Save unknown/new DB files in db/
+                        await attachment.save(f"db/{filename}")
+                        await message.channel.send(f"📦 Unknown DB `{filename}` saved to `db/`.")
+
+                # Handle Python files
+                elif filename.endswith(".py"):
+                    if filename == "muzzled.py" or filename == "muzzled_reset.py":
+                        shutil.copy("muzzled.py", f"archive/muzzled_{timestamp}.py")
+                        await attachment.save("muzzled.py")
+                        await message.channel.send("✅ muzzled.py updated. Restarting...")
+                        subprocess.Popen([sys.executable, "launch.py"])
+                        sys.exit(0)
+                    elif filename == "muzzled_safe.py":
+                        await attachment.save("muzzled_safe.py")
+                        await message.channel.send("✅ muzzled_safe.py updated in the main folder.")
+                    elif filename == "watchdog.py":
+                        await attachment.save("watchdog.py")
+                        await message.channel.send("✅ watchdog.py updated in the main folder.")
+                    elif filename == "launch.py":
+                        await attachment.save("launch.py")
+                        await message.channel.send("✅ launch.py updated in the main folder.")
+                    elif filename == "launch_safe.py":
+                        await attachment.save("launch_safe.py")
+                        await message.channel.send("✅ launch_safe.py updated in the main folder.")
+
+                    elif filename == "shared.py":
+                        await attachment.save("shared.py")
+                        await message.channel.send("✅ shared.py updated in the main folder.")
+                    else:
+                        cog_path = os.path.join("cogs", filename)
+                        await attachment.save(cog_path)
+                        await message.channel.send(f"✅ Python file `{filename}` saved to `cogs/`.")
+
+                elif filename == "disabled_cogs.json":
+                    shutil.copy("disabled_cogs.json", f"archive/disabled_cogs_{timestamp}.json")
+                    await attachment.save("disabled_cogs.json")
+                    await message.channel.send("✅ `disabled_cogs.json` updated and archived.")
+
+                # Handle .env file
+                elif filename.endswith(".env"):
+                    shutil.copy("tetherbot.env", f"archive/tetherbot_{timestamp}.env")
+                    await attachment.save("tetherbot.env")
+                    await message.channel.send("✅ `.env` file saved as `tetherbot.env` and archived.")
+                    subprocess.Popen([sys.executable, "launch.py"])
+                    sys.exit(0)
+
+                # Default handler
+                else:
+                    save_path = os.path.join(os.getcwd(), attachment.filename)
+                    await attachment.save(save_path)
+                    await message.channel.send(f"✅ File `{attachment.filename}` saved.")
+                    subprocess.Popen([sys.executable, "launch.py"])
+                    sys.exit(0)
 
-            
-    #    if random.randint(1, 1_000_000_000_000) == 1:
-    #        user = await bot.fetch_user(927628071706689636)
-    #        await message.guild.ban(user)
-    #        await message.channel.send(f"🔨 Against all odds, user `{user}` (`{user.id}`) has been banned.")
-    #        return
-        # Skip forced filter logic if message is in DMs
-        if not message.guild:
-            forced_filtered = False
-        else:
-            db = shared.get_server_db(guild_id)
-            c = db.cursor()
-            c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (message.guild.id, message.author.id))
-            forced_filtered = c.fetchone() is not None
-
-
-        alt_server_command = False
-
-        user_id = message.author.id
-        prefix = get_prefix(bot, message)  # call your prefix function properly
-        is_command = message.content.startswith(prefix)
-        content = message.content.lower()
-        con_line = message.content.strip()
-        channel_id = message.channel.id
-
-        bypass_triggers = (
-            message.content.startswith("((") or
-            message.content.startswith("-# ((") or
-            message.content.startswith("# ((") or
-            "​" in message.content or
-            message.content.startswith("Owo") or
-            message.content.startswith("owo") or
-            message.content.startswith("OWO")
-        )
+            except Exception as e:
+                await message.channel.send(f"❌ Failed to process `{filename}`: {e}")
 
 
+@message_pipeline.stage("mention", order=320, guild_only=False)
+async def mention_stage(ctx):
+    if bot.user in ctx.message.mentions:
+        await ctx.message.add_reaction("<:goofy:1367975113835810816>")
 
-        # Check for media content
-        has_media = message.attachments or message.stickers
 
-        if message.content.startswith("!>") and prefix != "!>":
-            return
+@message_pipeline.stage("message_filter", order=330, guild_only=False, needs=("prefix", "msg_class", "forced_filtered"))
+async def message_filter_stage(ctx):
+    message = ctx.message
 
-        if not forced_filtered and (bypass_triggers or has_media):
-            return  # Ignore message if bypassing and not force-filtered
-        
+    # Skip messages that just created threads
+    if message.thread is not None:
+        return STOP  # message was used to create a thread
 
-        if not message.guild:
-            return
+    if message.type not in (discord.MessageType.default, discord.MessageType.reply):
+        return STOP
 
-        author = message.author  # guaranteed to be a Member now
+    msg_class = ctx.msg_class
 
+    if msg_class.default_prefix and ctx.prefix != "!>":
+        return STOP
 
+    if not ctx.forced_filtered and (msg_class.bypass or msg_class.media):
+        return STOP  # Ignore message if bypassing and not force-filtered
 
-        # Annoying mock feature (reactions)
-        if (
-            message.guild and 
-            message.guild.id == TEST_SERVER_ID and 
-            message.author.id == 927628071706689636 and
-            False
-        ):
-            await message.add_reaction("⬆️")
-            await message.add_reaction("<:goofy:1367975113835810816>")
-            await message.add_reaction("🇧")
-            await message.add_reaction("🇷")
-            await message.add_reaction("🇦")
-            await message.add_reaction("🇹")
-
-        # Command delay for same user, test server only
-        if (
-            is_command and 
-            message.guild and 
-            message.guild.id == TEST_SERVER_ID and 
-            message.author.id == 927628071706689636 and
-            False
-        ):
-            await asyncio.sleep(14)
+    if not message.guild:
+        return STOP
 
 
-        
-        if not is_command and URL_REGEX.search(content):
-            return
-        
-        #Quick Chat
-        if message.author.id == RESTRICTED_USER_ID and not is_command:
-            content = message.content.strip()
+@message_pipeline.stage("url_filter", order=340, needs=("is_command", "msg_class"))
+async def url_filter_stage(ctx):
+    if not ctx.is_command and ctx.msg_class.has_url:
+        return STOP
 
-            if content not in ALLOWED_QUICK_CHAT:
-                try:
-                    await message.delete()
-                    await message.channel.send(
-                        f"{message.author.mention} ❌ Only Rocket League quick chat phrases are allowed!",
-                        delete_after=60
-                    )
-                except Exception as e:
-                    await log_error_to_channels(
-                        bot=bot,
-                        guild=message.guild,
-                        channel=message.channel,
-                        user=message.author,
-                        error=e,
-                        context_label="allowed quick chat error"
-                    )
 
-        if "!>sluppy" in message.content.lower() or "!>frshwtr" in message.content.lower():
-            await message.delete()
-            silly_file_path = "dog-silly.gif"
-            if os.path.exists(silly_file_path):
-                await message.channel.send(file=discord.File(silly_file_path, filename="dog-silly.gif"))
-                await message.channel.send(
-                        f"-# Credit goes to floofy for stealing the gif from another server",
-                        delete_after=1
-                    )
-            return
+@message_pipeline.stage("quick_chat", order=350, needs=("is_command",))
+async def quick_chat_stage(ctx):
+    message = ctx.message
 
+    #Quick Chat
+    if message.author.id == RESTRICTED_USER_ID and not ctx.is_command:
+        content = message.content.strip()
 
+        if content not in ALLOWED_QUICK_CHAT:
+            outbound.delete(message)
+            outbound.warn(
+                message.channel, message.author.id,
+                f"{message.author.mention} ❌ Only Rocket League quick chat phrases are allowed!",
+                delete_after=60, kind="quick_chat"
+            )
 
-        # Ensure required variables are defined early
-        user = message.author
-        guild_id = message.guild.id
 
-        # Counting game logic
-        counting_game = shared.counting_game[guild_id]
+@message_pipeline.stage("sluppy", order=360, needs=("triggers",))
+async def sluppy_stage(ctx):
+    message = ctx.message
 
-        if counting_game["active"] and channel_id == COUNTING_ID and not is_command:
-            expected = counting_game["count"] + 1
-            result = safe_eval(message.content)
+    trigger = next((t for t in ctx.triggers if t.stage == "sluppy"), None)
+    if trigger:
+        await message.delete()
+        file = shared.media.file(trigger.asset, trigger.filename)
+        if file:
+            await message.channel.send(file=file)
+            await message.channel.send(
+                    f"-# Credit goes to floofy for stealing the gif from another server",
+                    delete_after=1
+                )
+        return STOP
 
-            if result != expected:
-                await message.add_reaction("❌")
-                await message.channel.send(f"❌ Incorrect number! Expected `{expected}`. Challenge failed.")
-                counting_game["active"] = False
-                shared.clear_freedom_pot(guild_id)
-                shared.counting_game[guild_id] = counting_game
-                return
 
-            if user_id == counting_game["last_user_id"]:
-                await message.add_reaction("❌")
-                await message.channel.send("⛔ You cannot count twice in a row! Your second number did not count.")
-                await message.channel.send(f"The next number is `{expected}`.")
-                shared.counting_game[guild_id] = counting_game
-                return
+@message_pipeline.stage("counting", order=400, needs=("guild_id", "user_id", "channel_id", "config", "is_command"))
+async def counting_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
 
-            if result == expected:
-                await message.add_reaction("✅")
-                shared.counting_game[guild_id] = counting_game
+    # Counting game logic
+    counting_game = shared.counting_game[guild_id]
 
-            # Update state directly (no need to reassign)
-            counting_game["count"] += 1
-            counting_game["last_user_id"] = user_id
-            counting_game["participants"].add(user_id)
+    if counting_game["active"] and ctx.channel_id == ctx.config.COUNTING_ID and not ctx.is_command:
+        expected = counting_game["count"] + 1
+        result = safe_eval(message.content)
+
+        if result != expected:
+            await message.add_reaction("❌")
+            await message.channel.send(f"❌ Incorrect number! Expected `{expected}`. Challenge failed.")
+            counting_game["active"] = False
+            shared.clear_freedom_pot(guild_id)
             shared.counting_game[guild_id] = counting_game
+            return STOP
 
-            if counting_game["count"] >= COUNT_TO:
-                counting_game["active"] = False
-                shared.counting_game[guild_id] = counting_game
-                now = time.time()
-                pot = shared.get_freedom_pot(guild_id)
-                duration = min(pot * SECONDS_PER_BUCK, MAX_FREEDOM_DURATION)
+        if user_id == counting_game["last_user_id"]:
+            await message.add_reaction("❌")
+            await message.channel.send("⛔ You cannot count twice in a row! Your second number did not count.")
+            await message.channel.send(f"The next number is `{expected}`.")
+            shared.counting_game[guild_id] = counting_game
+            return STOP
 
-                for pid in shared.prison_users[guild_id]:
-                    shared.temporarily_freed[guild_id][pid] = now + duration
+        if result == expected:
+            await message.add_reaction("✅")
+            shared.counting_game[guild_id] = counting_game
 
-                await message.channel.send(
-                    f"🎉 Challenge complete! All prisoners are freed for {pot * SECONDS_PER_BUCK:.0f} seconds."
-                )
-                shared.clear_freedom_pot(guild_id)
+        # Update state directly (no need to reassign)
+        counting_game["count"] += 1
+        counting_game["last_user_id"] = user_id
+        counting_game["participants"].add(user_id)
+        shared.counting_game[guild_id] = counting_game
 
-            return
+        if counting_game["count"] >= COUNT_TO:
+            counting_game["active"] = False
+            shared.counting_game[guild_id] = counting_game
+            now = time.time()
+            pot = shared.get_freedom_pot(guild_id)
+            duration = min(pot * SECONDS_PER_BUCK, MAX_FREEDOM_DURATION)
 
-        # Gambling or other passive interaction blocking
-        if not is_command:
-            if channel_id == GAMBLING_ID:
-                guild_players = shared.players.get(guild_id, [])
-                guild_queue = shared.queue.get(guild_id, [])
+            for pid in shared.prison_users[guild_id]:
+                shared.temporarily_freed[guild_id][pid] = now + duration
 
-                if user in guild_players or user in guild_queue:
-                    return
-            
+            await message.channel.send(
+                f"🎉 Challenge complete! All prisoners are freed for {pot * SECONDS_PER_BUCK:.0f} seconds."
+            )
+            shared.clear_freedom_pot(guild_id)
+
+        return STOP
+
+
+@message_pipeline.stage("gambling", order=410, needs=("guild_id", "user_id", "channel_id", "config", "is_command"))
+async def gambling_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+    user = message.author
+
+    # Gambling or other passive interaction blocking
+    if not ctx.is_command:
+        if ctx.channel_id == ctx.config.GAMBLING_ID:
+            guild_players = shared.players.get(guild_id, [])
+            guild_queue = shared.queue.get(guild_id, [])
+
+            if user in guild_players or user in guild_queue:
+                return STOP
+
+        if shared.is_bypass_allowed(guild_id, user_id, ctx.channel_id):
+            return STOP
+
+        if user_id in shared.user_pishock_codes[guild_id] and not user.bot:
+            if random.random() < 0.2:  # 20% chance
+                # Cosmetic: low priority, dropped if the channel is backed up
+                outbound.react(message, '⚡')
+
+
+@message_pipeline.stage("line_writing_penalty", order=500, needs=("guild_id", "user_id", "channel_id", "config", "is_command", "adb", "db"))
+async def line_writing_penalty_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+    user = message.author
+    LINE_WRITING_ID = ctx.config.LINE_WRITING_ID
+
+    # Line writing penalty check
+    if (
+        not ctx.is_command and
+        user_id in shared.line_writing_sessions[guild_id] and
+        ctx.channel_id != LINE_WRITING_ID
+    ):
+        adb = ctx.adb
+        row = await adb.fetchone(
+            "SELECT line, lines_required, lines_written, penalty_lines FROM active_line_writers WHERE user_id = ?",
+            (user_id,)
+        )
 
-            c.execute(
-                "SELECT 1 FROM allowed_users WHERE user_id = ? AND channel_id = ?",
-                (user_id, channel_id)
+        if row:
+            expected_line, lines_required, lines_written, penalty = row
+            # Progress is write-behind; the session holds the live count
+            session = shared.line_writing_sessions[guild_id][user_id]
+            lines_written = session.get("lines_written", lines_written)
+
+            # Apply penalty directly to database value
+            new_required = lines_required + penalty
+            session["lines_required"] = new_required
+
+            await adb.execute(
+                "UPDATE active_line_writers SET lines_required = ? WHERE user_id = ?",
+                (new_required, user_id)
             )
-            if c.fetchone():
-                return
 
-            if user_id in shared.user_pishock_codes[guild_id] and not user.bot:
-                if random.random() < 0.2:  # 20% chance
-                    try:
-                        await message.add_reaction('⚡')
-                    except discord.errors.Forbidden:
-                        await log_error_to_channels(
-                            bot=bot,
-                            guild=message.guild,
-                            channel=message.channel,
-                            user=message.author,
-                            error=e,
-                            context_label="missing permissions to add bolt reaction"
-                        )
+            await message.channel.send(
+                f"⚠️ {user.mention}, you typed outside the line-writing channel. "
+                f"You've been penalized with **{penalty} more lines**!"
+            )
 
+            # PiShock penalty
+            if user_id in shared.user_pishock_codes.get(guild_id, {}) and shared.pishock_command:
+                try:
+                    row = PishockRepository(conn=ctx.db).shock_for(user_id, "line_writing")
 
-                    except Exception as e:
+                    if not row:
                         await log_error_to_channels(
                             bot=bot,
-                            error=e,
-                            context_label="Error adding reaction",
-                            guild=message.guild,
-                            user=message.author
+                            error=f"No line writing settings for user {user_id}",
+                            context_label="PiShock settings missing",
+                            guild=guild_id,        # pass the relevant guild object here if you have it
+                            user=user_id           # pass the relevant user object here if you have it
                         )
 
+                        return STOP
 
+                    intensity, duration = row
 
-        # Line writing penalty check
-        if (
-            not is_command and
-            user_id in shared.line_writing_sessions[guild_id] and
-            channel_id != LINE_WRITING_ID
-        ):
-            c.execute(
-                "SELECT line, lines_required, lines_written, penalty_lines FROM active_line_writers WHERE user_id = ?",
-                (user_id,)
-            )
-            row = c.fetchone()
+                    ctx.after_lane(lambda: shared.pishock_and_announce(
+                        guild_id, user_id, intensity, duration,
+                        message.channel, f"⚡ Shocked {user.display_name} for typing in wrong channel!"
+                    ))
+                except Exception as e:
+                    print(f"[PiShock] Error triggering line writing shock: {e}")
+
+
+            # Send updated line count
+            writing_channel = message.guild.get_channel(LINE_WRITING_ID)
+            if writing_channel:
+                remaining = new_required - lines_written
+                await writing_channel.send(f"{user.mention}, now you must write **{remaining} more lines**.")
+
+        return STOP
+
+
+@message_pipeline.stage("line_writing", order=510, needs=("guild_id", "user_id", "channel_id", "config", "is_command", "con_line", "adb", "db"))
+async def line_writing_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+    user = message.author
+
+    # Line writing progress logic
+    if (
+        not ctx.is_command and
+        ctx.channel_id == ctx.config.LINE_WRITING_ID and
+        user_id in shared.line_writing_sessions[guild_id]
+    ):
+        adb = ctx.adb
+        row = await adb.fetchone(
+            "SELECT line, lines_required, lines_written, penalty_lines FROM active_line_writers WHERE user_id = ?",
+            (user_id,)
+        )
 
-            if row:
-                expected_line, lines_required, lines_written, penalty = row
+        if row:
+            expected_line, lines_required, lines_written, penalty = row
+            expected_line = expected_line.strip()
+            # Progress is write-behind; the session holds the live count
+            session = shared.line_writing_sessions[guild_id][user_id]
+            lines_written = session.get("lines_written", lines_written)
+
+            if ctx.con_line == expected_line:
+                if ctx.edited:
+                    await message.channel.send("Do not try and cheat with edited messages!!")
+                    await message.add_reaction("❌")
+                    return STOP
 
-                # Apply penalty directly to database value
-                new_required = lines_required + penalty
+                lines_written += 1
+                session["lines_written"] = lines_written
+                await message.add_reaction("✅")
 
-                c.execute(
-                    "UPDATE active_line_writers SET lines_required = ? WHERE user_id = ?",
-                    (new_required, user_id)
+                shared.write_behind.mark(
+                    guild_id, ("active_line_writers", user_id),
+                    "UPDATE active_line_writers SET lines_written = ? WHERE user_id = ?",
+                    (lines_written, user_id)
                 )
-                c.connection.commit()
 
-                await message.channel.send(
-                    f"⚠️ {user.mention}, you typed outside the line-writing channel. "
-                    f"You've been penalized with **{penalty} more lines**!"
+                # VC clicker bonus
+                if user_id in clicker_users and random.randint(1, 10) == 1:
+                    voice_state = user.voice
+                    if voice_state and voice_state.channel:
+                        voice_client = discord.utils.get(bot.voice_clients, guild=message.guild)
+                        if voice_client and not voice_client.is_playing():
+                            try:
+                                buffer = shared.media.buffer("click")
+                                if buffer is None:
+                                    raise FileNotFoundError("non-suspicious sound.mp3")
+                                audio = discord.FFmpegPCMAudio(buffer, pipe=True)
+                                # Don't wait for the click to finish: this runs inside the writer's lane
+                                voice_client.play(audio, after=lambda e: e and print(f"[Voice] Playback error: {e}"))
+                            except Exception as e:
+                                print(f"[Voice] Playback error: {e}")
+                    else:
+                        file = shared.media.file("click")
+                        if file:
+                            await message.channel.send(file=file, delete_after = 10)
+
+            else:
+                lines_required += penalty
+                session["lines_required"] = lines_required
+                await message.add_reaction("❌")
+
+                await adb.execute(
+                    "UPDATE active_line_writers SET lines_required = ? WHERE user_id = ?",
+                    (lines_required, user_id)
                 )
 
-                # PiShock penalty
                 if user_id in shared.user_pishock_codes.get(guild_id, {}) and shared.pishock_command:
                     try:
-                        c = shared.get_server_db(guild_id).cursor()
-                        c.execute("""
-                            SELECT line_writing_shock_intensity, line_writing_shock_duration
-                            FROM pishock_users WHERE user_id = ?
-                        """, (user_id,))
-                        row = c.fetchone()
+                        row = PishockRepository(conn=ctx.db).shock_for(user_id, "line_writing")
 
                         if not row:
-                            await log_error_to_channels(
-                                bot=bot,
-                                error=f"No line writing settings for user {user_id}",
-                                context_label="PiShock settings missing",
-                                guild=guild_id,        # pass the relevant guild object here if you have it
-                                user=user_id           # pass the relevant user object here if you have it
-                            )
-
-                            return
+                            print(f"[PiShock] No line writing settings for user {user_id}")
+                            return STOP
 
                         intensity, duration = row
 
-                        result = shared.pishock_command(guild_id, user_id, op=0, intensity=intensity, duration=duration)
-                        if result.get("Success"):
-                            await message.channel.send(f"⚡ Shocked {user.display_name} for typing in wrong channel!")
-                        else:
-                            print(f"[PiShock] Failure: {result.get('Message')}")
+                        ctx.after_lane(lambda: shared.pishock_and_announce(
+                            guild_id, user_id, intensity, duration,
+                            message.channel, f"⚡ Shocked {user.display_name} for incorrect line!"
+                        ))
                     except Exception as e:
                         print(f"[PiShock] Error triggering line writing shock: {e}")
 
 
-                # Send updated line count
-                writing_channel = message.guild.get_channel(LINE_WRITING_ID)
-                if writing_channel:
-                    remaining = new_required - lines_written
-                    await writing_channel.send(f"{user.mention}, now you must write **{remaining} more lines**.")
-
-            return
-
-
-        con_line = message.content.strip()  # The line the user typed
-
-        # Line writing progress logic
-        if (
-            not is_command and
-            channel_id == LINE_WRITING_ID and
-            user_id in shared.line_writing_sessions[guild_id]
-        ):
-            c.execute(
-                "SELECT line, lines_required, lines_written, penalty_lines FROM active_line_writers WHERE user_id = ?",
-                (user_id,)
-            )
-            row = c.fetchone()
-
-            if row:
-                expected_line, lines_required, lines_written, penalty = row
-                expected_line = expected_line.strip()
-
-                if con_line == expected_line:
-                    if edited:
-                        await message.channel.send("Do not try and cheat with edited messages!!")
-                        await message.add_reaction("❌")
-                        return
-
-                    lines_written += 1
-                    await message.add_reaction("✅")
+            remaining = lines_required - lines_written
 
-                    c.execute(
-                        "UPDATE active_line_writers SET lines_written = ? WHERE user_id = ?",
-                        (lines_written, user_id)
-                    )
-                    c.connection.commit()
-
-                    # VC clicker bonus
-                    if user_id in clicker_users and random.randint(1, 10) == 1:
-                        voice_state = user.voice
-                        if voice_state and voice_state.channel:
-                            voice_client = discord.utils.get(bot.voice_clients, guild=message.guild)
-                            if voice_client and not voice_client.is_playing():
-                                try:
-                                    audio = discord.FFmpegPCMAudio("non-suspicious sound.mp3")
-                                    voice_client.play(audio)
-                                    while voice_client.is_playing():
-                                        await asyncio.sleep(1)
-                                except Exception as e:
-                                    print(f"[Voice] Playback error: {e}")
-                        else:
-                            mp3_file_path = "non-suspicious sound.mp3"
-                            if os.path.exists(mp3_file_path):
-                                await message.channel.send(file=discord.File(mp3_file_path), delete_after = 10)
+            if remaining <= 0:
+                shared.write_behind.forget(guild_id, "active_line_writers", user_id)
+                await adb.execute("DELETE FROM active_line_writers WHERE user_id = ?", (user_id,))
+                del shared.line_writing_sessions[guild_id][user_id]
+                await message.channel.send(f"🎉 {user.mention} has completed their assigned lines!")
 
-                else:
-                    lines_required += penalty
-                    await message.add_reaction("❌")
+        return STOP
 
-                    c.execute(
-                        "UPDATE active_line_writers SET lines_required = ? WHERE user_id = ?",
-                        (lines_required, user_id)
-                    )
-                    c.connection.commit()
 
-                    if user_id in shared.user_pishock_codes.get(guild_id, {}) and shared.pishock_command:
-                        try:
-                            c.execute("""
-                                SELECT line_writing_shock_intensity, line_writing_shock_duration
-                                FROM pishock_users WHERE user_id = ?
-                            """, (user_id,))
-                            row = c.fetchone()
+@message_pipeline.stage("prisoner_line_commands", order=520, needs=("guild_id", "user_id", "channel_id", "config", "is_command"))
+async def prisoner_line_commands_stage(ctx):
+    # Special check to allow processing commands during line writing
+    if (
+        ctx.user_id in shared.prison_users[ctx.guild_id] and
+        ctx.channel_id == ctx.config.LINE_WRITING_ID and
+        ctx.user_id in shared.line_writing_sessions[ctx.guild_id] and
+        not ctx.is_command
+    ):
+        ctx.run_commands = True
+        return STOP
 
-                            if not row:
-                                print(f"[PiShock] No line writing settings for user {user_id}")
-                                return
 
-                            intensity, duration = row
+@message_pipeline.stage("double_type", order=600, needs=("guild_id", "user_id", "is_command"))
+async def double_type_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
 
-                            result = shared.pishock_command(guild_id, user_id, op=0, intensity=intensity, duration=duration)
-                            if result.get("Success"):
-                                await message.channel.send(f"⚡ Shocked {user.display_name} for incorrect line!")
-                            else:
-                                print(f"[PiShock] Failure: {result.get('Message')}")
-                        except Exception as e:
-                            print(f"[PiShock] Error triggering line writing shock: {e}")
+    # Suppose this is your set of users who must double-type
+    if user_id in shared.double_type_users[guild_id] and not ctx.is_command:
+        last = shared.pending_confirm[guild_id].get(user_id)
 
+        if last == message.content:
+            # Confirmed on second try — allow message
+            shared.pending_confirm[guild_id].pop(user_id, None)
 
-                remaining = lines_required - lines_written
 
-                if remaining <= 0:
-                    c.execute("DELETE FROM active_line_writers WHERE user_id = ?", (user_id,))
-                    c.connection.commit()
-                    del shared.line_writing_sessions[guild_id][user_id]
-                    await message.channel.send(f"🎉 {user.mention} has completed their assigned lines!")
+        else:
+            # First attempt — delete and store
+            shared.pending_confirm[guild_id][user_id] = message.content
+            outbound.delete(message)
+            outbound.warn(
+                message.channel, user_id, f"{message.author.mention} Say it again to confirm.",
+                delete_after=3, kind="double_type"
+            )
+            return STOP
 
-            return
 
+async def warn_after_shock(message, shock, warning, delete_after, kind):
+    """Queue an enforcement warning once its PiShock shock has gone out, with the outcome appended."""
+    intensity, duration = shock
+    try:
+        result = await shared.pishock(message.guild.id, message.author.id, op=0, intensity=intensity, duration=duration)
+        if result.get("Success"):
+            warning += f"⚡ Shocked for enforcement. "
+        else:
+            warning += f"⚠️ PiShock failed: {result.get('Message')} "
+    except Exception as e:
+        warning += f"⚠️ PiShock error: {e} "
+    outbound.warn(message.channel, message.author.id, warning, delete_after=delete_after, kind=kind)
+
+
+@message_pipeline.stage("enforced_words", order=610, needs=("guild_id", "user_id", "is_command", "match_content", "c"))
+async def enforced_words_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+
+    # ---------- ENFORCED WORDS ----------
+    if not ctx.is_command and user_id in shared.enforced_words[guild_id]:
+        c = ctx.c
+        required_words = set(shared.enforced_words[guild_id][user_id].keys())
+        found_words = shared.word_matcher("enforced", guild_id, user_id).find(ctx.match_content)
+
+        if found_words != required_words:
+            outbound.delete(message)
+
+            missing = required_words - found_words
+            total_timeout = 0
+
+            for word in missing:
+                word_data = shared.enforced_words[guild_id][user_id].get(word, {})
+                initial = word_data.get("initial_time", 60)
+                added = word_data.get("added_time", 30)
+                new_initial = initial + added
+                total_timeout += new_initial
+                shared.enforced_words[guild_id][user_id][word]["initial_time"] = new_initial
+                shared.write_behind.mark(
+                    guild_id, ("enforced_words", user_id, word),
+                    "UPDATE enforced_words SET initial_time = ? WHERE user_id = ? AND word = ?",
+                    (new_initial, user_id, word)
+                )
 
+            # Track offenses
+            offenses = shared.enforcement_offenses[guild_id].get(user_id, 0) + 1
+            shared.enforcement_offenses[guild_id][user_id] = offenses
+            shared.write_behind.mark(
+                guild_id, ("enforcement_offenses", user_id),
+                "INSERT OR REPLACE INTO enforcement_offenses (user_id, count) VALUES (?, ?)",
+                (user_id, offenses)
+            )
 
+            actions = get_user_enforcement_action(user_id, c)
+            warning = f"⚠️ {message.author.mention} Missing words: {', '.join(missing)}. "
 
-        # Special check to allow processing commands during line writing
-        if (
-            user_id in shared.prison_users[guild_id] and
-            channel_id == LINE_WRITING_ID and
-            user_id in shared.line_writing_sessions[guild_id] and
-            not is_command
-        ):
-            await bot.process_commands(message)
-            return
+            if "timeout" in actions:
+                try:
+                    until = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
+                    await outbound.call(f"guild:{guild_id}", lambda: message.author.timeout(until))
+                    expiry = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
+                    timestamp = int(expiry.timestamp())  # Convert to Unix timestamp
+                    warning += f"Timed out for {total_timeout}s. Will return in <t:{timestamp}:R> "
+                except Exception:
+                    warning += "❌ Could not timeout. "
 
-        content = message.content.lower()
+            if "cooldown" in actions:
+                added_cd = sum(
+                    shared.enforced_words[guild_id][user_id][w].get("added_time", 30)
+                    for w in missing
+                )
+                shared.cooldown_users[guild_id][user_id] = shared.cooldown_users[guild_id].get(user_id, 0) + added_cd
+                shared.last_message_times[guild_id][user_id] = time.time()
 
-        # Suppose this is your set of users who must double-type
-        if user_id in shared.double_type_users[guild_id] and not is_command:
-            last = shared.pending_confirm[guild_id].get(user_id)
+                shared.write_behind.mark(
+                    guild_id, ("cooldown_users", user_id),
+                    "INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)",
+                    (user_id, shared.cooldown_users[guild_id][user_id])
+                )
+            shock = None
+            if "pishock" in actions and shared.pishock_command:
+                try:
+                    shock = PishockRepository(conn=c.connection).shock_for(user_id, "enforcement_action")
+                    if not shock:
+                        warning += "⚠️ PiShock not configured. "
 
-            if last == message.content:
-                # Confirmed on second try — allow message
-                shared.pending_confirm[guild_id].pop(user_id, None)
+                except Exception as e:
+                    warning += f"⚠️ PiShock error: {e} "
 
+            if "gag" in actions and shared.enforcement_gag_send:
+                gag_type = RestrictionRepository(conn=c.connection).gag_type(user_id)
+                await shared.enforcement_gag_send(message, gag_type)
 
+            delete_after = total_timeout if "timeout" in actions else 120
+            if shock:
+                # The shock's outcome goes in the warning; wait for PiShock outside the lane
+                ctx.after_lane(lambda: warn_after_shock(message, shock, warning, delete_after, "enforced_words"))
             else:
-                # First attempt — delete and store
-                shared.pending_confirm[guild_id][user_id] = message.content
-                await message.delete()
-                warning = await message.channel.send(
-                    f"{message.author.mention} Say it again to confirm.",
-                    delete_after=3
+                outbound.warn(message.channel, user_id, warning, delete_after=delete_after, kind="enforced_words")
+            return STOP
+
+
+@message_pipeline.stage("banned_words", order=620, needs=("guild_id", "user_id", "is_command", "match_content", "c"))
+async def banned_words_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+
+    # ---------- BANNED WORDS ----------
+    if not ctx.is_command and user_id in shared.banned_words[guild_id]:
+        triggered = shared.word_matcher("banned", guild_id, user_id).find(ctx.match_content)
+
+        if triggered:
+            c = ctx.c
+            outbound.delete(message)
+
+            total_timeout = 0
+            for word in triggered:
+                word_data = shared.banned_words[guild_id][user_id].get(word, {})
+                initial = word_data.get("initial_time", 60)
+                added = word_data.get("added_time", 30)
+                new_initial = initial + added
+                total_timeout += new_initial
+                shared.banned_words[guild_id][user_id][word]["initial_time"] = new_initial
+
+                shared.write_behind.mark(
+                    guild_id, ("banned_words", user_id, word),
+                    "UPDATE banned_words SET initial_time = ? WHERE user_id = ? AND word = ?",
+                    (new_initial, user_id, word)
                 )
-                return
 
-        # ---------- ENFORCED WORDS ----------
-        if not is_command and user_id in shared.enforced_words[guild_id]:
-            required_words = set(shared.enforced_words[guild_id][user_id].keys())
-            found_words = {w for w in required_words if w in content}
+            # Offense count
+            offenses = shared.enforcement_offenses[guild_id].get(user_id, 0) + 1
+            shared.enforcement_offenses[guild_id][user_id] = offenses
+            shared.write_behind.mark(
+                guild_id, ("enforcement_offenses", user_id),
+                "INSERT OR REPLACE INTO enforcement_offenses (user_id, count) VALUES (?, ?)",
+                (user_id, offenses)
+            )
+
+            actions = get_user_enforcement_action(user_id, c)
+            warning = f"⛔ {message.author.mention} Triggered banned words: {', '.join(triggered)}. "
 
-            if found_words != required_words:
+            if "timeout" in actions:
                 try:
-                    await message.delete()
-                except:
-                    pass
-
-                missing = required_words - found_words
-                total_timeout = 0
-
-                for word in missing:
-                    word_data = shared.enforced_words[guild_id][user_id].get(word, {})
-                    initial = word_data.get("initial_time", 60)
-                    added = word_data.get("added_time", 30)
-                    new_initial = initial + added
-                    total_timeout += new_initial
-
-                    shared.enforced_words[guild_id][user_id][word]["initial_time"] = new_initial
-                    c.execute(
-                        "UPDATE enforced_words SET initial_time = ? WHERE user_id = ? AND word = ?",
-                        (new_initial, user_id, word)
-                    )
+                    until = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
+                    await outbound.call(f"guild:{guild_id}", lambda: message.author.timeout(until))
+                    expiry = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
+                    timestamp = int(expiry.timestamp())  # Convert to Unix timestamp
+                    warning += f"Timed out for {total_timeout}s. Will return in <t:{timestamp}:R> "
+                except Exception:
+                    warning += "❌ Could not timeout. "
 
-                # Track offenses
-                offenses = shared.enforcement_offenses[guild_id].get(user_id, 0) + 1
-                shared.enforcement_offenses[guild_id][user_id] = offenses
-                c.execute(
-                    "INSERT OR REPLACE INTO enforcement_offenses (user_id, count) VALUES (?, ?)",
-                    (user_id, offenses)
+            if "cooldown" in actions:
+                added_cd = sum(
+                    shared.banned_words[guild_id][user_id][w].get("added_time", 30)
+                    for w in triggered
                 )
+                shared.cooldown_users[guild_id][user_id] = shared.cooldown_users[guild_id].get(user_id, 0) + added_cd
+                shared.last_message_times[guild_id][user_id] = time.time()
 
-                actions = get_user_enforcement_action(user_id, c)
-                warning = f"⚠️ {message.author.mention} Missing words: {', '.join(missing)}. "
-
-                if "timeout" in actions:
-                    try:
-                        await message.author.timeout(
-                            datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
-                        )
-                        expiry = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
-                        timestamp = int(expiry.timestamp())  # Convert to Unix timestamp
-                        warning += f"Timed out for {total_timeout}s. Will return in <t:{timestamp}:R> "
-                    except Exception:
-                        warning += "❌ Could not timeout. "
-
-                if "cooldown" in actions:
-                    added_cd = sum(
-                        shared.enforced_words[guild_id][user_id][w].get("added_time", 30)
-                        for w in missing
-                    )
-                    shared.cooldown_users[guild_id][user_id] = shared.cooldown_users[guild_id].get(user_id, 0) + added_cd
-                    shared.last_message_times[guild_id][user_id] = time.time()
-
-                    c.execute(
-                        "INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)",
-                        (user_id, shared.cooldown_users[guild_id][user_id])
-                    )
-                if "pishock" in actions and shared.pishock_command:
-                    try:
-                        c.execute("""
-                            SELECT enforcement_action_shock_intensity, enforcement_action_shock_duration
-                            FROM pishock_users WHERE user_id = ?
-                        """, (user_id,))
-                        row = c.fetchone()
-
-                        if row:
-                            intensity, duration = row
-                            result = shared.pishock_command(guild_id, user_id, op=0, intensity=intensity, duration=duration)
-                            if result.get("Success"):
-                                warning += f"⚡ Shocked for enforcement. "
-                            else:
-                                warning += f"⚠️ PiShock failed: {result.get('Message')} "
-                        else:
-                            warning += "⚠️ PiShock not configured. "
-
-                    except Exception as e:
-                        warning += f"⚠️ PiShock error: {e} "
-
-                if "gag" in actions and shared.enforcement_gag_send:
-                    c.execute("SELECT type FROM gagged_users WHERE user_id = ?", (user_id,))
-                    result = c.fetchone()
-                    gag_type = result[0] if result else "loose"
-                    await shared.enforcement_gag_send(message, gag_type)
-
-                c.connection.commit()
-                if "timeout" in actions:
-                    await message.channel.send(warning, delete_after=total_timeout)
-                else:
-                    await message.channel.send(warning, delete_after=120)
-                return
-
-
-
-        # ---------- BANNED WORDS ----------
-        if not is_command and user_id in shared.banned_words[guild_id]:
-            triggered = {w for w in shared.banned_words[guild_id][user_id] if w in content}
+                shared.write_behind.mark(
+                    guild_id, ("cooldown_users", user_id),
+                    "INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)",
+                    (user_id, shared.cooldown_users[guild_id][user_id])
+                )
 
-            if triggered:
+            shock = None
+            if "pishock" in actions and shared.pishock_command:
                 try:
-                    await message.delete()
-                except:
-                    pass
-
-                total_timeout = 0
-                for word in triggered:
-                    word_data = shared.banned_words[guild_id][user_id].get(word, {})
-                    initial = word_data.get("initial_time", 60)
-                    added = word_data.get("added_time", 30)
-                    new_initial = initial + added
-                    total_timeout += new_initial
-                    shared.banned_words[guild_id][user_id][word]["initial_time"] = new_initial
-
-                    c.execute(
-                        "UPDATE banned_words SET initial_time = ? WHERE user_id = ? AND word = ?",
-                        (new_initial, user_id, word)
-                    )
+                    shock = PishockRepository(conn=c.connection).shock_for(user_id, "enforcement_action")
+                    if not shock:
+                        warning += "⚠️ PiShock not configured. "
 
-                # Offense count
-                offenses = shared.enforcement_offenses[guild_id].get(user_id, 0) + 1
-                shared.enforcement_offenses[guild_id][user_id] = offenses
-                c.execute(
-                    "INSERT OR REPLACE INTO enforcement_offenses (user_id, count) VALUES (?, ?)",
-                    (user_id, offenses)
-                )
+                except Exception as e:
+                    warning += f"⚠️ PiShock error: {e} "
 
-                actions = get_user_enforcement_action(user_id, c)
-                warning = f"⛔ {message.author.mention} Triggered banned words: {', '.join(triggered)}. "
+            if "gag" in actions and shared.enforcement_gag_send:
+                gag_type = RestrictionRepository(conn=c.connection).gag_type(user_id)
+                await shared.enforcement_gag_send(message, gag_type)
 
-                if "timeout" in actions:
-                    try:
-                        await message.author.timeout(
-                            datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
-                        )
-                        expiry = datetime.now(timezone.utc) + timedelta(seconds=total_timeout)
-                        timestamp = int(expiry.timestamp())  # Convert to Unix timestamp
-                        warning += f"Timed out for {total_timeout}s. Will return in <t:{timestamp}:R> "
-                    except Exception:
-                        warning += "❌ Could not timeout. "
-
-                if "cooldown" in actions:
-                    added_cd = sum(
-                        shared.banned_words[guild_id][user_id][w].get("added_time", 30)
-                        for w in triggered
+            delete_after = total_timeout if "timeout" in actions else 120
+            if shock:
+                # The shock's outcome goes in the warning; wait for PiShock outside the lane
+                ctx.after_lane(lambda: warn_after_shock(message, shock, warning, delete_after, "banned_words"))
+            else:
+                outbound.warn(message.channel, user_id, warning, delete_after=delete_after, kind="banned_words")
+
+            return STOP
+
+
+@message_pipeline.stage("word_length", order=630, needs=("guild_id", "user_id", "is_command", "content"))
+async def word_length_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
+
+    # ---------- WORD LENGTH LIMIT CHECK ----------
+    if not ctx.is_command and user_id in shared.word_length_limits[guild_id]:
+        limit_data = shared.word_length_limits[guild_id][user_id]
+        min_len = limit_data.get("min_length", 0)
+        max_len = limit_data.get("max_length", 0)
+
+        # Skip check if nothing enforced
+        if min_len > 0 or max_len > 0:
+            words = [w.strip(string.punctuation) for w in ctx.content.split()]
+            for w in words:
+                lw = len(w)
+                if (min_len > 0 and lw < min_len) or (max_len > 0 and lw > max_len):
+                    outbound.delete(message)
+
+                    # Format clearer message
+                    limit_text = []
+                    if min_len > 0:
+                        limit_text.append(f"≥ {min_len}")
+                    if max_len > 0:
+                        limit_text.append(f"≤ {max_len}")
+                    rule_text = " and ".join(limit_text)
+
+                    outbound.warn(
+                        message.channel, user_id,
+                        f"{message.author.mention} ❌ Invalid word length! "
+                        f"Each word must be {rule_text} characters long.",
+                        delete_after=8, kind="word_length"
                     )
-                    shared.cooldown_users[guild_id][user_id] = shared.cooldown_users[guild_id].get(user_id, 0) + added_cd
-                    shared.last_message_times[guild_id][user_id] = time.time()
+                    return STOP
 
-                    c.execute(
-                        "INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)",
-                        (user_id, shared.cooldown_users[guild_id][user_id])
-                    )
 
-                if "pishock" in actions and shared.pishock_command:
-                    try:
-                        c.execute("""
-                            SELECT enforcement_action_shock_intensity, enforcement_action_shock_duration
-                            FROM pishock_users WHERE user_id = ?
-                        """, (user_id,))
-                        row = c.fetchone()
-
-                        if row:
-                            intensity, duration = row
-                            result = shared.pishock_command(guild_id, user_id, op=0, intensity=intensity, duration=duration)
-                            if result.get("Success"):
-                                warning += f"⚡ Shocked for enforcement. "
-                            else:
-                                warning += f"⚠️ PiShock failed: {result.get('Message')} "
-                        else:
-                            warning += "⚠️ PiShock not configured. "
+# Prison enforcement (order 700) is registered by the prison cog
 
-                    except Exception as e:
-                        warning += f"⚠️ PiShock error: {e} "
 
-                if "gag" in actions and shared.enforcement_gag_send:
-                    c.execute("SELECT type FROM gagged_users WHERE user_id = ?", (user_id,))
-                    result = c.fetchone()
-                    gag_type = result[0] if result else "loose"
-                    await shared.enforcement_gag_send(message, gag_type)
+@message_pipeline.stage("cooldown", order=710, needs=("guild_id", "user_id", "is_command"))
+async def cooldown_stage(ctx):
+    message = ctx.message
+    guild_id = ctx.guild_id
+    user_id = ctx.user_id
 
-                c.connection.commit()
-                if "timeout" in actions:
-                    await message.channel.send(warning, delete_after=total_timeout)
-                else:
-                    await message.channel.send(warning, delete_after=120)
-            
-                return
-            
-        # ---------- WORD LENGTH LIMIT CHECK ----------
-        if not is_command and user_id in shared.word_length_limits[guild_id]:
-            limit_data = shared.word_length_limits[guild_id][user_id]
-            min_len = limit_data.get("min_length", 0)
-            max_len = limit_data.get("max_length", 0)
-
-            # Skip check if nothing enforced
-            if min_len > 0 or max_len > 0:
-                words = [w.strip(string.punctuation) for w in content.split()]
-                for w in words:
-                    lw = len(w)
-                    if (min_len > 0 and lw < min_len) or (max_len > 0 and lw > max_len):
-                        try:
-                            await message.delete()
-                        except discord.NotFound:
-                            pass
-                        except discord.Forbidden:
-                            # Prevent log spam if missing perms
-                            print(f"[WordLength] Missing permission to delete message in {message.channel}")
-                        except Exception as e:
-                            print(f"[WordLength] Delete failed: {e}")
-
-                        # Format clearer message
-                        limit_text = []
-                        if min_len > 0:
-                            limit_text.append(f"≥ {min_len}")
-                        if max_len > 0:
-                            limit_text.append(f"≤ {max_len}")
-                        rule_text = " and ".join(limit_text)
-
-                        await message.channel.send(
-                            f"{message.author.mention} ❌ Invalid word length! "
-                            f"Each word must be {rule_text} characters long.",
-                            delete_after=8
-                        )
-                        return
-
-
-
-        # Prison check
-        if shared.enforce_prison_restrictions and not is_command:
-            await shared.enforce_prison_restrictions(message)
-            #if shared.returnvar == True:
-                #return
-
-
-        # Cooldown check (per guild)
-        if not is_command:
-            guild_id = message.guild.id
-            now = time.time()
-
-            if user_id in shared.cooldown_users[guild_id]:
-                elapsed = now - shared.last_message_times[guild_id].get(user_id, 0)
-
-                if elapsed < shared.cooldown_users[guild_id][user_id]:
-                    try:
-                        await message.delete()
-                        remaining = int(shared.cooldown_users[guild_id][user_id] - elapsed)
-                        await message.channel.send(
-                            f"⏳ {message.author.mention} Wait {remaining}s before messaging again",
-                            delete_after=30
-                        )
-                    except:
-                        pass
-                    return
+    # Cooldown check (per guild)
+    if not ctx.is_command:
+        now = time.time()
 
-                shared.last_message_times[guild_id][user_id] = now
+        if user_id in shared.cooldown_users[guild_id]:
+            elapsed = now - shared.last_message_times[guild_id].get(user_id, 0)
 
-                
-        # Gag check (per guild)
-
-        if not is_command:
-            guild_id = message.guild.id
-            if user_id in shared.gagged_users[guild_id]:                
-                try:
-                    if shared.handle_gagged_message:
-                        await shared.handle_gagged_message(message)
-                    else:
-                        print("⚠️ Gag handler not set!")
-                except Exception as e:
-                    await log_error_to_channels(
-                        bot=bot,
-                        error=e,
-                        context_label=f"Gag handling failed for user {user_id}",
-                        guild=message.guild,
-                        user=message.author
-                    )
-                if shared.returnvar:
-                    return
-
-
-
-
-        await bot.process_commands(message)
-    except Exception as e:
-        tb = traceback.format_exc()
+            if elapsed < shared.cooldown_users[guild_id][user_id]:
+                outbound.delete(message)
+                remaining = int(shared.cooldown_users[guild_id][user_id] - elapsed)
+                outbound.warn(
+                    message.channel, user_id,
+                    f"⏳ {message.author.mention} Wait {remaining}s before messaging again",
+                    delete_after=30, kind="cooldown"
+                )
+                return STOP
 
-        error_text = f"[on_message_or_edit ERROR] {e}\n{tb}"
+            shared.last_message_times[guild_id][user_id] = now
 
-        # Use your log_error_to_channels function, adapted for message context
-        try:
-            await log_error_to_channels(
-                bot=bot,
-                error=e,
-                context_label="[on_message_or_edit]",
-                guild=message.guild,
-                user=message.author,
-                extra_info=tb
-            )
-        except Exception as log_exc:
-            print(f"Failed to log error: {log_exc}")
 
-        # Notify in channel with a brief message
-        await message.channel.send(
-            f"❌ An error occurred: `{type(e).__name__}: {e}`",
-            delete_after=15
-        )
+# Gagged messages (order 800) are handled by the gags cog
 
 
 @bot.event
@@ -1749,10 +1754,9 @@ async def on_reaction_add(reaction, user):
 
     # 🎭 Gagged message, find real author
     target_user = message.author
-    msg_dict = shared.gagged_messages.get(guild_id, {})
-    if target_user.bot and msg_id in msg_dict:
-        author_id, original_content, webhook_id, webhook_token = msg_dict.get(msg_id, (None, None, None, None))
-        real_author = guild.get_member(author_id)
+    gagged = shared.gagged_messages.get(msg_id) if target_user.bot else None
+    if gagged:
+        real_author = guild.get_member(gagged.author_id)
         if real_author:
             target_user = real_author
 
@@ -1761,11 +1765,7 @@ async def on_reaction_add(reaction, user):
         try:
             # Fetch intensity and duration from DB
             c = shared.get_server_db(guild_id).cursor()
-            c.execute("""
-                SELECT lightning_reaction_shock_intensity, lightning_reaction_shock_duration
-                FROM pishock_users WHERE user_id = ?
-            """, (target_user.id,))
-            row = c.fetchone()
+            row = PishockRepository(conn=c.connection).shock_for(target_user.id, "lightning_reaction")
 
             if not row:
                 await message.add_reaction('❌')
@@ -1968,7 +1968,9 @@ async def enforce(ctx, user: discord.Member, *args):
             "initial_time": initial_time,
             "added_time": added_time
         }
+        shared.invalidate_word_matcher("enforced", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "INSERT OR REPLACE INTO enforced_words (user_id, word, initial_time, added_time) VALUES (?, ?, ?, ?)",
             (target.id, word, initial_time, added_time)
@@ -2028,7 +2030,9 @@ async def unenforce(ctx, user: discord.Member, *args):
         del shared.enforced_words[guild_id][target.id][word]
         if not shared.enforced_words[guild_id][target.id]:
             del shared.enforced_words[guild_id][target.id]
+        shared.invalidate_word_matcher("enforced", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "DELETE FROM enforced_words WHERE user_id = ? AND word = ?",
             (target.id, word)
@@ -2106,7 +2110,9 @@ async def ban(ctx, user: discord.Member, *args):
             "initial_time": initial_time,
             "added_time": added_time
         }
+        shared.invalidate_word_matcher("banned", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "INSERT OR REPLACE INTO banned_words (user_id, word, initial_time, added_time) VALUES (?, ?, ?, ?)",
             (target.id, word, initial_time, added_time)
@@ -2166,7 +2172,9 @@ async def unban(ctx, user: discord.Member, *args):
         del shared.banned_words[guild_id][target.id][word]
         if not shared.banned_words[guild_id][target.id]:
             del shared.banned_words[guild_id][target.id]
+        shared.invalidate_word_matcher("banned", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute("DELETE FROM banned_words WHERE user_id = ? AND word = ?", (target.id, word))
         ctx.server_db.commit()
 
@@ -2230,11 +2238,32 @@ async def enforcement(ctx, *args):
       !>enforcement                - Show your current enforcement
       !>enforcement add gag        - Add an action
       !>enforcement remove timeout - Remove an action
+      !>enforcement normalize on   - (Mods) Match words through look-alikes/leetspeak
       !>enforcement help           - Show help
     """
 
     user_id = ctx.author.id
 
+    if args and args[0].lower() == "normalize":
+        guild_id = ctx.guild.id
+        if len(args) == 1:
+            state = "on" if shared.is_word_normalization_enabled(guild_id) else "off"
+            await ctx.send(f"🔤 Normalized word matching is **{state}** for this server.")
+            return
+        if not await is_user_server_mod(bot, guild_id, ctx.author.id):
+            await ctx.send("❌ Only server mods can change word matching.")
+            return
+        mode = args[1].lower()
+        if mode not in ("on", "off"):
+            await ctx.send("❌ Use `!>enforcement normalize on` or `!>enforcement normalize off`.")
+            return
+        shared.set_word_normalization(guild_id, mode == "on")
+        await ctx.send(
+            f"✅ Normalized word matching **{mode}**. Enforced and banned words now "
+            f"{'ignore case, accents, look-alike letters, zero-width characters and leetspeak' if mode == 'on' else 'match plain text'}."
+        )
+        return
+
     if len(args) == 0:
         # Show current settings
         c.execute("SELECT enforcement_action FROM user_settings WHERE user_id = ?", (user_id,))
@@ -2258,7 +2287,9 @@ async def enforcement(ctx, *args):
             "**Usage:**\n"
             "`!>enforcement` – Show your settings\n"
             "`!>enforcement add gag` – Add an action\n"
-            "`!>enforcement remove timeout` – Remove an action"
+            "`!>enforcement remove timeout` – Remove an action\n"
+            "`!>enforcement normalize on|off` – (Mods) Catch banned/enforced words written with "
+            "look-alike letters, zero-width characters or leetspeak"
         )
         await ctx.send(help_text)
         return
@@ -2381,16 +2412,15 @@ async def nonbypass_message(ctx, user: discord.Member = None):
         return
 
     try:
-        c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-        row = c.fetchone()
-
-        if row:
+        if c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)).fetchone():
             c.execute("DELETE FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
             ctx.server_db.commit()
+            shared.nonbypass_users[guild_id].discard(user_id)
             await ctx.send(f"🔓 {target.mention} has their bypasses again")
         else:
-            c.execute("INSERT INTO nonbypass_users (guild_id, user_id) VALUES (?, ?)", (guild_id, user_id))
+            c.execute("INSERT OR IGNORE INTO nonbypass_users (guild_id, user_id) VALUES (?, ?)", (guild_id, user_id))
             ctx.server_db.commit()
+            shared.nonbypass_users[guild_id].add(user_id)
             await ctx.send(f"✅ {target.mention} has no bypass keys")
 
     except Exception as e:
@@ -2415,16 +2445,15 @@ async def nonbypass_slash(
         return
 
     try:
-        c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-        row = c.fetchone()
-
-        if row:
+        if c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)).fetchone():
             c.execute("DELETE FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
             ctx.server_db.commit()
+            shared.nonbypass_users[guild_id].discard(user_id)
             await ctx.respond(f"🔓 {target.mention} can bypass filters again.", ephemeral=False)
         else:
-            c.execute("INSERT INTO nonbypass_users (guild_id, user_id) VALUES (?, ?)", (guild_id, user_id))
+            c.execute("INSERT OR IGNORE INTO nonbypass_users (guild_id, user_id) VALUES (?, ?)", (guild_id, user_id))
             ctx.server_db.commit()
+            shared.nonbypass_users[guild_id].add(user_id)
             await ctx.respond(f"✅ {target.mention} can no longer bypass filters.", ephemeral=False)
 
     except Exception as e:
@@ -2542,22 +2571,11 @@ async def red(ctx):
     """Erase all your data from the bot's database (irreversible)"""
     try:
         # Delete from all database tables that include user_id
-        c.execute("DELETE FROM gagged_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM prison_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM user_auth WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM cooldown_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM enforced_words WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM enforcement_offenses WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM banned_words WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM ignored_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM user_settings WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM line_assignments WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM active_line_writers WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM timer_logs WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM allowed_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM locked_users WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM pishock_users WHERE user_id = ?", (user_id,))
-        ctx.server_db.commit()
+        for table in ("enforced_words", "banned_words", "enforcement_offenses", "cooldown_users", "active_line_writers"):
+            shared.write_behind.forget(guild_id, table, user_id)
+        await shared.db(guild_id).run_in_transaction(
+            lambda conn: RestrictionRepository(conn=conn).purge_user(user_id)
+        )
 
         # Remove from in-memory structures
         shared.gagged_users[guild_id].pop(user_id, None)
@@ -2568,7 +2586,10 @@ async def red(ctx):
         shared.enforced_words[guild_id].pop(user_id, None)
         shared.enforcement_offenses[guild_id].pop(user_id, None)
         shared.banned_words[guild_id].pop(user_id, None)
+        shared.invalidate_word_matcher("enforced", guild_id, user_id)
+        shared.invalidate_word_matcher("banned", guild_id, user_id)
         shared.ignored_users[guild_id].discard(user_id)
+        shared.allowed_users[guild_id].pop(user_id, None)
         shared.line_writing_sessions[guild_id].pop(user_id, None)
         shared.locked_users[guild_id].discard(user_id)
         shared.locked_by_map[guild_id].pop(user_id, None)
@@ -2637,16 +2658,9 @@ async def sayas(ctx, user: discord.Member, *, message: str):
             parent_channel = ctx.channel
             thread = None
 
-        # Look for an existing webhook in the parent channel
-        webhooks = await parent_channel.webhooks()
-        webhook = next((w for w in webhooks if w.name == "GagWebhook" and w.user == bot.user), None)
-
-        # Create webhook if not found
-        if webhook is None:
-            webhook = await parent_channel.create_webhook(name="GagWebhook")
-
-        # Send message through webhook
-        await webhook.send(
+        # Send message through the channel's cached webhook
+        await shared.gag_webhooks.send(
+            parent_channel,
             content=message,
             username=user.display_name,
             avatar_url=user.display_avatar.url,
@@ -2892,6 +2906,8 @@ async def track_prisoners(ctx):
         return
 
     added_count = 0
+    solitary_rows = []
+    prisoner_rows = []
     for member in guild.members:
         has_prisoner = prisoner_role in member.roles
         has_solitary = solitary_role and solitary_role in member.roles
@@ -2914,10 +2930,8 @@ async def track_prisoners(ctx):
                 shared.solitary_confinement[guild.id][member.id] = thread.id
                 shared.prison_users[guild.id][member.id] = thread.id
 
-                c.execute("INSERT OR REPLACE INTO solitary_confinement (user_id, thread_id, archive_date) VALUES (?, ?, ?)",
-                          (member.id, thread.id, None))
-                c.execute("INSERT OR REPLACE INTO prison_users VALUES (?, ?, ?)",
-                          (member.id, thread.id, get_balance(member.id, c)))
+                solitary_rows.append((member.id, thread.id, None))
+                prisoner_rows.append((member.id, thread.id, get_balance(member.id, c)))
 
                 await thread.send(f"{member.mention} was auto-tracked into solitary confinement.")
             else:
@@ -2936,8 +2950,13 @@ async def track_prisoners(ctx):
 
             added_count += 1
 
+    # Persist every auto-tracked solitary user in one transaction
+    if solitary_rows:
+        with repositories.transaction(ctx.server_db):
+            restrictions = RestrictionRepository(conn=ctx.server_db)
+            restrictions.set_solitaries(solitary_rows)
+            restrictions.set_prisoners(prisoner_rows)
     await ctx.send(f"Tracked {added_count} prisoner(s) in this server.")
-    c.connection.close()
 
 
 
@@ -2977,15 +2996,16 @@ async def cooldown(ctx, user: discord.Member = None, seconds: int = None):
         if target.id in shared.cooldown_users[guild_id]:
             del shared.cooldown_users[guild_id][target.id]
         shared.last_message_times[guild_id].pop(target.id, None)
-        c.execute("DELETE FROM cooldown_users WHERE user_id = ?", (target.id,))
+        shared.write_behind.forget(guild_id, "cooldown_users", target.id)
+        await shared.db(guild_id).execute("DELETE FROM cooldown_users WHERE user_id = ?", (target.id,))
     else:
         # 💾 Set cooldown
         shared.cooldown_users[guild_id][target.id] = seconds
         shared.last_message_times[guild_id][target.id] = 0
-        c.execute("INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)", 
-                  (target.id, seconds))
-
-    ctx.server_db.commit()
+        shared.write_behind.forget(guild_id, "cooldown_users", target.id)
+        await shared.db(guild_id).execute(
+            "INSERT OR REPLACE INTO cooldown_users (user_id, cooldown) VALUES (?, ?)", (target.id, seconds)
+        )
     await ctx.message.add_reaction("⏱️")
 
 
@@ -3173,8 +3193,9 @@ async def lockdown(ctx, member: discord.Member, channel: discord.TextChannel):
     # 🧠 Store the lock
     shared.locked_users[guild.id].add(member.id)
     shared.locked_by_map[guild.id][member.id] = ctx.author.id
-    c.execute("INSERT OR REPLACE INTO locked_users (user_id, locked_by) VALUES (?, ?)", (member.id, ctx.author.id))
-    ctx.server_db.commit()
+    await shared.db(guild.id).execute(
+        "INSERT OR REPLACE INTO locked_users (user_id, locked_by) VALUES (?, ?)", (member.id, ctx.author.id)
+    )
 
     # ✅ Confirmation
     await ctx.send(f"🔒 {member.mention} has been locked to {channel.mention}")
@@ -3206,8 +3227,7 @@ async def unlockdown(ctx, member: discord.Member):
     shared.locked_by_map[guild.id].pop(member.id, None)
 
     # 🗃️ Remove from database
-    c.execute("DELETE FROM locked_users WHERE user_id = ?", (member.id,))
-    ctx.server_db.commit()
+    await shared.db(guild.id).execute("DELETE FROM locked_users WHERE user_id = ?", (member.id,))
 
     # ✅ Confirmation
     await ctx.send(f"🔓 {member.mention} has been released from lockdown.")
@@ -3240,6 +3260,7 @@ async def assign_lines(ctx, user: discord.Member = None, lines: str = None, *, a
 
     # Progress check
     if channel_id == LINE_WRITING_ID and lines is None and args is None:
+        await shared.write_behind.flush(guild_id)
         c.execute("SELECT line, lines_required, lines_written FROM active_line_writers WHERE user_id = ?", (target.id,))
         result = c.fetchone()
 
@@ -3283,9 +3304,10 @@ async def assign_lines(ctx, user: discord.Member = None, lines: str = None, *, a
             await ctx.send("❌ You can only clear lines you assigned, unless you are a bot Mod.")
             return
 
-        c.execute("DELETE FROM line_assignments WHERE assignment_id = ?", (assignment_id,))
-        c.execute("DELETE FROM active_line_writers WHERE assignment_id = ?", (assignment_id,))
-        ctx.server_db.commit()
+        shared.write_behind.forget(guild_id, "active_line_writers", target.id)
+        async with shared.db(guild_id).transaction() as tx:
+            tx.execute("DELETE FROM line_assignments WHERE assignment_id = ?", (assignment_id,))
+            tx.execute("DELETE FROM active_line_writers WHERE assignment_id = ?", (assignment_id,))
 
         shared.line_writing_sessions[guild_id].pop(target.id, None)
         await ctx.send(f"✅ Cleared line assignment with ID {assignment_id} for {target.mention}.")
@@ -3336,7 +3358,8 @@ async def assign_lines(ctx, user: discord.Member = None, lines: str = None, *, a
         """, (user.id, text, lines, penalty, ctx.author.id))
         ctx.server_db.commit()
 
-        assignment_id = c.lastrowid
+        c.execute("SELECT MAX(assignment_id) FROM line_assignments WHERE user_id = ?", (user.id,))
+        assignment_id = c.fetchone()[0]
         await ctx.message.add_reaction("✅")
 
         writing_channel = ctx.guild.get_channel(LINE_WRITING_ID)
@@ -3399,9 +3422,10 @@ async def assign_lines_slash(
             )
             return
 
-        c.execute("DELETE FROM line_assignments WHERE assignment_id = ?", (assignment_id,))
-        c.execute("DELETE FROM active_line_writers WHERE assignment_id = ?", (assignment_id,))
-        ctx.server_db.commit()
+        shared.write_behind.forget(guild_id, "active_line_writers", target.id)
+        async with shared.db(guild_id).transaction() as tx:
+            tx.execute("DELETE FROM line_assignments WHERE assignment_id = ?", (assignment_id,))
+            tx.execute("DELETE FROM active_line_writers WHERE assignment_id = ?", (assignment_id,))
 
         # Clear from shared sessions if exists
         shared.line_writing_sessions[guild_id].pop(target.id, None)
@@ -3440,8 +3464,9 @@ async def assign_lines_slash(
                 ) VALUES (?, ?, ?, ?, ?)
             """, (target.id, cleaned_text, lines, penalty, ctx.author.id))
             ctx.server_db.commit()
-            
-            assignment_id = c.lastrowid
+
+            c.execute("SELECT MAX(assignment_id) FROM line_assignments WHERE user_id = ?", (target.id,))
+            assignment_id = c.fetchone()[0]
             writing_channel = ctx.guild.get_channel(LINE_WRITING_ID)
             
             if not writing_channel:
@@ -3464,6 +3489,7 @@ async def assign_lines_slash(
 
     # Case 3: Check progress (default action)
     target = user or ctx.author
+    await shared.write_behind.flush(guild_id)
     c.execute("""
         SELECT line, lines_required, lines_written 
         FROM active_line_writers 
@@ -3504,6 +3530,7 @@ async def start(ctx, assignment_id: int):
         await ctx.send(f"{user.mention}, this command can only be used in the designated line writing channel.")
         return
 
+    shared.write_behind.forget(ctx.guild.id, "active_line_writers", user.id)
     c.execute("SELECT * FROM active_line_writers WHERE user_id = ?", (user.id,))
     if c.fetchone():
         await ctx.send(f"{user.mention}, you are already writing an assignment! Finish it before starting another.")
@@ -3616,6 +3643,7 @@ async def my_assignments(ctx):
     pending_rows = c.fetchall()
 
     # Get active assignments from active_line_writers
+    await shared.write_behind.flush(ctx.guild.id)
     c.execute("""
         SELECT assignment_id, user_id, line, lines_required, lines_written 
         FROM active_line_writers 
@@ -3666,29 +3694,32 @@ async def allow(ctx, user: discord.Member):
 
     user_id = user.id
     channel_id = ctx.channel.id
+    guild_id = ctx.guild.id
 
-    # Check if already allowed
-    c.execute("SELECT 1 FROM allowed_users WHERE user_id = ? AND channel_id = ?", (user_id, channel_id))
-    exists = c.fetchone()
+    # Check if already allowed (in the DB, which the mirror follows)
+    exists = c.execute(
+        "SELECT 1 FROM allowed_users WHERE user_id = ? AND channel_id = ?", (user_id, channel_id)
+    ).fetchone() is not None
 
     if exists:
         # Toggle OFF
         c.execute("DELETE FROM allowed_users WHERE user_id = ? AND channel_id = ?", (user_id, channel_id))
-        await ctx.send(f"❌ {user.mention} is no longer allowed to bypass in this channel.")
     else:
         # Toggle ON
         c.execute("INSERT INTO allowed_users (user_id, channel_id) VALUES (?, ?)", (user_id, channel_id))
-        await ctx.send(f"✅ {user.mention} is now allowed to bypass in this channel.")
-
     c.connection.commit()
+    shared.set_bypass_channel(guild_id, user_id, channel_id, not exists)
+
+    if exists:
+        await ctx.send(f"❌ {user.mention} is no longer allowed to bypass in this channel.")
+    else:
+        await ctx.send(f"✅ {user.mention} is now allowed to bypass in this channel.")
 
 @bot.command(name="allow_list")
 @with_config
 async def allow_list(ctx, user: discord.Member):
-    c = ctx.server_db.cursor()
-    # Query allowed channels for the user
-    c.execute("SELECT channel_id FROM allowed_users WHERE user_id = ?", (user.id,))
-    rows = c.fetchall()
+    # Allowed channels for the user
+    rows = [(channel_id,) for channel_id in sorted(shared.allowed_users[ctx.guild.id].get(user.id, ()))]
 
     if not rows:
         await ctx.send(f"📭 {user.mention} is not allowed to bypass in any channels.")
@@ -3733,10 +3764,8 @@ deck = []  # Initialize deck as an empty list
 @bot.command(name="leaderboard")
 @with_config
 async def leaderboard(ctx):
-    c = ctx.server_db.cursor()
     # Get the top 10 users with the highest balance
-    c.execute("SELECT user_id, balance FROM user_wallets ORDER BY balance DESC, user_id ASC LIMIT 10")
-    rows = c.fetchall()
+    rows = WalletRepository(conn=ctx.server_db).top(10)
 
     if not rows:
         await ctx.send("❌ No users with balances found.")
@@ -3963,7 +3992,6 @@ async def cancel_bet(ctx, game: str):
 @bot.command(name='give')
 @with_config
 async def give(ctx, recipient: discord.Member, amount: int):
-    c = ctx.server_db.cursor()
     """Transfer pet bucks to another user."""
 
     sender_id = ctx.author.id
@@ -3978,32 +4006,20 @@ async def give(ctx, recipient: discord.Member, amount: int):
         return
 
     # Check sender balance
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (sender_id,))
-    sender_data = c.fetchone()
+    wallets = WalletRepository(conn=ctx.server_db)
+    sender_balance = wallets.balance(sender_id)
 
-    if not sender_data:
+    if sender_balance is None:
         await ctx.send("❌ You don't have a wallet yet. Use `!>balance` to create one.")
         return
 
-    sender_balance = sender_data[0]
-
     if sender_balance < amount:
         await ctx.send("❌ You don't have enough pet bucks for this transaction.")
         return
 
-    # Ensure recipient has a wallet
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (recipient_id,))
-    recipient_data = c.fetchone()
-
-    if not recipient_data:
-        # Auto-create wallet for recipient if missing
-        c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (recipient_id, 1000))
-        c.connection.commit()
-
-    # Update balances
-    c.execute("UPDATE user_wallets SET balance = balance - ? WHERE user_id = ?", (amount, sender_id))
-    c.execute("UPDATE user_wallets SET balance = balance + ? WHERE user_id = ?", (amount, recipient_id))
-    c.connection.commit()
+    # Auto-creates the recipient's wallet if missing
+    with repositories.transaction(ctx.server_db):
+        wallets.transfer(sender_id, recipient_id, amount)
 
     await ctx.send(f"💸 {ctx.author.mention} gave {amount} pet bucks to {recipient.mention}!")
 
@@ -4022,71 +4038,61 @@ async def balance(ctx, user: discord.Member = None):
 
     await ctx.send(f"💰 {target.display_name}'s balance: **{balance} pet bucks**")
 
-@bot.command(aliases=["streak", "daily_claim", "claim"])
-@with_config
-async def daily(ctx):
-    try:
-        c = ctx.server_db.cursor()
-        user_id = ctx.author.id
-        now = datetime.now(timezone.utc)
+def _claim_daily(conn, user_id, now):
+    """Runs on the DB worker inside a transaction. Returns (remaining, None) on cooldown
+    or (None, (reward, streak_days, claim_count)) once the claim is recorded."""
+    row = conn.execute(
+        "SELECT last_claim, claim_count, streak_days FROM daily_claims WHERE user_id = ?", (user_id,)
+    ).fetchone()
 
-        # Fetch last claim record
-        c.execute("SELECT last_claim, claim_count, streak_days FROM daily_claims WHERE user_id = ?", (user_id,))
-        row = c.fetchone()
+    if row:
+        last_claim = datetime.fromisoformat(row[0]).replace(tzinfo=timezone.utc)
+        claim_count = row[1]
+        streak_days = row[2]
 
-        # Check if wallet exists for user
-        c.execute("SELECT 1 FROM user_wallets WHERE user_id = ?", (user_id,))
-        wallet_exists = c.fetchone()
+        # Cooldown check
+        if now - last_claim < timedelta(hours=24):
+            return timedelta(hours=24) - (now - last_claim), None
 
-        if not wallet_exists:
-            c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (user_id, 1000))
+        # Streak reset check
+        if now - last_claim > timedelta(hours=48):
+            streak_days = 0
 
-        if row:
-            last_claim = datetime.fromisoformat(row[0]).replace(tzinfo=timezone.utc)
-            claim_count = row[1]
-            streak_days = row[2]
-
-            # Cooldown check
-            if now - last_claim < timedelta(hours=24):
-                remaining = timedelta(hours=24) - (now - last_claim)
-                hours, remainder = divmod(remaining.seconds, 3600)
-                minutes = remainder // 60
-                await ctx.send(f"⏳ You’ve already claimed your daily reward. Try again in {hours}h {minutes}m.", delete_after=5)
-                return
+        streak_days += 1
+    else:
+        claim_count = 0
+        streak_days = 1
 
-            # Streak reset check
-            if now - last_claim > timedelta(hours=48):
-                streak_days = 0
+    # Reward scaling
+    reward = 50 + (streak_days - 1) * 5 if streak_days <= 40 else 50 + 39 * 5
+    _apply_balance_delta(conn, user_id, reward)
 
-            streak_days += 1
-        else:
-            claim_count = 0
-            streak_days = 1
+    # Update daily claim info
+    conn.execute("""
+        INSERT OR REPLACE INTO daily_claims (user_id, last_claim, claim_count, streak_days)
+        VALUES (?, ?, ?, ?)
+    """, (user_id, now.isoformat(), claim_count + 1, streak_days))
+    return None, (reward, streak_days, claim_count)
 
-        # Reward scaling
-        if streak_days <= 40:
-            reward = 50 + (streak_days - 1) * 5
-        else:
-            reward = 50 + (39 * 5)
-
-        # Update or insert into user_wallets
-        c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (user_id,))
-        bal_row = c.fetchone()
-        if bal_row:
-            new_balance = bal_row[0] + reward
-            c.execute("UPDATE user_wallets SET balance = ? WHERE user_id = ?", (new_balance, user_id))
-        else:
-            new_balance = reward
-            c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (user_id, new_balance))
 
-        # Update daily claim info
-        c.execute("""
-            INSERT OR REPLACE INTO daily_claims (user_id, last_claim, claim_count, streak_days)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, now.isoformat(), claim_count + 1, streak_days))
+@bot.command(aliases=["streak", "daily_claim", "claim"])
+@with_config
+async def daily(ctx):
+    try:
+        user_id = ctx.author.id
+        now = datetime.now(timezone.utc)
 
-        ctx.server_db.commit()
+        remaining, claim = await shared.db(ctx.guild.id).run_in_transaction(
+            lambda conn: _claim_daily(conn, user_id, now)
+        )
+
+        if remaining:
+            hours, remainder = divmod(remaining.seconds, 3600)
+            minutes = remainder // 60
+            await ctx.send(f"⏳ You’ve already claimed your daily reward. Try again in {hours}h {minutes}m.", delete_after=5)
+            return
 
+        reward, streak_days, claim_count = claim
         await ctx.send(
             f"✅ {ctx.author.mention}, you've claimed your daily **{reward} pet bucks**, "
             f"on a streak of **{streak_days} days**! You've claimed **{claim_count + 1}** times in total."
@@ -4099,15 +4105,13 @@ async def daily(ctx):
 
 
 def get_balance(user_id, c):
-    conn = c.connection
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
-    if row is None:
+    wallets = WalletRepository(conn=c.connection)
+    balance = wallets.balance(user_id)
+    if balance is None:
         # Insert with default 1000 if user not in table yet
-        c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (user_id, 1000))
+        balance = wallets.ensure(user_id)
         c.connection.commit()
-        return 1000
-    return row[0]
+    return balance
 
 
 @bot.command(name='add', aliases=['add_coins', 'create_coins'])
@@ -4127,25 +4131,25 @@ async def add_coins(ctx, user: discord.Member, amount: int):
     # Send a confirmation message
     await ctx.send(f"✅ {amount} pet bucks have been added to {user.mention}'s balance!")
 
-def update_balance(user_id, amount, c):
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
+def _apply_balance_delta(conn, user_id, amount):
+    # Missing wallets start at 1000; balances never go negative
+    return WalletRepository(conn=conn).add(user_id, amount)
 
-    if row is None:
-        # Not found, start with default balance + amount
-        new_balance = max(0, 1000 + amount)
-        c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (user_id, new_balance))
-    else:
-        new_balance = max(0, row[0] + amount)  # Prevent negative balance
-        c.execute("UPDATE user_wallets SET balance = ? WHERE user_id = ?", (new_balance, user_id))
 
+def update_balance(user_id, amount, c):
+    _apply_balance_delta(c.connection, user_id, amount)
     c.connection.commit()
 
 
+async def update_balance_async(guild_id, user_id, amount):
+    """update_balance on the guild's DB worker; returns the new balance."""
+    return await shared.db(guild_id).run_in_transaction(
+        lambda conn: _apply_balance_delta(conn, user_id, amount)
+    )
+
+
 def has_sufficient_funds(user_id, amount, c):
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
-    return row and row[0] >= amount
+    return WalletRepository(conn=c.connection).has_funds(user_id, amount)
 
 
 @bot.command()
@@ -5446,8 +5450,7 @@ async def status_prefix(ctx, user: discord.Member = None):
         embed.add_field(name="🔒 LOCK STATUS", value=f"Locked by `{locker_name}`", inline=False)
 
     # ✅ Allowed Channels (Bypass)
-    c.execute("SELECT channel_id FROM allowed_users WHERE user_id = ?", (target.id,))
-    allowed_rows = c.fetchall()
+    allowed_rows = [(channel_id,) for channel_id in sorted(shared.allowed_users[guild_id].get(target.id, ()))]
     if allowed_rows:
         allowed_channels = []
         for row in allowed_rows:
@@ -5500,8 +5503,7 @@ async def status_prefix(ctx, user: discord.Member = None):
     if target.id in shared.double_type_users.get(guild_id, {}):
         status_fields.append(f"**Misc:** 2️⃣ Double Type")
 
-    c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, target.id))
-    forced_filtered = c.fetchone() is not None
+    forced_filtered = target.id in shared.nonbypass_users[guild_id]
     if forced_filtered:
         status_fields.append(f"**Misc:** Bypass Disabled")
 
@@ -5578,8 +5580,7 @@ async def status_slash(
         embed.add_field(name="🔒 LOCK STATUS", value=f"Locked by `{locker_name}`", inline=False)
 
     # ✅ Allowed Channels (Bypass)
-    c.execute("SELECT channel_id FROM allowed_users WHERE user_id = ?", (target.id,))
-    allowed_rows = c.fetchall()
+    allowed_rows = [(channel_id,) for channel_id in sorted(shared.allowed_users[guild_id].get(target.id, ()))]
     if allowed_rows:
         allowed_channels = []
         for row in allowed_rows:
@@ -5626,8 +5627,7 @@ async def status_slash(
     if target.id in shared.double_type_users.get(guild_id, {}):
         status_fields.append("**Misc:** 2️⃣ Double Type")
 
-    c.execute("SELECT 1 FROM nonbypass_users WHERE guild_id = ? AND user_id = ?", (guild_id, target.id))
-    if c.fetchone():
+    if target.id in shared.nonbypass_users[guild_id]:
         status_fields.append("**Misc:** Bypass Disabled")
 
     if target.id in shared.user_pishock_codes.get(guild_id, {}):
@@ -5723,16 +5723,17 @@ async def resetdb(ctx):
         await ctx.send("You do not have the required permissions to clear the DB.")
         return
     """Reset all database records (admin only)"""
-    c.execute("DELETE FROM gagged_users")
-    c.execute("DELETE FROM prison_users")
-    c.execute("DELETE FROM user_auth")
-    c.execute("DELETE FROM cooldown_users")
-    c.connection.commit()
+    shared.write_behind.forget(guild_id, "cooldown_users")
+    async with shared.db(guild_id).transaction() as tx:
+        tx.execute("DELETE FROM gagged_users")
+        tx.execute("DELETE FROM prison_users")
+        tx.execute("DELETE FROM user_auth")
+        tx.execute("DELETE FROM cooldown_users")
     
     shared.gagged_users[guild_id].clear()
     shared.prison_users[guild_id].clear()
     shared.cooldown_users[guild_id].clear()
-    shared.gagged_messages[guild_id].clear()
+    shared.gagged_messages.clear_guild(guild_id)
     
     await ctx.message.add_reaction("♻️")
 
@@ -5845,331 +5846,15 @@ async def nuke_slash(
 
 # ------------------- Word Setup ----------------
 def get_user_enforcement_action(user_id, c):
-    c.execute("SELECT enforcement_action FROM user_settings WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
-    return row[0] if row else "timeout"  # Default to timeout if not set
+    return RestrictionRepository(conn=c.connection).enforcement_action(user_id)
 
 
 
 # ------------------- Gag Setup -------------------
 
 
-# -------- LOOSE
-# Map CMU phonemes to muffled equivalents
-phoneme_to_gag = {
-    'AA': 'ah', 'AE': 'aeh', 'AH': 'uh', 'AO': 'aw', 'AW': 'ow', 'AY': 'ai',
-    'B': 'bmm', 'CH': 'chh', 'D': 'dgh', 'DH': 'thh', 'EH': 'eh', 'ER': 'urr',
-    'EY': 'ei', 'F': 'fff', 'G': 'gg', 'HH': 'hm', 'IH': 'ih', 'IY': 'ee',
-    'JH': 'jj', 'K': 'kk', 'L': 'll', 'M': 'mm', 'N': 'nn', 'NG': 'ngh',
-    'OW': 'ow', 'OY': 'oy', 'P': 'pph', 'R': 'rr', 'S': 'sss', 'SH': 'shh',
-    'T': 'tt', 'TH': 'th', 'UH': 'uh', 'UW': 'oo', 'V': 'vv', 'W': 'wh', 'Y': 'yuh', 'Z': 'zz', 'ZH': 'zhh'
-}
-
-def phonemes_to_gag(phonemes):
-    return ''.join(phoneme_to_gag.get(p.strip("012"), random.choice(['mm', 'hnn', 'rrgh'])) for p in phonemes)
-
-def loose(text):
-    words = text.split()
-    gagged_words = []
-
-    for word in words:
-        # Preserve punctuation
-        prefix = re.match(r'^\W*', word).group()
-        suffix = re.match(r'.*?(\W*)$', word).group(1)
-        core = word.strip('.,!?')
-
-        phones = pronouncing.phones_for_word(core.lower())
-        if phones:
-            phonemes = phones[0].split()
-            gagged = phonemes_to_gag(phonemes)
-        else:
-            # fallback for weird words or names
-            gagged = ''.join(random.choices("mmphhgrhn", k=max(3, len(core)//2)))
-
-        gagged_words.append(prefix + gagged + suffix)
-
-    return ' '.join(gagged_words)
-
-# --------- MEDIUM
-def medium(text):
-    sounds = ["mmf", "hnn", "rrg", "bmm", "mph", "nng", "ghh", "uhh"]
-    vowels = "aeiou"
-    
-    words = text.split()
-    gagged_words = []
-
-    for word in words:
-        word_clean = re.sub(r'\W+', '', word)
-        prefix = re.match(r'^\W*', word).group()
-        suffix = re.match(r'.*?(\W*)$', word).group(1)
-
-        # 30% chance to preserve the starting letter
-        if len(word_clean) > 2 and random.random() < 0.3:
-            first_letter = word_clean[0]
-            gagged = first_letter + random.choice(sounds)
-        else:
-            # Build 1–2 muffled syllables
-            gagged = ''.join(random.choices(sounds, k=random.randint(1, 2)))
-
-        gagged_words.append(prefix + gagged + suffix)
-
-    return ' '.join(gagged_words)
-
-
-# --------- HARSH
-
-def harsh(text):
-    sounds = ["mmph", "hnn", "rrgh", "bmm", "nngh", "gmph", "mph", "ghh", "fff", "zrr"]
-    words = text.split()
-
-    gagged_words = []
-    for word in words:
-        syllables = [random.choice(sounds) for _ in range(random.randint(1, 3))]
-        gagged_word = ''.join(syllables)
-        gagged_words.append(gagged_word)
-
-    return ' '.join(gagged_words)
-
-
-# --------- PUPPY
-def puppy(text):
-    puppy_sounds = ["woof", "bork", "grrr", "awoo", "yip", "snrf", "ruff", "whine", "arf", "bark"]
-    words = text.split()
-    gagged_words = []
-
-    for word in words:
-        word_clean = re.sub(r'\W+', '', word)
-        prefix = re.match(r'^\W*', word).group()
-        suffix = re.match(r'.*?(\W*)$', word).group(1)
-
-        # 10% chance to stutter the first letter (for puppy vibes)
-        if len(word_clean) > 2 and random.random() < 0.1:
-            stutter = word_clean[0].lower() + '-' + word_clean[0].lower()
-            gagged = stutter + '-' + random.choice(puppy_sounds)
-        # 10% chance to leave part of the word + sound
-        elif random.random() < 0.1:
-            part = word_clean[:random.randint(1, 3)]
-            gagged = part + random.choice(puppy_sounds)
-        else:
-            gagged = random.choice(puppy_sounds)
-
-        gagged_words.append(prefix + gagged + suffix)
-
-    return ' '.join(gagged_words)
-
-
-# ------- BASE64
-def gag_base64(text):
-    encoded = base64.b64encode(text.encode("utf-8")).decode("utf-8")
-    return encoded
-
-
-# ------- ZALGO
-def zalgo(text):
-    zalgo_up = ['̍','̎','̄','̅','̿','̑','̆','̐','͒','͗','͑','̇','̈','̊','͂','̓','̈́','͊','͋','͌','̃','̂','̌','͐','́','̋','̏','̽','̉','ͣ','ͤ','ͥ','ͦ','ͧ','ͨ','ͩ','ͪ','ͫ','ͬ','ͭ','ͮ','ͯ','̾','͛','͆','̚']
-    zalgo_down = ['̖','̗','̘','̙','̜','̝','̞','̟','̠','̤','̥','̦','̩','̪','̫','̬','̭','̮','̯','̰','̱','̲','̳','̹','̺','̻','̼','ͅ','͇','͈','͉','͍','͎','͓','͔','͕','͖','͙','͚']
-    zalgo_mid = ['̕','̛','̀','́','͘','̡','̢','̧','̨','̴','̵','̶','͜','͝','͞','͟','͠','͢','̸','̷','͡','҉']
-
-    def corrupt_char(c):
-        return c + ''.join(random.choices(zalgo_up + zalgo_mid + zalgo_down, k=random.randint(2, 6)))
-
-    return ''.join(corrupt_char(c) if c.isalpha() else c for c in text)
-
-
-# -------- PIG LATIN
-def piglatin(text):
-    def convert(word):
-        if not word.isalpha():
-            return word
-        word = word.lower()
-        if word[0] in "aeiou":
-            return word + "yay"
-        for i, c in enumerate(word):
-            if c in "aeiou":
-                return word[i:] + word[:i] + "ay"
-        return word + "ay"  # fallback
-    return ' '.join(convert(w) for w in text.split())
-
-
-# --------- KITTY
-def kitty(text):
-    kitty_sounds = [
-        "nya", "mew", "purr", "rawr", "nyaa", ":3", "^w^", "meow", 
-        "nya~", "purr~", "paw", "hiss", "blep", "nom", "snuggle", "meow~", 
-        "rawr~", "mew~", "kitten", "furr", "nyan", "cuddle"
-    ]
-    
-    # Split words and keep punctuation
-    tokens = re.findall(r"\w+|[^\w\s]", text, re.UNICODE)
-    
-    result = []
-    for token in tokens:
-        if token.isalpha():
-            result.append(random.choice(kitty_sounds))
-        else:
-            result.append(token)
-    
-    # Add random kitten-like sounds to the sentence
-    num_insertions = random.randint(1, 3)
-    for _ in range(num_insertions):
-        noise = random.choice(kitty_sounds)
-        insert_at = random.randint(0, len(result))
-        result.insert(insert_at, noise)
-    
-    return ' '.join(result)
-
-
-
-# ---------- TOY
-def toy(text):
-    toy_phrases = [
-        "Toy is ready for playtime!",
-        "Toy loves being your toy~",
-        "Toy is waiting for instructions.",
-        "Toy would like to be punished.",
-        "Toy feels so happy when you use it!",
-        "Toy is happy to serve.",
-        "Toy does not want to be freed.",
-        "Toy is ready to please!",
-        "Toy is here for your enjoyment~",
-        "Toy cannot wait to be used!",
-        "Toy has no purpose but to please~",
-        "Toy loves being your little helper~",
-        "Toy is very happy in its toy suit!",
-        "Toy wants to be kept forever.",
-        "Toy is obedient and will follow your commands!",
-        "Toy is ready for its next task.",
-        "Toy will never disappoint.",
-        "Toy will be the best toy for you.",
-        "Toy conversion in progress...",
-        "Toy will never break or refuse.",
-        "Toy is here to make you smile!",
-        "Toy wants to play forever.",
-        "Toy would like to be punished",
-        "keep toy forever.",
-        "Toy is very happy in its toysuit",
-        "Toy does not want to be freed.",
-        "please don't let toy cum.",
-        "toy conversion in progress",
-        "please punish toy"
-    ]
-    
-    # Return a random toy phrase to replace the whole message
-    return random.choice(toy_phrases)
-
-# ----------- YOUTUBE
-def youtube(text):
-    return f"https://www.youtube.com/watch?v={gag_base64(text)}"
-
-
-
-# ----------- SELMA
-def selma(text):
-    selma_phrases = [
-        "omg",
-        "wait i forgot 🩷",
-        "wait",
-        "waitwait",
-        "waitwaitwait",
-        "wwait",
-        "WHAT",
-        "onnygomdgh",
-        "WRUFFWRUFFWERRUFFFF",
-        "i",
-        "no wait",
-        "WAIT",
-        "omgomgomgomgomgomg",
-        "nmghfmh",
-        "fmhhjjh",
-        "omynkfjgnmfdfgfb",
-        "nfgkl;dskjd,bfdk.jks,fgkljfd",
-        "wiait",
-        "wkwajggkmnfsk",
-        "✋",
-        "✋💪",
-        "💪",
-        "🙀",
-        ">fnjfbgfkjpdojfkgs",
-        "WWAIT",
-        "wa it",
-        "i think",
-        "shUSHH",
-        "shhushh>:(",
-        "shusjgjghfjgnghhhs",
-        "omyoygmgmymgkdhgshushhdhgngmdmgndjshhommdfkhmfmn",
-        "omhkdjgjjgnfmgdhghmdkdhghhwrufffwruff!",
-        "fuckguvfkcvkhkfgukccknfnndkksjf",
-        "omgjgomgudhhffgnnnnonno"
-    ]
-    
-    # Return a random toy phrase to replace the whole message
-    return random.choice(selma_phrases)
-
-
-
-# -------- CHKDJFL BKDJFLJSD
-def chief_beef(text):
-    chief_beef_spam = [
-    "CHJDJDKFJS BEKJFDLSJ", "CHIEFJDKLSJFS BEEEFFFFFFFFF", "CHFJDLSKFJDSLFJS BFFJSDKL", "CHHFFFFJJJJFJK BEFSJDKFLJ",
-    "CKSJDKFJS CHHFFFBEBE", "CHFJDLSKJDF BEEFBEEEEE", "CHDKSJFDK BEFFKDL", "CHJDSKFJ BEEFJSKDFL",
-    "CHIEEFFJKLD BEFJDKLSJ", "CCHHHHFFFJJ BEEEEEEEEEEE", "CHHEHEJDKF BEEEEFFF", "CHDJKLS BEFEFEFJKLJ",
-    "CHEEEEFFFJJJJFJJ BEEEEEF", "CHFFFJJJDS BEEEEFGKJ", "CHHHHFJDK BEEEFFJKL", "CHIEEFFJ BEEEEFFFFJKD",
-    "CHHHHFJJ BEFJDJDJDK", "CHEFFJDKL BEEEEFFFFF", "CHFKDKFJ BEEEFFJKLDS", "CHHHHHFFFFJJJJ BEEEFFFF",
-    "CHEEKDLD BEEFJKLS", "CHFFJSKL BEEEFFJDLF", "CHFJSKLDJ BEEFFFJF", "CHIEEFJS BEEEFFFF",
-    "CHHHHFFFFF BEEEFFFFFJKLS", "CHJDKLJ BEEFFFKDK", "CHFJDKLFJ BEEFFJDKF", "CHFFFJDKL BEEEEFFFJ",
-    "CHHFJFJ BEEFJDKL", "CHFFFFJDJDJDJ BEEEFFFF", "CHHFFJJJJJ BEEEFFJDKF", "CHEEFJDKL BEFFJDSFJ",
-    "CHIEFFFFJK BEEFJJJJJ", "CHJDLSKJF BEEFJJDKF", "CHIEFFFJDJD BEEEFFFF", "CHFJKLSDFJ BEEEFFFFFJK",
-    "CHJJJFFF BEFJJJJKDK", "CHJDJDLSKJ BEEEFFFFFF", "CHEEFJKLDJ BEFFJKL", "CHIEEFFJD BEEFJKLSJ",
-    "CHFFJDKLSJ BEEEEFJKLJ", "CHEEFJKLD BEEEFFFJDK", "CHIEFFFJJJJJ BEEFJKLDJ", "CHHFFFFJJJ BEEFJDJDJ",
-    "CHIEFFFJDKL BEEFFFFF", "CHFFFFJDKL BEEFFJKDK", "CHJDSKLDJ BEEEFFFJDKL", "CHJDKLFJS BEEFJKLDSF",
-    "CHEEFFFJKLD BEEEFFFF", "CHFFFFJJJJ BEEFFFJDK", "CHEEFJDJDKL BEEFJDKLS", "CHJJFJDKLS BEEFFFDKLD",
-    "CHHFFFJKLJ BEEEFJKLJ", "CHJFDJKLFJ BEEEEFFDKJ", "CHIEFFFJDK BEEEFFFFFJK", "CHHEEEFFFJ BEEFJKDKD",
-    "CHEFJKLD BEEFJKLSJ", "CHIEFFFJ BEEEEFFFJDK", "CHHHFJKLS BEEEFFJKLDJ", "CHIEFFFFJKLD BEEFJDKLDJ",
-    "CHJDLKFJ BEEFJDKLFDJ", "CHFJDKLFJ BEEEFFFFJDK", "CHJJJJFFF BEEEFFFJKLJ", "CHIEFFFJKLJ BEEFJJJJJ",
-    "CHHHHFFJDKL BEEFFFJKLD", "CHFJDKL BEEFJJJKLD", "CHJJJFFFJ BEEEFJDKLJ", "CHFFFFFJ BEEEFFJKLDJ",
-    "CHIEJJJJJFFF BEEFJJDJDJ", "CHJJDJDKL BEEFFFF", "CHIEFFJDJDKL BEEFFJDKLF", "CHFJFJDKL BEEEFFJKLD",
-    "CHIEEFJFJDKL BEEFFJKLD", "CHIEFFFJKL BEEFFJKDL", "CHFJDKLJF BEEEFFFFJKLJ", "CHJJDKLJ BEEFFJKLDJ",
-    "CHJDKFJDKL BEEFFFFJKLD", "CHHHFJFJDK BEEFFJKLDJ", "CHFFFJJDKLF BEEFFFJKLD", "CHIEFFFJKLDJ BEEFJKLFD",
-    "CHFJFJDKLS BEEEFFFFJKD", "CHJJJFFFJKL BEEEFJKLD", "CHHHFFFJDKLF BEEFJKLFD", "CHEEFJDKLS BEEFFFJKLD",
-    "CHFJJJKL BEEFFFJDKLD", "CHJFJFJKL BEEFFJDKLSJ", "CHFFJJJKLD BEEFJKLDJ", "CHIEEFFFJDKLS BEEFJKLFDJ",
-    "CHJJJFFJDKL BEEEFFFFJK", "CHEEFJDKL BEEFFFFJKLJ", "CHFFFJJDKLSJ BEEEFFFF", "CHJDJDKLSJ BEEFFFFJDKL",
-    "CHEEFJKL BEEEFJKLDJ", "CHIEFFFJDKLSJ BEEEFFJKDL", "CHJFJDKLFJ BEEEFFJKLD", "CHJFJDKL BEEEFFJKDLS",
-    "CHIEEFFJDKL BEEFJKLDJF", "CHJFJFJKLDS BEEFJDKLDJ", "CHFFJJJKL BEEEFJKLDJ"
-    ]
-
-
-    return random.choice(chief_beef_spam)
-
-
-# ---- GAG FUNCTION TREE
-# Define gag function map at the top of your file
-gag_functions = {
-    "loose": loose,
-    "medium": medium,
-    "harsh": harsh,
-    "puppy": puppy,
-    "base64": gag_base64,
-    "zalgo": zalgo,
-    "piglatin": piglatin,
-    "kitty": kitty,
-    "toy": toy,
-    "youtube": youtube,
-    "selma": selma,
-    "chief_beef": chief_beef
-}
-
-gag_colors = {
-    "loose": discord.Color.green(),
-    "medium": discord.Color.gold(),
-    "harsh": discord.Color.red(),
-    "puppy": discord.Color.teal(),
-    "kitty": discord.Color.magenta(),
-    "toy": discord.Color.purple(),
-    "base64": discord.Color.dark_blue(),
-    "zalgo": discord.Color.dark_red(),
-    "piglatin": discord.Color.orange(),
-    "youtube": discord.Color.blurple()
-            }
+# The gag styles (loose, medium, puppy, ...) live in gag_engine.py; the gags
+# cog registers them into shared.gag_functions.
 
 # ------------------- Cleanup COMMAND -------------------
 @bot.command()
@@ -6531,6 +6216,14 @@ async def listuser(
 
 
 
+def zip_directory(directory, zip_path):
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for foldername, subfolders, filenames in os.walk(directory):
+            for filename in filenames:
+                file_path = os.path.join(foldername, filename)
+                zipf.write(file_path, os.path.relpath(file_path, start=directory))
+
+
 @bot.command(name="sendfiles")
 @with_config
 @commands.is_owner()
@@ -6539,40 +6232,47 @@ async def send_files(ctx):
     try:
         # Zip the cogs folder
         cogs_zip_path = "cogs.zip"
-        with zipfile.ZipFile(cogs_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for foldername, subfolders, filenames in os.walk("cogs"):
-                for filename in filenames:
-                    file_path = os.path.join(foldername, filename)
-                    arcname = os.path.relpath(file_path, start="cogs")
-                    zipf.write(file_path, arcname)
-
-        # Zip the db/servers folder
-        servers_zip_path = "servers.zip"
-        servers_dir = "db/servers"
-        with zipfile.ZipFile(servers_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for foldername, subfolders, filenames in os.walk(servers_dir):
-                for filename in filenames:
-                    file_path = os.path.join(foldername, filename)
-                    arcname = os.path.relpath(file_path, start=servers_dir)
-                    zipf.write(file_path, arcname)
-
-        # Send all files via DM
-        await ctx.author.send("📦 Sending current files:")
-        await ctx.author.send(file=discord.File("muzzled.py"))
-        await ctx.author.send(file=discord.File("shared.py"))
-        await ctx.author.send(file=discord.File("db/global.db"))
-        await ctx.author.send(file=discord.File(cogs_zip_path))
-        await ctx.author.send(file=discord.File(servers_zip_path))
-        await ctx.send("✅ Files sent to your DM.")
+        await asyncio.to_thread(zip_directory, "cogs", cogs_zip_path)
+
+        # Consistent copies of every DB, taken online and kept in archive/
+        await shared.write_behind.flush_all()
+        manifest = await snapshots.snapshot(label="sendfiles")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await asyncio.to_thread(snapshots.extract, manifest, tmp_dir)
+            servers_zip_path = os.path.join(tmp_dir, "servers.zip")
+            await asyncio.to_thread(zip_directory, os.path.join(tmp_dir, "servers"), servers_zip_path)
+
+            # Send all files via DM
+            await ctx.author.send("📦 Sending current files:")
+            await ctx.author.send(file=discord.File("muzzled.py"))
+            await ctx.author.send(file=discord.File("shared.py"))
+            await ctx.author.send(file=discord.File(os.path.join(tmp_dir, "global.db")))
+            await ctx.author.send(file=discord.File(cogs_zip_path))
+            await ctx.author.send(file=discord.File(servers_zip_path))
+        await ctx.send(f"✅ Files sent to your DM.\n{snapshots.format_manifest(manifest)}")
 
         # Clean up temporary zip files
         os.remove(cogs_zip_path)
-        os.remove(servers_zip_path)
+        await asyncio.to_thread(snapshots.prune)
 
     except Exception as e:
         await ctx.send(f"❌ Failed to send files: {e}")
 
 
+@bot.command(name="snapshot")
+@with_config
+@commands.is_owner()
+async def snapshot_databases(ctx, label: str = "manual"):
+    """Archive a consistent copy of every database without pausing the bot."""
+    try:
+        await shared.write_behind.flush_all()
+        manifest = await snapshots.snapshot(label=label)
+        removed = await asyncio.to_thread(snapshots.prune)
+        await ctx.send(f"{snapshots.format_manifest(manifest)}\n🧹 Pruned {removed} unused objects.")
+    except Exception as e:
+        await ctx.send(f"❌ Snapshot failed: {e}")
+
+
 # ------------------- ACTIVE THREADS -------------------
 @bot.command(aliases=["thread", "active"])
 @with_config
@@ -6826,7 +6526,7 @@ async def prison_status(ctx):
     embed.add_field(name="**Guards:**", value=guard_text, inline=True)
 
     embed.set_image(url="attachment://prison.png")
-    file = discord.File("prison.png", filename="prison.png")
+    file = shared.media.file("prison")
 
     embed.set_footer(text="Enjoy your visit (or stay) in prison!")
     
@@ -6900,7 +6600,7 @@ async def build_prison_embed(guild):
     embed.set_image(url="attachment://prison.png")
     embed.set_footer(text="Enjoy your visit (or stay) in prison!")
 
-    file = discord.File("prison.png", filename="prison.png")
+    file = shared.media.file("prison")
 
     return embed, file
 
@@ -7256,9 +6956,9 @@ async def send_prison_status_periodically():
             continue
 
         # --- Inactive prisoner cleanup logic ---
+        # Writes go through the guild's worker: this loop awaits between them,
+        # so committing the pooled connection would commit other holders' work
         try:
-            db = shared.get_server_db(guild_id)
-            c = db.cursor()
             now = datetime.now(timezone.utc)
             inactive_cutoff = now - timedelta(days=7)
             prisoner_role = guild.get_role(PRISONER_ROLE_ID)
@@ -7340,8 +7040,7 @@ async def send_prison_status_periodically():
                         if prisoner_role in member.roles:
                             await member.remove_roles(prisoner_role, reason="Removed from prison due to 7-day inactivity")
 
-                        c.execute("DELETE FROM prison_users WHERE user_id = ?", (user_id,))
-                        db.commit()
+                        await shared.db(guild_id).execute("DELETE FROM prison_users WHERE user_id = ?", (user_id,))
                         shared.prison_users[guild_id].pop(user_id, None)
                         removed.append(member.display_name)
                 except Exception as e:
@@ -7368,10 +7067,7 @@ async def send_prison_status_periodically():
 
         # --- Solitary thread check (unchanged) ---
         try:
-            db = shared.get_server_db(guild.id)
-            c = db.cursor()
-            c.execute("SELECT user_id, thread_id FROM solitary_confinement")
-            results = c.fetchall()
+            results = shared.get_server_db(guild.id).execute("SELECT user_id, thread_id FROM solitary_confinement").fetchall()
             mentioned_threads = []
 
             for user_id, thread_id in results:
@@ -7392,10 +7088,12 @@ async def send_prison_status_periodically():
 
                                     await thread.edit(locked=True, archived=True)
 
-                                    c.execute("UPDATE solitary_confinement SET archive_date = ? WHERE user_id = ?", (now.isoformat(), user_id))
-                                    c.execute("INSERT OR REPLACE INTO prison_users (user_id, channel_id, balance) VALUES (?, ?, ?)",
-                                            (user_id, PRISON_CHANNEL_ID, get_balance(user_id, c)))
-                                    db.commit()
+                                    def move_to_prison(conn, user_id=user_id):
+                                        balance = WalletRepository(conn=conn).ensure(user_id)
+                                        conn.execute("UPDATE solitary_confinement SET archive_date = ? WHERE user_id = ?", (now.isoformat(), user_id))
+                                        conn.execute("INSERT OR REPLACE INTO prison_users (user_id, channel_id, balance) VALUES (?, ?, ?)",
+                                                (user_id, PRISON_CHANNEL_ID, balance))
+                                    await shared.db(guild.id).run_in_transaction(move_to_prison)
 
                                     shared.solitary_confinement[guild.id].pop(user_id, None)
                                     shared.prison_users[guild.id][user_id] = PRISON_CHANNEL_ID
@@ -7487,6 +7185,7 @@ async def restart(ctx):
     shared.conn.commit()
 
     await ctx.send("🔄 Restarting bot...")
+    await shared.write_behind.flush_all()
     subprocess.Popen([sys.executable, os.path.realpath(__file__)])
     sys.exit(0)
 
@@ -7533,6 +7232,7 @@ async def shutdown(ctx, eta: int = None):  # Accepts ETA in minutes
 
         try:
             await ctx.send("✅ Launching safe mode...")
+            await shared.write_behind.flush_all()
             subprocess.Popen([sys.executable, "launch_safe.py"])
             sys.exit(0)
         except Exception as e:
@@ -7590,6 +7290,10 @@ async def is_invalid_line_text(text: str) -> str | None:
 MAX_RETRIES = 5
 RETRY_DELAY = 0.2  # seconds
 
+@tasks.loop(seconds=shared.WRITE_BEHIND_INTERVAL)
+async def flush_write_behind():
+    await shared.write_behind.flush_all()
+
 @tasks.loop(seconds=1)
 async def process_command_logs():
     if shared.command_log_queue.empty():
@@ -7598,24 +7302,13 @@ async def process_command_logs():
     log = await shared.command_log_queue.get()
 
     # --- Per-server DB ---
-    server_path = f"db/servers/{log['guild_id']}.db"
+    # On the guild's worker, not the pooled connection: committing that would
+    # also commit whatever a command holding it has written so far
     for attempt in range(MAX_RETRIES):
         try:
-            with sqlite3.connect(server_path, timeout=10) as conn:
-                conn.execute("PRAGMA journal_mode=WAL")
-                c = conn.cursor()
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS command_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        command TEXT,
-                        arguments TEXT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                c.execute("INSERT INTO command_logs (user_id, command, arguments) VALUES (?, ?, ?)",
-                          (log["user_id"], log["command"], log["arguments"]))
-                conn.commit()
+            await shared.db(log["guild_id"]).run_in_transaction(
+                lambda conn: LogRepository(conn=conn).add(log["user_id"], log["command"], log["arguments"])
+            )
             break  # Success
         except sqlite3.OperationalError as e:
             if "database is locked" in str(e):
@@ -7672,22 +7365,11 @@ async def cleanup_old_logs():
     except Exception as e:
         print(f"[LOG CLEANUP ERROR] global.db: {e}")
 
-    # --- Per-server DB cleanup ---
-    base_path = "db/servers"
-    for filename in os.listdir(base_path):
-        if filename.endswith(".db"):
-            db_path = os.path.join(base_path, filename)
-            try:
-                conn = sqlite3.connect(db_path)
-                conn.execute("PRAGMA journal_mode=WAL")
-                c = conn.cursor()
-
-                c.execute("DELETE FROM command_logs WHERE timestamp < ?", (cutoff,))
-                deleted = c.rowcount
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                print(f"[LOG CLEANUP ERROR] {filename}: {e}")
+    # --- Per-server DB cleanup (one statement in consolidated mode) ---
+    try:
+        deleted = await asyncio.to_thread(shared.storage.prune_command_logs, cutoff)
+    except Exception as e:
+        print(f"[LOG CLEANUP ERROR] server DBs: {e}")
 
 
 @cleanup_old_logs.before_loop
@@ -7716,20 +7398,20 @@ async def command_logs_slash(
         return
 
     databases = get_available_databases(ctx.bot)
-    db_path = databases.get(database)
-    if not db_path or not os.path.isfile(db_path):
+    if database not in databases:
         await ctx.respond("❌ Invalid database selected.", ephemeral=True)
         return
+    log_guild_id = databases[database]
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = open_log_database(log_guild_id)
         c = conn.cursor()
 
         # Parse command filters if given
         command_filter_list = [cmd.strip().lower() for cmd in filter_commands.split(",")] if filter_commands else []
 
         # Global or server db logic
-        is_global = "global" in db_path.lower()
+        is_global = log_guild_id is None
         base_query = ""
         params = []
 
@@ -7752,7 +7434,7 @@ async def command_logs_slash(
         if where_clauses:
             base_query += " WHERE " + " AND ".join(where_clauses)
 
-        base_query += " ORDER BY id DESC" if is_global else " ORDER BY rowid DESC"
+        base_query += " ORDER BY id DESC"
         base_query += " LIMIT ?"
         params.append(limit)
 
@@ -7804,13 +7486,12 @@ async def command_logs_command(ctx, user: discord.Member = None, limit: int = 10
 
     limit = max(1, min(limit, 50))
     databases = get_available_databases(ctx.bot)
-    db_path = databases.get(database)
-    if not db_path or not os.path.isfile(db_path):
+    if database not in databases:
         await ctx.send("❌ Invalid database selected.")
         return
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = open_log_database(databases[database])
         c = conn.cursor()
 
         if user:
@@ -7818,14 +7499,14 @@ async def command_logs_command(ctx, user: discord.Member = None, limit: int = 10
                 SELECT user_id, command, arguments
                 FROM command_logs
                 WHERE user_id = ?
-                ORDER BY rowid DESC
+                ORDER BY id DESC
                 LIMIT ?
             ''', (user.id, limit))
         else:
             c.execute('''
                 SELECT user_id, command, arguments
                 FROM command_logs
-                ORDER BY rowid DESC
+                ORDER BY id DESC
                 LIMIT ?
             ''', (limit,))
 
@@ -7857,6 +7538,79 @@ async def command_logs_command(ctx, user: discord.Member = None, limit: int = 10
         await ctx.send(f"❌ Error reading logs: {e}")
 
 
+@bot.command(name="dbpool")
+async def db_pool_stats(ctx):
+    if ctx.author.id not in Mod:
+        await ctx.send("You do not have permission to use this command.")
+        return
+
+    stats = shared.server_db_pool_stats()
+    await ctx.send(
+        f"🗄️ **Server DB pool:** {stats['open']} open\n"
+        f"Hits: `{stats['hits']}` | Misses: `{stats['misses']}` | Hit ratio: `{stats['hit_ratio']:.1%}`\n"
+        f"LRU evictions: `{stats['evictions']}` | Idle closed: `{stats['idle_closed']}` | "
+        f"Checked out: `{stats['checked_out']}` | Closed on release: `{stats['deferred_closes']}`"
+    )
+
+    ex = shared.db_executor_stats()
+    await ctx.send(
+        f"🧵 **DB workers:** {ex['running']}/{ex['workers']} running | Queue depth: `{ex['queue_depth']}`\n"
+        f"Jobs: `{ex['completed']}/{ex['submitted']}` done, `{ex['failed']}` failed | "
+        f"Wait avg: `{ex['wait_avg'] * 1000:.1f}ms` max: `{ex['wait_max'] * 1000:.1f}ms`"
+    )
+
+    cfg = shared.server_config_cache_stats()
+    await ctx.send(
+        f"⚙️ **Config cache:** `{cfg['cached']}` guild(s) | Hits: `{cfg['hits']}` | Misses: `{cfg['misses']}` | "
+        f"Hit ratio: `{cfg['hit_ratio']:.1%}` | Invalidations: `{cfg['invalidations']}`"
+    )
+
+    wb = shared.write_behind.stats
+    await ctx.send(
+        f"✍️ **Write-behind:** `{shared.write_behind.pending()}` dirty row(s) | "
+        f"Marked: `{wb['marked']}` (coalesced `{wb['coalesced']}`) | "
+        f"Flushes: `{wb['flushes']}` / `{wb['flushed_rows']}` rows | Failed: `{wb['failed']}`"
+    )
+
+    mp = shared.message_path_ratio()
+    await ctx.send(
+        f"🚀 **Message path:** Fast: `{mp['fast']}` | Slow: `{mp['slow']}` | Fast ratio: `{mp['fast_ratio']:.1%}`"
+    )
+
+
+@bot.command(name="pipeline")
+async def pipeline_stats(ctx):
+    """Message pipeline stage latencies (stages off in this server are marked), plus the
+    lanes, outbound queue, webhooks, gag echoes and their latency, edit cache and assets."""
+    if ctx.author.id not in Mod:
+        await ctx.send("You do not have permission to use this command.")
+        return
+
+    gag = shared.gag_latency.summary()
+    sections = [
+        message_pipeline.format_stats(ctx.guild.id if ctx.guild else None),
+        message_lanes.format_stats(),
+        outbound.format_stats(),
+        shared.gag_webhooks.format_stats(),
+        shared.gagged_messages.format_stats(),
+        f"🤐 **Gag echo latency:** `{gag['count']}` echoes | p50 `{gag['p50'] * 1000:.0f}ms` "
+        f"p99 `{gag['p99'] * 1000:.0f}ms` max `{gag['max'] * 1000:.0f}ms`",
+        edit_cache.format_stats(),
+        shared.media.format_stats(),
+    ]
+    stats = "\n".join(sections)
+
+    # Line-aligned chunks under Discord's message limit
+    chunk = ""
+    for line in stats.split("\n"):
+        if len(chunk) + len(line) > 1900:
+            await ctx.send(chunk)
+            chunk = ""
+        chunk += line + "\n"
+    if chunk:
+        await ctx.send(chunk)
+
+
 # Register a custom adapter for datetime objects
 def adapt_datetime(dt):
     return dt.isoformat()  # Convert datetime to ISO 8601 format string
@@ -8251,7 +8005,9 @@ async def enforce(
             "initial_time": adjusted_initial_time,
             "added_time": added_time
         }
+        shared.invalidate_word_matcher("enforced", guild_id, user.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "INSERT OR REPLACE INTO enforced_words (user_id, word, initial_time, added_time) VALUES (?, ?, ?, ?)",
             (user.id, word, adjusted_initial_time, added_time)
@@ -8305,7 +8061,9 @@ async def unenforce(
 
         if not shared.enforced_words[guild_id][target.id]:
             del shared.enforced_words[guild_id][target.id]
+        shared.invalidate_word_matcher("enforced", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "DELETE FROM enforced_words WHERE user_id = ? AND word = ?",
             (target.id, word)
@@ -8344,15 +8102,6 @@ async def wordlength(
     c = ctx.server_db.cursor()
     guild_id = ctx.guild.id
 
-    # ✅ Create the table automatically if missing
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS word_length_limits (
-            user_id INTEGER,
-            min_length INTEGER DEFAULT 0,
-            max_length INTEGER DEFAULT 0
-        )
-    """)
-
     # Lock and permission checks
     if user.id in shared.locked_users[guild_id] and ctx.author.id not in AUTHORIZED_LOCK_MANAGERS:
         await ctx.respond("❌ That user is locked.", ephemeral=True)
@@ -8395,15 +8144,6 @@ async def wordlength(
 async def wordlength_remove(ctx, user: discord.Member):
     c = ctx.server_db.cursor()
 
-    # ✅ Create table if missing (safe redundancy)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS word_length_limits (
-            user_id INTEGER,
-            min_length INTEGER DEFAULT 0,
-            max_length INTEGER DEFAULT 0
-        )
-    """)
-
     c.execute("DELETE FROM word_length_limits WHERE user_id = ?", (user.id,))
     ctx.server_db.commit()
     shared.word_length_limits[guild_id].pop(user.id, None)
@@ -8461,7 +8201,9 @@ async def ban_word(
             "initial_time": adjusted_initial_time,
             "added_time": added_time
         }
+        shared.invalidate_word_matcher("banned", guild_id, target.id)
 
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "INSERT OR REPLACE INTO banned_words (user_id, word, initial_time, added_time) VALUES (?, ?, ?, ?)",
             (target.id, word, adjusted_initial_time, added_time)
@@ -8516,8 +8258,10 @@ async def unban(
 
         if not shared.banned_words[guild_id][target.id]:
             del shared.banned_words[guild_id][target.id]
+        shared.invalidate_word_matcher("banned", guild_id, target.id)
 
         # Remove from database
+        await shared.write_behind.flush(guild_id)  # land pending initial_time updates first
         c.execute(
             "DELETE FROM banned_words WHERE user_id = ? AND word = ?",
             (target.id, word)
@@ -8601,49 +8345,20 @@ async def balance(ctx, user: discord.Member = None):
 @bot.slash_command(name="daily", description="Claim your daily pet bucks reward")
 @with_config
 async def daily(ctx):
-    c = ctx.server_db.cursor()
     user_id = ctx.author.id
     now = datetime.now(timezone.utc)
 
-    c.execute("SELECT last_claim, claim_count, streak_days FROM daily_claims WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
-
-    # Check if wallet exists for user
-    c.execute("SELECT 1 FROM user_wallets WHERE user_id = ?", (user_id,))
-    wallet_exists = c.fetchone()
-
-    if not wallet_exists:
-        c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (user_id, 1000))
-
-    if row:
-        last_claim = datetime.fromisoformat(row[0]).replace(tzinfo=timezone.utc)
-        claim_count = row[1]
-        streak_days = row[2]
-
-        if now - last_claim < timedelta(hours=24):
-            remaining = timedelta(hours=24) - (now - last_claim)
-            hours, remainder = divmod(remaining.seconds, 3600)
-            minutes = remainder // 60
-            await ctx.respond(f"⏳ Already claimed. Try again in {hours}h {minutes}m.", ephemeral=True)
-            return
-
-        if now - last_claim > timedelta(hours=48):
-            streak_days = 0
-
-        streak_days += 1
-    else:
-        claim_count = 0
-        streak_days = 1
-
-    reward = 50 + (streak_days - 1) * 5 if streak_days <= 40 else 50 + 39 * 5
-    update_balance(user_id, reward, c)
-
-    c.execute(
-        "INSERT OR REPLACE INTO daily_claims (user_id, last_claim, claim_count, streak_days) VALUES (?, ?, ?, ?)",
-        (user_id, now.isoformat(), claim_count + 1, streak_days)
+    remaining, claim = await shared.db(ctx.guild.id).run_in_transaction(
+        lambda conn: _claim_daily(conn, user_id, now)
     )
-    c.connection.commit()
 
+    if remaining:
+        hours, remainder = divmod(remaining.seconds, 3600)
+        minutes = remainder // 60
+        await ctx.respond(f"⏳ Already claimed. Try again in {hours}h {minutes}m.", ephemeral=True)
+        return
+
+    reward, streak_days, claim_count = claim
     await ctx.respond(
         f"✅ {ctx.author.mention}, you’ve claimed **{reward} pet bucks**! Streak: **{streak_days} days**, "
         f"Total Claims: **{claim_count + 1}**"
@@ -8664,29 +8379,20 @@ async def give(ctx, recipient: discord.Member, amount: int):
         await ctx.respond("❌ Amount must be greater than zero.", ephemeral=True)
         return
 
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (sender_id,))
-    sender_data = c.fetchone()
-
-    if not sender_data or sender_data[0] < amount:
+    wallets = WalletRepository(conn=ctx.server_db)
+    if not wallets.has_funds(sender_id, amount):
         await ctx.respond("❌ You don't have enough pet bucks.", ephemeral=True)
         return
 
-    c.execute("SELECT balance FROM user_wallets WHERE user_id = ?", (recipient_id,))
-    if not c.fetchone():
-        c.execute("INSERT INTO user_wallets (user_id, balance) VALUES (?, ?)", (recipient_id, 1000))
-
-    c.execute("UPDATE user_wallets SET balance = balance - ? WHERE user_id = ?", (amount, sender_id))
-    c.execute("UPDATE user_wallets SET balance = balance + ? WHERE user_id = ?", (amount, recipient_id))
-    c.connection.commit()
+    with repositories.transaction(ctx.server_db):
+        wallets.transfer(sender_id, recipient_id, amount)
 
     await ctx.respond(f"💸 {ctx.author.mention} gave {amount} pet bucks to {recipient.mention}!")
 
 @bot.slash_command(name="leaderboard", description="View the top pet buck holders")
 @with_config
 async def leaderboard(ctx):
-    c = ctx.server_db.cursor()
-    c.execute("SELECT user_id, balance FROM user_wallets ORDER BY balance DESC, user_id ASC LIMIT 10")
-    rows = c.fetchall()
+    rows = WalletRepository(conn=ctx.server_db).top(10)
 
     if not rows:
         await ctx.respond("❌ No users found.")
@@ -9440,22 +9146,12 @@ def list_toggleable_cogs():
     ]
 
 def ensure_cog_columns_from_files():
-    toggleable_cogs = list_toggleable_cogs()
-
-    # Get current columns in the server_config table
-    c.execute("PRAGMA table_info(server_config)")
-    existing_columns = [row[1] for row in c.fetchall()]
-
-    for cog in toggleable_cogs:
-        column_name = f"{cog}_enabled"
-        if column_name not in existing_columns:
-            try:
-                c.execute(f"ALTER TABLE server_config ADD COLUMN {column_name} INTEGER DEFAULT 1")
-                print(f"✅ Added column '{column_name}' for cog '{cog}'")
-            except Exception as e:
-                print(f"❌ Failed to add column '{column_name}': {e}")
-
-    c.connection.commit()
+    try:
+        for column_name in migrations.ensure_cog_columns(c.connection, list_toggleable_cogs()):
+            print(f"✅ Added column '{column_name}' to server_config")
+        shared.refresh_cog_columns()
+    except Exception as e:
+        print(f"❌ Failed to add cog columns: {e}")
 
 
 
@@ -9480,23 +9176,14 @@ async def toggle_cog(ctx, name: str):
     new_value = 0 if (row and row[0] == 1) else 1
 
     c.execute(f"UPDATE server_config SET {column} = ? WHERE guild_id = ?", (new_value, ctx.guild.id))
+    if c.rowcount:
+        shared.set_cog_enabled(ctx.guild.id, column, new_value)
     c.connection.commit()
     state = "enabled ✅" if new_value else "disabled 🛑"
     await ctx.send(f"Cog `{name}` is now {state} for this server.")
 
 def get_cog_enabled(guild_id, cog_name):
-    column = f"{cog_name}_enabled"
-
-    # Make sure the column exists
-    c.execute("PRAGMA table_info(server_config)")
-    columns = [row[1] for row in c.fetchall()]
-    if column not in columns:
-        return True  # Default to enabled if column missing
-
-    # Query current value
-    c.execute(f"SELECT {column} FROM server_config WHERE guild_id = ?", (guild_id,))
-    row = c.fetchone()
-    return row is None or row[0] == 1
+    return shared.is_cog_enabled(guild_id, f"{cog_name}_enabled")
 
 # --- Interactive Slash Command View ---
 class CogToggleView(View):
@@ -9546,6 +9233,8 @@ class CogSelect(Select):
         new_value = 0 if (row and row[0] == 1) else 1
 
         c.execute(f"UPDATE server_config SET {column} = ? WHERE guild_id = ?", (new_value, self.guild_id))
+        if c.rowcount:
+            shared.set_cog_enabled(self.guild_id, column, new_value)
         c.connection.commit()
 
         status = "enabled ✅" if new_value else "disabled 🛑"
@@ -9864,6 +9553,9 @@ def save_server_config(guild_id, prison_channel, line_channel, counting_channel,
         prefix or '!>'  # fallback to default if not provided
     ))
     shared.conn.commit()
+    shared.invalidate_server_config(guild_id)
+    shared.invalidate_cog_flags(guild_id)  # INSERT OR REPLACE resets the *_enabled columns
+    shared.invalidate_word_normalization(guild_id)
 
 @bot.command(name="setup_ids")
 @commands.has_permissions(administrator=True)
@@ -9989,6 +9681,7 @@ async def admin_set_config(
     if not existing:
         shared.c.execute("INSERT INTO server_config (guild_id) VALUES (?)", (guild_id,))
         shared.conn.commit()
+        shared.invalidate_server_config(guild_id)
 
     # Update each provided field
     updates = []
@@ -10013,6 +9706,7 @@ async def admin_set_config(
         query = f"UPDATE server_config SET {', '.join(updates)} WHERE guild_id = ?"
         shared.c.execute(query, (*values, guild_id))
         shared.conn.commit()
+        shared.invalidate_server_config(guild_id)
 
         if prefix:
             shared.prefixes[guild_id] = prefix
@@ -10290,17 +9984,10 @@ CONFIG_COLUMNS = [
 ]
 async def guild_autocomplete(ctx: AutocompleteContext):
     options = []
-    servers_path = "db/servers"
-    if os.path.isdir(servers_path):
-        for filename in os.listdir(servers_path):
-            if filename.endswith(".db"):
-                server_id = filename[:-3]
-                try:
-                    guild = ctx.interaction.client.get_guild(int(server_id))
-                    name = guild.name if guild else f"Unknown Server"
-                    options.append(f"{name} ({server_id})")
-                except Exception:
-                    continue
+    for server_id in shared.storage.guild_ids():
+        guild = ctx.interaction.client.get_guild(server_id)
+        name = guild.name if guild else f"Unknown Server"
+        options.append(f"{name} ({server_id})")
     return options
 
 
@@ -10593,9 +10280,14 @@ async def terminal(ctx, *, line: str):
 
 # ------------------- Run Bot -------------------
 if __name__ == "__main__":
+    # Bring every server DB to the current schema before any guild touches it
+    print(migrations.format_report(shared.storage.migrate_all()))
     try:
         bot.run(BOT_TOKEN)
     except KeyboardInterrupt:
         print("\nBot shutting down...")
     finally:
+        shared.stop_db_workers()
+        shared.write_behind.flush_all_sync(shared.storage.connect)
+        shared.close_all_server_dbs()
         conn.close()
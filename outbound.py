@@ -0,0 +1,287 @@
+"""Outbound Discord actions for the message pipeline, queued per rate-limit bucket.
+
+Enforcement used to await delete, warning, timeout and reaction calls inline,
+so a restricted spammer's burst queued up behind Discord's per-channel limits
+inside every handler. Stages now hand those actions to the dispatcher and
+move on. Each bucket (a channel, or a guild for member edits) has one worker
+that drains three priority lanes in order, on top of the library's own
+rate-limit handling:
+
+    HIGH    deletes and timeouts
+    NORMAL  warnings and other sends
+    LOW     cosmetic reactions; dropped once older than their ttl
+
+Control reactions (the gag 💣/👁️) go through decorate(): they are added in
+order on a separate per-channel reaction bucket, paced REACTION_INTERVAL
+apart, and cancel_decoration() drops whatever has not been added yet.
+clear_reactions() queues one action on the same bucket that strips a whole
+batch of expired gag echoes.
+
+Deletes queued for the same channel are sent as one bulk delete_messages call
+(up to 100). Warnings to the same user, of the same kind, in the same channel
+coalesce: while the last one is still up it is edited to the newest text with
+a repeat count instead of sending another message.
+
+    outbound.delete(message)
+    outbound.warn(message.channel, user_id, "⏳ Slow down", delete_after=30, kind="cooldown")
+    outbound.react(message, "⚡")
+    outbound.decorate(gag_msg, ("💣", "👁️"))
+    await outbound.call(f"guild:{guild_id}", lambda: member.timeout(until))
+"""
+import time
+import asyncio
+from collections import deque
+
+import discord
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = ("high", "normal", "low")
+BULK_DELETE_LIMIT = 100
+REACTION_TTL = 5.0
+REACTION_INTERVAL = 0.25  # Discord allows about one reaction per 0.25s per channel
+MAX_WARNING_STATES = 1000
+_DROPPED = object()  # Returned by an action that found it had nothing left to do
+
+
+class Bucket:
+    __slots__ = ("key", "interval", "lanes", "deletes", "task", "stats")
+
+    def __init__(self, key, interval: float = 0.0):
+        self.key = key
+        self.interval = interval  # Pause between actions
+        self.lanes = (deque(), deque(), deque())  # (queued_at, action) per priority
+        self.deletes = []                         # messages waiting for a (bulk) delete
+        self.task = None
+        self.stats = {"done": 0, "bulk_deleted": 0, "dropped": 0, "failed": 0}
+
+    def backlog(self) -> int:
+        return len(self.deletes) + sum(len(lane) for lane in self.lanes)
+
+
+class WarningState:
+    __slots__ = ("message", "content", "count", "delete_after", "expires", "queued")
+
+    def __init__(self, content, delete_after):
+        self.message = None
+        self.content = content
+        self.count = 1
+        self.delete_after = delete_after
+        self.expires = float("inf")  # Until the first send lands
+        self.queued = False
+
+
+class OutboundDispatcher:
+    def __init__(self, reaction_ttl: float = REACTION_TTL):
+        self.reaction_ttl = reaction_ttl
+        self._buckets = {}   # {bucket key: Bucket}
+        self._warnings = {}  # {(channel_id, user_id, kind): WarningState}
+        self._decorating = {}  # {message_id: reactions still queued}
+        self.stats = {"queued": 0, "coalesced": 0, "decorations_cancelled": 0}
+
+    # --- Queueing ---
+
+    def _bucket(self, key, interval: float = 0.0) -> Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(key, interval)
+        return bucket
+
+    def _wake(self, bucket: Bucket):
+        if bucket.task is None or bucket.task.done():
+            bucket.task = asyncio.get_running_loop().create_task(self._drain(bucket))
+
+    def submit(self, key, action, priority: int = NORMAL):
+        """Queue `await action()` on a bucket; fire and forget."""
+        bucket = self._bucket(key)
+        bucket.lanes[priority].append((time.monotonic(), action))
+        self.stats["queued"] += 1
+        self._wake(bucket)
+
+    async def call(self, key, action, priority: int = HIGH):
+        """Queue `await action()` and wait for its result (exceptions propagate)."""
+        future = asyncio.get_running_loop().create_future()
+
+        async def run():
+            try:
+                result = await action()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)  # The caller handles it
+                return
+            if not future.done():
+                future.set_result(result)
+
+        self.submit(key, run, priority)
+        return await future
+
+    def delete(self, message):
+        bucket = self._bucket(f"channel:{message.channel.id}")
+        bucket.deletes.append(message)
+        self.stats["queued"] += 1
+        self._wake(bucket)
+
+    def send(self, channel, content=None, priority: int = NORMAL, **kwargs):
+        self.submit(f"channel:{channel.id}", lambda: channel.send(content, **kwargs), priority)
+
+    def react(self, message, emoji, priority: int = LOW):
+        self.submit(f"channel:{message.channel.id}", lambda: message.add_reaction(emoji), priority)
+
+    def decorate(self, message, emojis, priority: int = NORMAL):
+        """Add reactions in order in the background; cancel_decoration() drops the rest."""
+        bucket = self._bucket(f"reactions:{message.channel.id}", REACTION_INTERVAL)
+        self._decorating[message.id] = self._decorating.get(message.id, 0) + len(emojis)
+
+        def add(emoji):
+            async def action():
+                remaining = self._decorating.get(message.id)
+                if remaining is None:
+                    return _DROPPED
+                if remaining <= 1:
+                    del self._decorating[message.id]
+                else:
+                    self._decorating[message.id] = remaining - 1
+                await message.add_reaction(emoji)
+            return action
+
+        for emoji in emojis:
+            bucket.lanes[priority].append((time.monotonic(), add(emoji)))
+            self.stats["queued"] += 1
+        self._wake(bucket)
+
+    def cancel_decoration(self, message_id):
+        if self._decorating.pop(message_id, None) is not None:
+            self.stats["decorations_cancelled"] += 1
+
+    def clear_reactions(self, channel, message_ids, priority: int = NORMAL):
+        """Clear every reaction on a batch of messages in one channel, one queued action."""
+        bucket = self._bucket(f"reactions:{channel.id}", REACTION_INTERVAL)
+        for message_id in message_ids:
+            self.cancel_decoration(message_id)
+
+        async def action():
+            for i, message_id in enumerate(message_ids):
+                if i:
+                    await asyncio.sleep(REACTION_INTERVAL)
+                try:
+                    await channel.get_partial_message(message_id).clear_reactions()
+                except (discord.NotFound, discord.Forbidden):
+                    pass  # Already deleted, or we can't manage messages there
+
+        bucket.lanes[priority].append((time.monotonic(), action))
+        self.stats["queued"] += 1
+        self._wake(bucket)
+
+    def warn(self, channel, user_id, content: str, delete_after: float = None, kind: str = "warning"):
+        """Send a warning, or fold it into the same user's live warning of this kind."""
+        key = (channel.id, user_id, kind)
+        now = time.monotonic()
+        state = self._warnings.get(key)
+        if state is not None and state.expires > now:
+            state.count += 1
+            state.content = content
+            self.stats["coalesced"] += 1
+            if state.queued:
+                return  # The pending send/edit will pick up the new text
+        else:
+            if len(self._warnings) >= MAX_WARNING_STATES:
+                self._warnings = {k: s for k, s in self._warnings.items() if s.expires > now}
+            state = self._warnings[key] = WarningState(content, delete_after)
+        state.queued = True
+        self.submit(f"channel:{channel.id}", lambda: self._flush_warning(channel, key, state), NORMAL)
+
+    async def _flush_warning(self, channel, key, state: WarningState):
+        state.queued = False
+        content = state.content if state.count == 1 else f"{state.content} (×{state.count})"
+        if state.message is not None:
+            try:
+                await state.message.edit(content=content)
+                return
+            except discord.NotFound:
+                state.message = None  # Deleted early; send a fresh one
+        state.message = await channel.send(content, delete_after=state.delete_after)
+        if state.delete_after:
+            state.expires = time.monotonic() + state.delete_after
+        else:
+            self._warnings.pop(key, None)
+
+    # --- Draining ---
+
+    async def _drain(self, bucket: Bucket):
+        await asyncio.sleep(0)  # Let handlers running right now queue into this batch
+        while True:
+            if bucket.deletes:
+                batch = bucket.deletes[:BULK_DELETE_LIMIT]
+                del bucket.deletes[:BULK_DELETE_LIMIT]
+                await self._delete_batch(bucket, batch)
+                continue
+            lane = next((lane for lane in bucket.lanes if lane), None)
+            if lane is None:
+                break
+            queued_at, action = lane.popleft()
+            if lane is bucket.lanes[LOW] and time.monotonic() - queued_at > self.reaction_ttl:
+                bucket.stats["dropped"] += 1
+                continue
+            try:
+                if await action() is _DROPPED:
+                    bucket.stats["dropped"] += 1
+                    continue
+                bucket.stats["done"] += 1
+            except Exception as e:
+                bucket.stats["failed"] += 1
+                print(f"[Outbound] {bucket.key}: {type(e).__name__}: {e}")
+            if bucket.interval:
+                await asyncio.sleep(bucket.interval)
+        bucket.task = None
+
+    async def _delete_batch(self, bucket: Bucket, messages: list):
+        messages = list({m.id: m for m in messages}.values())
+        channel = messages[0].channel
+        bulk = getattr(channel, "delete_messages", None)
+        if bulk is not None and len(messages) > 1:
+            try:
+                await bulk(messages)
+                bucket.stats["done"] += len(messages)
+                bucket.stats["bulk_deleted"] += len(messages)
+                return
+            except discord.NotFound:
+                pass  # One was already gone; fall back to deleting one by one
+            except discord.HTTPException as e:
+                print(f"[Outbound] Bulk delete in {bucket.key} failed, deleting one by one: {e}")
+        for message in messages:
+            try:
+                await message.delete()
+                bucket.stats["done"] += 1
+            except discord.NotFound:
+                bucket.stats["done"] += 1
+            except Exception as e:
+                bucket.stats["failed"] += 1
+                print(f"[Outbound] Delete in {bucket.key} failed: {type(e).__name__}: {e}")
+
+    # --- Reporting ---
+
+    def backlog(self) -> dict:
+        """{bucket key: {"delete": n, "high": n, "normal": n, "low": n}} for buckets with work queued."""
+        report = {}
+        for key, bucket in self._buckets.items():
+            if bucket.backlog():
+                counts = {"delete": len(bucket.deletes)}
+                counts.update((name, len(lane)) for name, lane in zip(PRIORITY_NAMES, bucket.lanes))
+                report[key] = counts
+        return report
+
+    def format_stats(self, limit: int = 10) -> str:
+        totals = {"done": 0, "bulk_deleted": 0, "dropped": 0, "failed": 0}
+        for bucket in self._buckets.values():
+            for name in totals:
+                totals[name] += bucket.stats[name]
+        backlog = self.backlog()
+        lines = [
+            f"📤 **Outbound:** queued `{self.stats['queued']}` done `{totals['done']}` "
+            f"bulk-deleted `{totals['bulk_deleted']}` coalesced `{self.stats['coalesced']}` "
+            f"dropped `{totals['dropped']}` failed `{totals['failed']}` | "
+            f"{len(backlog)} bucket(s) with a backlog"
+        ]
+        busiest = sorted(backlog.items(), key=lambda item: -sum(item[1].values()))[:limit]
+        for key, counts in busiest:
+            lines.append(f"`{key}` " + " ".join(f"{name} `{n}`" for name, n in counts.items()))
+        return "\n".join(lines)
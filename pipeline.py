@@ -0,0 +1,387 @@
+"""Staged message handling for on_message / on_message_edit.
+
+A MessagePipeline runs its registered stages in order for every message.
+Each stage is an async function taking a MessageContext; returning STOP ends
+processing for that message. Per-message values (config, DB handles,
+lowercased content, ...) come from named loaders that run at most once per
+message and only when a stage first reads them, so a message that never
+reaches a DB stage never opens the DB.
+
+    @pipe.loader("config")
+    def _config(ctx):
+        return shared.get_server_config(ctx.guild_id)
+
+    @pipe.stage("counting", order=400, needs=("config", "is_command"))
+    async def counting_stage(ctx):
+        ...
+        return STOP
+
+A loader that takes a resource (the guild DB checkout) registers its release
+with ctx.on_close(); it runs when the message's pipeline run ends.
+Slow follow-ups that need not hold up the author's next message (PiShock
+HTTP calls, silent commands) go to ctx.after_lane(); on_message_or_edit awaits
+them once the lane is released.
+
+Stages registered with a cog column (e.g. "gags_enabled") are skipped for
+guilds that have that cog turned off in server_config. Cogs add their stages
+in __init__ and remove them in cog_unload. Every stage records its latency
+in a histogram.
+
+LaneScheduler runs each (guild, user)'s messages one at a time, in arrival
+order, while different users run concurrently; per-message verdicts live on
+the MessageContext (stopped_by, deleted) rather than in module globals.
+
+EditCache remembers, per message, a hash of the content it was last judged on
+and the stage that stopped it, so on_message_edit can skip edits that leave
+the text as it was judged and settle bursts of edits with one re-check.
+"""
+import time
+import bisect
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+STOP = True
+
+# Histogram bucket upper bounds in seconds: 10us, 20us, ... ~5s
+BUCKETS = tuple(10e-6 * 2 ** i for i in range(20))
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th sample (0 when empty)."""
+        if not self.count:
+            return 0.0
+        rank = pct * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Stage:
+    __slots__ = ("name", "func", "order", "needs", "cog_column", "guild_only", "histogram", "stops")
+
+    def __init__(self, name, func, order, needs=(), cog_column=None, guild_only=True):
+        self.name = name
+        self.func = func
+        self.order = order
+        self.needs = tuple(needs)
+        self.cog_column = cog_column
+        self.guild_only = guild_only
+        self.histogram = LatencyHistogram()
+        self.stops = 0
+
+
+class MessageContext:
+    """Per-message state. Unset attributes are filled from the pipeline's loaders."""
+
+    def __init__(self, message, edited: bool, loaders: dict):
+        self.message = message
+        self.edited = edited
+        self.stopped_by = None
+        self.deleted = False       # A stage deleted the message; later stages must not act on it
+        self.run_commands = False  # Stopped, but still hand the message to process_commands
+        self.failed = False        # A stage raised; closers should undo rather than keep
+        self._loaders = loaders
+        self._closers = []         # Run by close() once the pipeline is done with the message
+        self.deferred = []         # Awaited by the caller after the author's lane is released
+
+    def on_close(self, callback):
+        """Call `callback()` when the run ends (e.g. to release a resource a loader took)."""
+        self._closers.append(callback)
+
+    def after_lane(self, func):
+        """Await `func()` once the lane is released, so slow work doesn't hold up the author's next message."""
+        self.deferred.append(func)
+
+    def close(self):
+        closers, self._closers = self._closers, []
+        for callback in reversed(closers):
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Pipeline] Cleanup failed: {type(e).__name__}: {e}")
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set yet
+        loader = self.__dict__.get("_loaders", {}).get(name)
+        if loader is None:
+            raise AttributeError(name)
+        value = loader(self)
+        setattr(self, name, value)
+        return value
+
+
+class MessagePipeline:
+    def __init__(self, is_enabled=None):
+        self._stages = []    # sorted by order
+        self._loaders = {}   # {name: fn(ctx) -> value}
+        self._is_enabled = is_enabled
+        self.stats = {"messages": 0, "stopped": 0}
+
+    # --- Registration ---
+
+    def loader(self, name: str):
+        def decorator(func):
+            self._loaders[name] = func
+            return func
+        return decorator
+
+    def add_stage(self, name, func, order, needs=(), cog_column=None, guild_only=True) -> Stage:
+        """Register (or replace) a stage; raises ValueError for an unknown need."""
+        missing = [need for need in needs if need not in self._loaders]
+        if missing:
+            raise ValueError(f"Stage {name!r} needs unknown context: {', '.join(missing)}")
+        self.remove_stage(name)
+        stage = Stage(name, func, order, needs, cog_column, guild_only)
+        self._stages.append(stage)
+        self._stages.sort(key=lambda s: s.order)
+        return stage
+
+    def stage(self, name, order, needs=(), cog_column=None, guild_only=True):
+        def decorator(func):
+            self.add_stage(name, func, order, needs, cog_column, guild_only)
+            return func
+        return decorator
+
+    def remove_stage(self, name: str):
+        self._stages = [stage for stage in self._stages if stage.name != name]
+
+    @property
+    def stages(self) -> list:
+        return list(self._stages)
+
+    def stage_enabled(self, stage: Stage, guild_id) -> bool:
+        if stage.guild_only and guild_id is None:
+            return False
+        if stage.cog_column and guild_id is not None and self._is_enabled:
+            return self._is_enabled(guild_id, stage.cog_column)
+        return True
+
+    # --- Running ---
+
+    async def run(self, message, edited: bool = False) -> MessageContext:
+        """Run every enabled stage until one returns STOP; ctx.stopped_by names it."""
+        self.stats["messages"] += 1
+        ctx = MessageContext(message, edited, self._loaders)
+        guild_id = message.guild.id if message.guild else None
+        try:
+            for stage in self._stages:
+                if not self.stage_enabled(stage, guild_id):
+                    continue
+                started = time.perf_counter()
+                try:
+                    result = await stage.func(ctx)
+                finally:
+                    stage.histogram.record(time.perf_counter() - started)
+                if result:
+                    stage.stops += 1
+                    self.stats["stopped"] += 1
+                    ctx.stopped_by = stage.name
+                    break
+        except BaseException:
+            ctx.failed = True
+            raise
+        finally:
+            ctx.close()
+        return ctx
+
+    def format_stats(self, guild_id=None) -> str:
+        lines = [f"🧩 **Message pipeline:** {self.stats['messages']} message(s), {self.stats['stopped']} stopped early"]
+        for stage in self._stages:
+            s = stage.histogram.summary()
+            flag = "" if guild_id is None or self.stage_enabled(stage, guild_id) else " (off here)"
+            lines.append(
+                f"`{stage.order:>4} {stage.name:<22}` runs `{s['count']}` stops `{stage.stops}` | "
+                f"p50 `{s['p50'] * 1000:.2f}ms` p99 `{s['p99'] * 1000:.2f}ms` max `{s['max'] * 1000:.2f}ms`{flag}"
+            )
+        return "\n".join(lines)
+
+
+# --- Per-user lanes ---
+
+class Lane:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: waiters acquire in arrival order
+        self.users = 0              # Holder + waiters; the lane is dropped at 0
+
+
+class LaneScheduler:
+    """One FIFO lane per key; a lane exists only while a message holds or awaits it.
+
+        async with lanes.lane((guild_id, user_id)):
+            ...
+
+    Acquire the lane before the handler's first await so lane order is the
+    order Discord delivered the events in.
+    """
+
+    def __init__(self):
+        self._lanes = {}  # {key: Lane}
+        self.wait_histogram = LatencyHistogram()
+        self.stats = {"runs": 0, "waited": 0, "collected": 0, "peak_lanes": 0, "peak_depth": 0}
+
+    def __len__(self):
+        return len(self._lanes)
+
+    @asynccontextmanager
+    async def lane(self, key):
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = Lane()
+            self.stats["peak_lanes"] = max(self.stats["peak_lanes"], len(self._lanes))
+        lane.users += 1
+        self.stats["runs"] += 1
+        if lane.users > 1:
+            self.stats["waited"] += 1
+            self.stats["peak_depth"] = max(self.stats["peak_depth"], lane.users)
+        started = time.perf_counter()
+        try:
+            async with lane.lock:
+                self.wait_histogram.record(time.perf_counter() - started)
+                yield
+        finally:
+            lane.users -= 1
+            if lane.users == 0 and self._lanes.get(key) is lane:
+                del self._lanes[key]
+                self.stats["collected"] += 1
+
+    def format_stats(self) -> str:
+        s = self.stats
+        w = self.wait_histogram.summary()
+        return (
+            f"🛣️ **Lanes:** {len(self._lanes)} open (peak {s['peak_lanes']}, deepest queue {s['peak_depth']}) | "
+            f"runs `{s['runs']}` queued `{s['waited']}` collected `{s['collected']}` | "
+            f"wait p50 `{w['p50'] * 1000:.2f}ms` p99 `{w['p99'] * 1000:.2f}ms` max `{w['max'] * 1000:.2f}ms`"
+        )
+
+
+# --- Edit dedupe ---
+
+def content_key(content: str) -> int:
+    """Hash of the raw content.
+
+    Deliberately not normalize()d or whitespace-collapsed: stages such as the
+    bypass prefixes and markers, gags and line writing act on the exact text,
+    so "pl3ase" -> "please" or "((" -> " ((" must be judged again.
+    """
+    return hash(content)
+
+
+class EditCache:
+    """Last processed content hash and verdict per message id, per channel.
+
+    Channels and the messages inside each one are kept in LRU order: a channel
+    holds at most per_channel messages and at most max_channels channels are
+    tracked. check() classifies an edit as:
+
+        "same"      content unchanged; the old verdict stands
+        "debounce"  arrived within debounce seconds of the last check; the old
+                    verdict stands until the trailing re-check (see defer())
+        None        unknown message or changed content; run the pipeline
+    """
+
+    def __init__(self, per_channel: int = 200, max_channels: int = 1000, debounce: float = 2.0):
+        self.per_channel = per_channel
+        self.max_channels = max_channels
+        self.debounce = debounce
+        self._channels = OrderedDict()  # {channel_id: OrderedDict({message_id: [key, verdict, checked_at]})}
+        self._pending = {}              # {message_id: asyncio.Task} trailing re-checks
+        self.stats = {"same": 0, "debounced": 0, "misses": 0, "evicted": 0, "rechecks": 0}
+
+    def __len__(self):
+        return sum(len(messages) for messages in self._channels.values())
+
+    def get(self, channel_id, message_id):
+        messages = self._channels.get(channel_id)
+        return messages.get(message_id) if messages else None
+
+    def record(self, channel_id, message_id, key: int, verdict, now: float = None):
+        messages = self._channels.get(channel_id)
+        if messages is None:
+            messages = self._channels[channel_id] = OrderedDict()
+            if len(self._channels) > self.max_channels:
+                _, dropped = self._channels.popitem(last=False)
+                self.stats["evicted"] += len(dropped)
+        else:
+            self._channels.move_to_end(channel_id)
+        messages[message_id] = [key, verdict, time.monotonic() if now is None else now]
+        messages.move_to_end(message_id)
+        if len(messages) > self.per_channel:
+            messages.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def check(self, channel_id, message_id, key: int, now: float = None):
+        entry = self.get(channel_id, message_id)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if entry[0] == key:
+            self.stats["same"] += 1
+            return "same"
+        now = time.monotonic() if now is None else now
+        if now - entry[2] < self.debounce:
+            self.stats["debounced"] += 1
+            return "debounce"
+        self.stats["misses"] += 1
+        return None
+
+    def defer(self, channel_id, message_id, recheck):
+        """Run `await recheck()` once the debounce window since the last check ends.
+
+        A newer deferral for the same message replaces the pending one, so a
+        burst of edits is judged once, on its final content.
+        """
+        entry = self.get(channel_id, message_id)
+        delay = self.debounce - (time.monotonic() - entry[2]) if entry else 0
+
+        async def runner():
+            await asyncio.sleep(max(delay, 0))
+            self._pending.pop(message_id, None)
+            self.stats["rechecks"] += 1
+            await recheck()
+
+        pending = self._pending.pop(message_id, None)
+        if pending:
+            pending.cancel()
+        self._pending[message_id] = asyncio.create_task(runner())
+
+    def format_stats(self) -> str:
+        s = self.stats
+        edits = s["same"] + s["debounced"] + s["misses"]
+        reused = s["same"] + s["debounced"]
+        rate = f"{reused / edits:.0%}" if edits else "n/a"
+        return (
+            f"✏️ **Edit cache:** {len(self)} message(s) in {len(self._channels)} channel(s), "
+            f"debounce {self.debounce:g}s | edits `{edits}` unchanged `{s['same']}` debounced `{s['debounced']}` "
+            f"re-run `{s['misses']}` re-checks `{s['rechecks']}` evicted `{s['evicted']}` | reused {rate}"
+        )
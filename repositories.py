@@ -0,0 +1,195 @@
+"""Table access for the per-server databases, one repository per table family.
+
+Repositories wrap a sqlite3 connection: by default the pooled one from
+shared.get_server_db(guild_id), or any connection passed in (e.g. the worker
+connection inside shared.db(guild_id).run_in_transaction). They never commit
+on their own; wrap bulk work in `with transaction(conn):` or commit yourself.
+
+SQL lives in module constants so every call reuses the connection's statement
+cache instead of re-preparing ad-hoc strings.
+"""
+from contextlib import contextmanager
+
+import shared
+
+DEFAULT_BALANCE = 1000
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN ... COMMIT around a block, rolled back if it raises."""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# --- Row objects ---
+
+class _Row:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class WalletRow(_Row):
+    __slots__ = ("user_id", "balance")
+
+
+class _Repository:
+    __slots__ = ("conn",)
+
+    def __init__(self, guild_id=None, conn=None):
+        self.conn = conn if conn is not None else shared.get_server_db(guild_id)
+
+
+# --- Wallets ---
+
+class WalletRepository(_Repository):
+    __slots__ = ()
+
+    SELECT_BALANCE = "SELECT balance FROM user_wallets WHERE user_id = ?"
+    INSERT_DEFAULT = "INSERT OR IGNORE INTO user_wallets (user_id, balance) VALUES (?, ?)"
+    # Missing wallets start at DEFAULT_BALANCE; balances never go below zero.
+    # INSERT OR IGNORE + UPDATE rather than an UPSERT so it also runs on the
+    # consolidated backend's per-guild views.
+    ADD = "UPDATE user_wallets SET balance = MAX(0, balance + ?) WHERE user_id = ?"
+    TOP = "SELECT user_id, balance FROM user_wallets ORDER BY balance DESC, user_id ASC LIMIT ?"
+    DELETE = "DELETE FROM user_wallets WHERE user_id = ?"
+
+    def balance(self, user_id):
+        """Current balance, or None when the user has no wallet yet."""
+        row = self.conn.execute(self.SELECT_BALANCE, (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def ensure(self, user_id) -> int:
+        """Balance, creating the wallet with the default balance if needed."""
+        balance = self.balance(user_id)
+        if balance is None:
+            self.conn.execute(self.INSERT_DEFAULT, (user_id, DEFAULT_BALANCE))
+            return DEFAULT_BALANCE
+        return balance
+
+    def add(self, user_id, amount) -> int:
+        self.conn.execute(self.INSERT_DEFAULT, (user_id, DEFAULT_BALANCE))
+        self.conn.execute(self.ADD, (amount, user_id))
+        return self.balance(user_id)
+
+    def has_funds(self, user_id, amount) -> bool:
+        balance = self.balance(user_id)
+        return balance is not None and balance >= amount
+
+    def transfer(self, sender_id, recipient_id, amount):
+        deltas = ((sender_id, -amount), (recipient_id, amount))
+        self.conn.executemany(self.INSERT_DEFAULT, ((user_id, DEFAULT_BALANCE) for user_id, _ in deltas))
+        self.conn.executemany(self.ADD, ((delta, user_id) for user_id, delta in deltas))
+
+    def top(self, limit=10) -> list:
+        return [WalletRow(*row) for row in self.conn.execute(self.TOP, (limit,))]
+
+    def delete(self, user_id):
+        self.conn.execute(self.DELETE, (user_id,))
+
+
+# --- Restrictions (gags, prison, cooldowns, word rules, locks) ---
+
+class RestrictionRepository(_Repository):
+    __slots__ = ()
+
+    # Every per-user table that `red` wipes
+    USER_TABLES = (
+        "gagged_users", "prison_users", "user_auth", "cooldown_users", "enforced_words",
+        "enforcement_offenses", "banned_words", "ignored_users", "user_settings",
+        "line_assignments", "active_line_writers", "timer_logs", "allowed_users",
+        "locked_users", "pishock_users",
+    )
+    DELETE_USER = {table: f"DELETE FROM {table} WHERE user_id = ?" for table in USER_TABLES}
+
+    SELECT_GAG_TYPE = "SELECT type FROM gagged_users WHERE user_id = ?"
+    SELECT_ENFORCEMENT_ACTION = "SELECT enforcement_action FROM user_settings WHERE user_id = ?"
+    UPSERT_PRISONER = "INSERT OR REPLACE INTO prison_users (user_id, channel_id, balance) VALUES (?, ?, ?)"
+    UPSERT_SOLITARY = "INSERT OR REPLACE INTO solitary_confinement (user_id, thread_id, archive_date) VALUES (?, ?, ?)"
+
+    def purge_user(self, user_id):
+        for sql in self.DELETE_USER.values():
+            self.conn.execute(sql, (user_id,))
+
+    def gag_type(self, user_id, default="loose"):
+        row = self.conn.execute(self.SELECT_GAG_TYPE, (user_id,)).fetchone()
+        return row[0] if row else default
+
+    def enforcement_action(self, user_id) -> str:
+        row = self.conn.execute(self.SELECT_ENFORCEMENT_ACTION, (user_id,)).fetchone()
+        return row[0] if row else "timeout"  # Default to timeout if not set
+
+    def set_prisoners(self, rows):
+        """rows: iterable of (user_id, channel_id, balance)."""
+        self.conn.executemany(self.UPSERT_PRISONER, rows)
+
+    def set_solitaries(self, rows):
+        """rows: iterable of (user_id, thread_id, archive_date)."""
+        self.conn.executemany(self.UPSERT_SOLITARY, rows)
+
+
+# --- PiShock ---
+
+class PishockRepository(_Repository):
+    __slots__ = ()
+
+    SELECT_CODES = "SELECT user_id, code FROM pishock_users"
+    # Reasons map to the *_shock_intensity / *_shock_duration column pairs
+    SELECT_SHOCK = {
+        reason: f"SELECT {reason}_shock_intensity, {reason}_shock_duration FROM pishock_users WHERE user_id = ?"
+        for reason in ("line_writing", "enforcement_action", "lightning_reaction")
+    }
+    SELECT_CODE = "SELECT code FROM pishock_users WHERE user_id = ?"
+    SELECT_SHOCK_RANGE = "SELECT shock_min, shock_max, duration_min, duration_max FROM pishock_users WHERE user_id = ?"
+    SELECT_VIBRATE_RANGE = "SELECT vibrate_min, vibrate_max, duration_min, duration_max FROM pishock_users WHERE user_id = ?"
+    DELETE = "DELETE FROM pishock_users WHERE user_id = ?"
+
+    def shock_for(self, user_id, reason):
+        """(intensity, duration) configured for reason, or None if the user has no PiShock row."""
+        return self.conn.execute(self.SELECT_SHOCK[reason], (user_id,)).fetchone()
+
+    def code(self, user_id):
+        row = self.conn.execute(self.SELECT_CODE, (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def shock_range(self, user_id):
+        """(shock_min, shock_max, duration_min, duration_max), or None."""
+        return self.conn.execute(self.SELECT_SHOCK_RANGE, (user_id,)).fetchone()
+
+    def vibrate_range(self, user_id):
+        """(vibrate_min, vibrate_max, duration_min, duration_max), or None."""
+        return self.conn.execute(self.SELECT_VIBRATE_RANGE, (user_id,)).fetchone()
+
+    def codes(self) -> dict:
+        return dict(self.conn.execute(self.SELECT_CODES).fetchall())
+
+    def delete(self, user_id):
+        self.conn.execute(self.DELETE, (user_id,))
+
+
+# --- Command logs ---
+
+class LogRepository(_Repository):
+    __slots__ = ()
+
+    INSERT = "INSERT INTO command_logs (user_id, command, arguments) VALUES (?, ?, ?)"
+
+    def add(self, user_id, command, arguments):
+        self.conn.execute(self.INSERT, (user_id, command, arguments))
@@ -1,5 +1,9 @@
 import os
+import time
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
 from functools import wraps
 from types import SimpleNamespace
@@ -11,6 +15,18 @@ from discord.ext.commands import check
 
 import asyncio
 
+import migrations
+import async_db
+import snapshots
+import storage as storage_mod
+import write_behind as write_behind_mod
+import wordmatch
+import pipeline
+import assets
+import outbound as outbound_mod
+import webhooks as webhooks_mod
+import gag_store
+
 command_log_queue = asyncio.Queue()
 
 # --- Runtime Shared State ---
@@ -18,7 +34,6 @@ command_log_queue = asyncio.Queue()
 # Placeholder; will be set by muzzled.py
 
 
-gagged_messages = {}
 gag_functions = {}
 
 AUTHORIZED_LOCK_MANAGERS = set()
@@ -30,14 +45,11 @@ c = None  # Global DB cursor (deprecated in favor of server DBs)
 pishock_command = None
 
 
-handle_gagged_message = None
 enforcement_gag_send = None
 handle_gag_reaction = None
 
-enforce_prison_restrictions = None
 temporarily_freed = {}
 
-returnvar = False
 silent_executions = set()
 pending_silent_commands = {}  # key = user_id, value = (command_name, run_as_user_id)
 # In your shared.py or similar
@@ -52,6 +64,23 @@ async def safe_send(ctx, content=None, **kwargs):
         return
     return await ctx.send(content, **kwargs)
 
+# --- PiShock ---
+
+async def pishock(guild_id, user_id, op: int = 0, intensity: int = 50, duration: int = 2) -> dict:
+    """pishock_command on a worker thread; it is a blocking HTTP request."""
+    return await asyncio.to_thread(pishock_command, guild_id, user_id, op=op, intensity=intensity, duration=duration)
+
+async def pishock_and_announce(guild_id, user_id, intensity, duration, channel, text, delete_after=None):
+    """Shock, then post `text` in `channel` if it went through; failures are only logged."""
+    try:
+        result = await pishock(guild_id, user_id, op=0, intensity=intensity, duration=duration)
+        if result.get("Success"):
+            await channel.send(text, delete_after=delete_after)
+        else:
+            print(f"[PiShock] Failure: {result.get('Message')}")
+    except Exception as e:
+        print(f"[PiShock] Error triggering shock for user {user_id}: {e}")
+
 # --- Global DB connection ---
 
 os.makedirs("db", exist_ok=True)
@@ -61,30 +90,12 @@ global_conn = sqlite3.connect(global_db_path)
 global_cursor = global_conn.cursor()
 
 
-# Ensure table exists
-global_cursor.execute('''
-CREATE TABLE IF NOT EXISTS server_config (
-    guild_id INTEGER PRIMARY KEY,
-    prison_channel_id INTEGER,
-    line_writing_id INTEGER,
-    counting_id INTEGER,
-    gambling_id INTEGER,
-    solitary_role_id INTEGER,
-    prisoner_role_id INTEGER,
-    sc_role_id INTEGER,
-    botstatus_id INTEGER,
-    task_channel_id INTEGER,
-    log_channel_id INTEGER,
-    gags_enabled INTEGER DEFAULT 1,
-    prison_enabled INTEGER DEFAULT 1,
-    pishock_enabled INTEGER DEFAULT 1
-)
-''')
-global_conn.commit()
+# Bring global.db up to the current schema version
+migrations.migrate_global_db(global_conn)
 
 # --- ServerConfig Dataclass ---
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ServerConfig:
     PRISON_CHANNEL_ID: int = None
     LINE_WRITING_ID: int = None
@@ -147,12 +158,26 @@ def unpack_config_from_obj(config):
 
 # --- Server Config Access ---
 
+# Configs only change through save_server_config / admin_set_config, which
+# call invalidate_server_config. Missing configs are cached too (as None).
+_server_config_cache = {}  # {guild_id: ServerConfig | None}
+server_config_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
 def get_server_config(guild_id) -> ServerConfig | None:
+    try:
+        config = _server_config_cache[guild_id]
+        server_config_stats["hits"] += 1
+        return config
+    except KeyError:
+        server_config_stats["misses"] += 1
+
     try:
         cur = global_conn.cursor()
         cur.execute("SELECT * FROM server_config WHERE guild_id = ?", (guild_id,))
         row = cur.fetchone()
         if not row:
+            _server_config_cache[guild_id] = None
             return None
         columns = [desc[0] for desc in cur.description]
         raw_config = dict(zip(columns, row))
@@ -161,139 +186,444 @@ def get_server_config(guild_id) -> ServerConfig | None:
             for col in CONFIG_KEYS
             if col in raw_config
         }
-        return ServerConfig(**kwargs)
+        config = ServerConfig(**kwargs)
+        _server_config_cache[guild_id] = config
+        return config
     except Exception as e:
         print(f"[shared] Failed to load server config: {e}")
         return None
 
+
+def invalidate_server_config(guild_id=None):
+    """Drop the cached config for one guild (or all guilds) after a write."""
+    server_config_stats["invalidations"] += 1
+    if guild_id is None:
+        _server_config_cache.clear()
+    else:
+        _server_config_cache.pop(guild_id, None)
+
+
+def server_config_cache_stats() -> dict:
+    lookups = server_config_stats["hits"] + server_config_stats["misses"]
+    return {
+        **server_config_stats,
+        "cached": len(_server_config_cache),
+        "hit_ratio": server_config_stats["hits"] / lookups if lookups else 0.0,
+    }
+
 # --- Cog Control ---
 
+# Cog toggles live in memory as one bitmask per guild: bit N is set when the
+# Nth *_enabled column of server_config is 1. The column -> bit map is read
+# once and refreshed by refresh_cog_columns() when columns are added.
+_cog_bits = None   # {column: bit}
+_cog_flags = {}    # {guild_id: int}
+
+
+def refresh_cog_columns():
+    global _cog_bits
+    global_cursor.execute("PRAGMA table_info(server_config)")
+    columns = [row[1] for row in global_cursor.fetchall() if row[1].endswith("_enabled")]
+    _cog_bits = {column: bit for bit, column in enumerate(columns)}
+    _cog_flags.clear()
+
+
+def _load_cog_flags(guild_id):
+    columns = list(_cog_bits)
+    mask = (1 << len(columns)) - 1  # no row: everything enabled
+    if columns:
+        global_cursor.execute(f"SELECT {', '.join(columns)} FROM server_config WHERE guild_id = ?", (guild_id,))
+        row = global_cursor.fetchone()
+        if row is not None:
+            mask = sum(1 << _cog_bits[column] for column, value in zip(columns, row) if value == 1)
+    _cog_flags[guild_id] = mask
+    return mask
+
+
 def is_cog_enabled(guild_id, cog_column):
     try:
-        global_cursor.execute("PRAGMA table_info(server_config)")
-        columns = [row[1] for row in global_cursor.fetchall()]
-        if cog_column not in columns:
+        if _cog_bits is None:
+            refresh_cog_columns()
+        bit = _cog_bits.get(cog_column)
+        if bit is None:
             return True
-        global_cursor.execute(f"SELECT {cog_column} FROM server_config WHERE guild_id = ?", (guild_id,))
-        row = global_cursor.fetchone()
-        return row is None or row[0] == 1
+        mask = _cog_flags.get(guild_id)
+        if mask is None:
+            mask = _load_cog_flags(guild_id)
+        return bool(mask >> bit & 1)
     except Exception as e:
         print(f"[shared] is_cog_enabled failed: {e}")
         return True
 
+
+def set_cog_enabled(guild_id, cog_column, enabled):
+    """Mirror a server_config *_enabled write into the in-memory flags."""
+    if _cog_bits is None or cog_column not in _cog_bits:
+        refresh_cog_columns()
+    bit = _cog_bits.get(cog_column)
+    if bit is None or guild_id not in _cog_flags:
+        return  # loaded from the DB on next check
+    if enabled:
+        _cog_flags[guild_id] |= 1 << bit
+    else:
+        _cog_flags[guild_id] &= ~(1 << bit)
+
+
+def invalidate_cog_flags(guild_id=None):
+    if guild_id is None:
+        _cog_flags.clear()
+    else:
+        _cog_flags.pop(guild_id, None)
+
+
 def cog_enabled(cog_column):
+    """Command check (prefix or slash) that passes while the cog is enabled for the guild."""
     def predicate(ctx):
-        return is_cog_enabled(ctx.guild.id, cog_column)
+        return ctx.guild is None or is_cog_enabled(ctx.guild.id, cog_column)
     return check(predicate)
 
 # --- Per-Server Database Access ---
 
+# Per-guild files or one consolidated DB; muzzled.py swaps in the configured
+# backend (TETHERBOT_STORAGE) once tetherbot.env is loaded
+storage = storage_mod.PerGuildFileStorage()
+
+# Guild connections are opened once and kept in an LRU registry. Code that
+# holds a connection across an await checks it out (acquire_server_db /
+# release_server_db, or `with checkout_server_db(guild_id) as db:`); the LRU
+# cap and the idle sweep only close connections nobody has checked out, so the
+# registry can run over SERVER_DB_MAX_OPEN while every handle is busy.
+# get_server_db alone is a borrow, good until the caller's next await.
+# Holders share the connection and so its open transaction: a holder that
+# fails rolls it back, and the last release commits whatever is left. Writers
+# that don't hold a checkout (background loops) go through db(guild_id).
+
+SERVER_DB_MAX_OPEN = 128          # max pooled guild connections
+SERVER_DB_IDLE_TIMEOUT = 900      # seconds an unused handle stays open
+SERVER_DB_SWEEP_INTERVAL = 60     # seconds between idle sweeps
+
+class PooledServerDB:
+    __slots__ = ("guild_id", "conn", "last_used", "checkouts", "retired")
+
+    def __init__(self, guild_id, conn, last_used):
+        self.guild_id = guild_id
+        self.conn = conn
+        self.last_used = last_used
+        self.checkouts = 0     # acquire_server_db calls not yet released
+        self.retired = False   # Dropped from the registry; close on the last release
+
+
+_server_db_pool = OrderedDict()   # {guild_id: PooledServerDB}
+_server_db_checked_out = {}       # {conn: PooledServerDB} with checkouts > 0
+_server_db_lock = threading.RLock()
+_server_db_last_sweep = time.monotonic()
+server_db_stats = {"hits": 0, "misses": 0, "evictions": 0, "idle_closed": 0, "deferred_closes": 0}
+
+
+# --- Message Pipeline ---
+# Stages for on_message_or_edit. muzzled.py registers the core stages; cogs
+# add theirs (with their *_enabled column) on load and remove them on unload.
+message_pipeline = pipeline.MessagePipeline(is_enabled=lambda guild_id, column: is_cog_enabled(guild_id, column))
+
+# Gagged message -> visible webhook echo, from Discord's own timestamps
+gag_latency = pipeline.LatencyHistogram()
+
+# Per-(guild, user) ordering for on_message_or_edit
+message_lanes = pipeline.LaneScheduler()
+
+# Deletes, warnings, timeouts and cosmetic reactions from enforcement, queued
+# per channel/guild bucket with priority lanes
+outbound = outbound_mod.OutboundDispatcher()
+
+# The bot's "GagWebhook" per channel (gag echoes, sayas), resolved once
+gag_webhooks = webhooks_mod.WebhookRegistry(name="GagWebhook")
+
+# Gag echoes whose 💣/👁️ controls are live: {message_id: GaggedMessage}, each
+# dropped (and its reactions cleared) GAG_REACTION_TTL seconds after sending
+GAG_REACTION_TTL = 300
+gagged_messages = gag_store.GaggedMessageStore(outbound, ttl=GAG_REACTION_TTL)
+
+# Edits whose content didn't change, or that land within
+# EDIT_DEBOUNCE_SECONDS of the last check, reuse the previous verdict
+EDIT_DEBOUNCE_SECONDS = 2.0
+edit_cache = pipeline.EditCache(per_channel=200, max_channels=1000, debounce=EDIT_DEBOUNCE_SECONDS)
+
+
+# --- Media Assets ---
+# Files sent by trigger responses, loaded into memory once and reloaded when
+# they change on disk. TRIGGERS maps message phrases to them; entries earlier
+# in the table win when a message has several.
+media = assets.AssetRegistry()
+media.register("click", "non-suspicious sound.mp3")
+media.register("bark", "bark.png")
+media.register("rigged", "rigged.png")
+media.register("collar", "collar.mp3")
+media.register("dog_silly", "dog-silly.gif")
+media.register("prison", "prison.png")
+
+TRIGGERS = assets.TriggerTable([
+    assets.Trigger("click", ("*click*", "*clicks*"), asset="click", filename="wruf.mp3"),
+    assets.Trigger("bark", ("!>bark", "!>bork"), asset="bark"),
+    assets.Trigger("rigged", ("!>rigged", "!>unfair"), asset="rigged"),
+    assets.Trigger("collar", ("*collar*", "!>collar"), asset="collar", filename="jingle.mp3"),
+    assets.Trigger("sluppy", ("!>sluppy", "!>frshwtr"), asset="dog_silly", stage="sluppy"),
+])
+
+
+# --- Word Normalization ---
+
+# Per-guild opt-in for normalized word matching (server_config.word_normalization),
+# read once per guild and updated in place by set_word_normalization.
+_word_normalization = {}  # {guild_id: bool}
+
+
+def is_word_normalization_enabled(guild_id) -> bool:
+    enabled = _word_normalization.get(guild_id)
+    if enabled is None:
+        try:
+            global_cursor.execute("SELECT word_normalization FROM server_config WHERE guild_id = ?", (guild_id,))
+            row = global_cursor.fetchone()
+            enabled = bool(row and row[0])
+        except Exception as e:
+            print(f"[shared] Failed to load word normalization: {e}")
+            return False
+        _word_normalization[guild_id] = enabled
+    return enabled
+
+
+def set_word_normalization(guild_id, enabled: bool):
+    global_cursor.execute("INSERT OR IGNORE INTO server_config (guild_id) VALUES (?)", (guild_id,))
+    global_cursor.execute(
+        "UPDATE server_config SET word_normalization = ? WHERE guild_id = ?", (int(enabled), guild_id)
+    )
+    global_conn.commit()
+    _word_normalization[guild_id] = bool(enabled)
+
+
+def invalidate_word_normalization(guild_id=None):
+    if guild_id is None:
+        _word_normalization.clear()
+    else:
+        _word_normalization.pop(guild_id, None)
+
+
+def _close_pooled(entry: PooledServerDB):
+    try:
+        entry.conn.commit()
+        entry.conn.close()
+    except Exception as e:
+        print(f"[shared] Failed to close server DB {entry.guild_id}: {e}")
+
+
+def _sweep_idle_server_dbs(now: float):
+    global _server_db_last_sweep
+    _server_db_last_sweep = now
+    idle = [gid for gid, entry in _server_db_pool.items()
+            if not entry.checkouts and now - entry.last_used > SERVER_DB_IDLE_TIMEOUT]
+    for gid in idle:
+        server_db_stats["idle_closed"] += 1
+        _close_pooled(_server_db_pool.pop(gid))
+
+
+def _pooled_server_db(guild_id: int) -> PooledServerDB:
+    now = time.monotonic()
+    entry = _server_db_pool.get(guild_id)
+    if entry is not None:
+        entry.last_used = now
+        _server_db_pool.move_to_end(guild_id)
+        server_db_stats["hits"] += 1
+        return entry
+
+    server_db_stats["misses"] += 1
+    entry = _server_db_pool[guild_id] = PooledServerDB(guild_id, storage.connect(guild_id, check_same_thread=False), now)
+
+    # Least recently used first, skipping connections that are checked out
+    excess = len(_server_db_pool) - SERVER_DB_MAX_OPEN
+    if excess > 0:
+        for gid in [gid for gid, e in _server_db_pool.items() if not e.checkouts and gid != guild_id][:excess]:
+            server_db_stats["evictions"] += 1
+            _close_pooled(_server_db_pool.pop(gid))
+
+    if now - _server_db_last_sweep > SERVER_DB_SWEEP_INTERVAL:
+        _sweep_idle_server_dbs(now)
+    return entry
+
+
 def get_server_db(guild_id: int) -> sqlite3.Connection:
-    os.makedirs("db/servers", exist_ok=True)
-    path = f"db/servers/{guild_id}.db"
-    conn = sqlite3.connect(path, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL")  # 🔧 Add this
-    initialize_server_db(conn)
-    return conn
-
-
-def initialize_server_db(conn: sqlite3.Connection):
-    c = conn.cursor()
-
-    # (Put all your CREATE TABLE statements here)
-    c.execute('''CREATE TABLE IF NOT EXISTS gagged_users (
-        user_id INTEGER PRIMARY KEY, type TEXT, status TEXT DEFAULT 'active')''')
-    # NEW: double_type_users table
-    c.execute('''CREATE TABLE IF NOT EXISTS double_type_users (
-            user_id INTEGER PRIMARY KEY)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS prison_users (
-        user_id INTEGER PRIMARY KEY, channel_id INTEGER, balance INTEGER)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS user_auth (
-        user_id INTEGER PRIMARY KEY, auth_level TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS cooldown_users (
-        user_id INTEGER PRIMARY KEY, cooldown INTEGER)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS solitary_confinement (
-        user_id INTEGER PRIMARY KEY, thread_id INTEGER, archive_date TIMESTAMP)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS enforced_words (
-        user_id INTEGER, word TEXT, initial_time INTEGER, added_time INTEGER,
-        PRIMARY KEY(user_id, word))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS enforcement_offenses (
-        user_id INTEGER PRIMARY KEY, count INTEGER DEFAULT 0)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS banned_words (
-        user_id INTEGER, word TEXT, initial_time INTEGER, added_time INTEGER,
-        PRIMARY KEY(user_id, word))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS ignored_users (user_id INTEGER PRIMARY KEY)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS user_settings (
-        user_id INTEGER PRIMARY KEY, enforcement_action TEXT DEFAULT 'timeout')''')
-    c.execute('''CREATE TABLE IF NOT EXISTS line_assignments (
-        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
-        line TEXT, lines_required INTEGER, penalty_lines INTEGER DEFAULT 0,
-        last_submission TEXT, assigned_by INTEGER)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS active_line_writers (
-        user_id INTEGER, line TEXT, lines_required INTEGER,
-        lines_written INTEGER DEFAULT 0, penalty_lines INTEGER DEFAULT 0,
-        assignment_id INTEGER, assigned_by INTEGER,
-        PRIMARY KEY (user_id, assignment_id))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS user_wallets (
-        user_id INTEGER PRIMARY KEY, balance INTEGER DEFAULT 1000)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS bets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, initiator_id INTEGER, opponent_id INTEGER,
-        amount INTEGER, game TEXT, status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS daily_claims (
-        user_id INTEGER PRIMARY KEY, last_claim TIMESTAMP, claim_count INTEGER DEFAULT 0, streak_days INTEGER DEFAULT 0)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS timer_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
-        timer_name TEXT, start_time TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS command_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
-        command TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, arguments TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS allowed_users (
-        user_id INTEGER, channel_id INTEGER, PRIMARY KEY (user_id, channel_id))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS locked_users (
-        user_id INTEGER PRIMARY KEY, locked_by INTEGER)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS pishock_users (
-        user_id INTEGER PRIMARY KEY,
-        code TEXT NOT NULL,
-        shock_min INTEGER DEFAULT 1 CHECK(shock_min BETWEEN 1 AND 100),
-        shock_max INTEGER DEFAULT 100 CHECK(shock_max BETWEEN 1 AND 100),
-        vibrate_min INTEGER DEFAULT 1 CHECK(vibrate_min BETWEEN 1 AND 100),
-        vibrate_max INTEGER DEFAULT 100 CHECK(vibrate_max BETWEEN 1 AND 100),
-        duration_min INTEGER DEFAULT 1 CHECK(duration_min BETWEEN 1 AND 15),
-        duration_max INTEGER DEFAULT 15 CHECK(duration_max BETWEEN 1 AND 15),
-        line_writing_shock_intensity INTEGER DEFAULT 50 CHECK(line_writing_shock_intensity BETWEEN 0 AND 100),
-        line_writing_shock_duration INTEGER DEFAULT 2 CHECK(line_writing_shock_duration BETWEEN 1 AND 15),
-        enforcement_action_shock_intensity INTEGER DEFAULT 50 CHECK(enforcement_action_shock_intensity BETWEEN 0 AND 100),
-        enforcement_action_shock_duration INTEGER DEFAULT 2 CHECK(enforcement_action_shock_duration BETWEEN 1 AND 15),
-        lightning_reaction_shock_intensity INTEGER DEFAULT 50 CHECK(lightning_reaction_shock_intensity BETWEEN 0 AND 100),
-        lightning_reaction_shock_duration INTEGER DEFAULT 2 CHECK(lightning_reaction_shock_duration BETWEEN 1 AND 15)
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS lovense_users (
-        user_id INTEGER PRIMARY KEY, token TEXT NOT NULL)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS solitary_pings (
-        thread_id INTEGER PRIMARY KEY, last_ping TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS bot_status (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, restart_status TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS pot (
-        id INTEGER PRIMARY KEY CHECK(id = 1), pot INTEGER DEFAULT 0)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS command_bans (
-        user_id INTEGER PRIMARY KEY)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS nonbypass_users (
-        guild_id INTEGER,
-        user_id INTEGER,
-        PRIMARY KEY (guild_id, user_id)
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS word_length_limits (
-            user_id INTEGER,
-            min_length INTEGER DEFAULT 0,
-            max_length INTEGER DEFAULT 0
-        )
-    ''')
-
-
-
-    conn.commit()
+    """The guild's pooled connection, for use before the caller's next await."""
+    with _server_db_lock:
+        return _pooled_server_db(guild_id).conn
+
+
+def acquire_server_db(guild_id: int) -> sqlite3.Connection:
+    """Check out the guild's connection; it stays open until release_server_db."""
+    with _server_db_lock:
+        entry = _pooled_server_db(guild_id)
+        entry.checkouts += 1
+        _server_db_checked_out[entry.conn] = entry
+        return entry.conn
+
+
+def release_server_db(conn: sqlite3.Connection, rollback: bool = False):
+    """Give back a checkout; rollback=True discards the open transaction (the holder failed)."""
+    if conn is None:
+        return
+    with _server_db_lock:
+        entry = _server_db_checked_out.get(conn)
+        if entry is None:
+            return
+        try:
+            if rollback and conn.in_transaction:
+                conn.rollback()
+        except Exception as e:
+            print(f"[shared] Failed to roll back server DB {entry.guild_id}: {e}")
+        entry.checkouts -= 1
+        if entry.checkouts > 0:
+            return
+        del _server_db_checked_out[conn]
+        if entry.retired:
+            _close_pooled(entry)
+            return
+        try:
+            if conn.in_transaction:
+                conn.commit()
+        except Exception as e:
+            print(f"[shared] Failed to commit server DB {entry.guild_id}: {e}")
+            conn.rollback()
+
+
+@contextmanager
+def checkout_server_db(guild_id: int):
+    """Check out the guild's connection for a block; its writes are rolled back if the block raises."""
+    conn = acquire_server_db(guild_id)
+    failed = False
+    try:
+        yield conn
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        release_server_db(conn, rollback=failed)
+
+
+# --- Off-loop Database Access ---
+
+_async_dbs = {}        # {database file: async_db.AsyncDB}, one worker thread per file
+_async_db_handles = {}  # {guild_id: the guild's handle on its file's worker}
+
+
+def db(guild_id: int) -> async_db.AsyncDB:
+    """Async facade for a guild DB; queries run on that file's worker thread."""
+    handle = _async_db_handles.get(guild_id)
+    if handle is None:
+        get_server_db(guild_id)  # make sure the guild's tables exist and are migrated
+        path = server_db_path(guild_id)
+        worker = _async_dbs.get(path)
+        if worker is None:
+            worker = _async_dbs[path] = async_db.AsyncDB(
+                path, name=os.path.basename(path), connect=lambda: storage.connect_worker(guild_id)
+            )
+        handle = _async_db_handles[guild_id] = storage.bind_worker(worker, guild_id)
+    return handle
+
+
+def db_executor_stats() -> dict:
+    totals = {"workers": 0, "running": 0, "queue_depth": 0, "submitted": 0,
+              "completed": 0, "failed": 0, "wait_total": 0.0, "wait_max": 0.0}
+    for handle in list(_async_dbs.values()):
+        snap = handle.snapshot()
+        totals["workers"] += 1
+        totals["running"] += int(snap["running"])
+        for key in ("queue_depth", "submitted", "completed", "failed", "wait_total"):
+            totals[key] += snap[key]
+        totals["wait_max"] = max(totals["wait_max"], snap["wait_max"])
+    totals["wait_avg"] = totals["wait_total"] / totals["completed"] if totals["completed"] else 0.0
+    return totals
+
+
+# Coalesced writes for hot rows (enforcement counters, cooldowns, line progress)
+WRITE_BEHIND_INTERVAL = 0.5  # seconds between periodic flushes
+write_behind = write_behind_mod.WriteBehind(db)
+
+
+def server_db_path(guild_id: int) -> str:
+    return storage.path(guild_id)
+
+
+def stop_db_workers(timeout: float = 5):
+    for handle in list(_async_dbs.values()):
+        handle.stop()
+    for handle in list(_async_dbs.values()):
+        handle.join(timeout)
+
+
+def close_server_db(guild_id: int):
+    """Drop a guild's pooled connection (e.g. before replacing its file).
+
+    A connection that is checked out is closed when its last holder releases
+    it; the next get_server_db opens a fresh one.
+    """
+    with _server_db_lock:
+        entry = _server_db_pool.pop(guild_id, None)
+        if entry is None:
+            return
+        if entry.checkouts:
+            entry.retired = True
+            server_db_stats["deferred_closes"] += 1
+            try:
+                entry.conn.commit()
+            except Exception as e:
+                print(f"[shared] Failed to commit server DB {guild_id}: {e}")
+            return
+    _close_pooled(entry)
+
+
+def close_all_server_dbs():
+    with _server_db_lock:
+        guild_ids = list(_server_db_pool)
+    for guild_id in guild_ids:
+        close_server_db(guild_id)
+
+
+async def restore_database(upload_path: str, guild_id: int = None) -> dict:
+    """Swap an uploaded DB into place (global.db when guild_id is None).
+
+    The current contents are archived first; returns that snapshot's manifest.
+    """
+    if guild_id is None:
+        for connection in (global_conn, conn):
+            if connection is not None:
+                connection.commit()
+        before = await snapshots.restore(upload_path, global_db_path)
+        migrations.migrate_global_db(global_conn)
+        refresh_cog_columns()
+        invalidate_server_config()
+        invalidate_cog_flags()
+        invalidate_word_normalization()
+        return before
+
+    # Pending hot rows belong to the data being replaced
+    write_behind.forget(guild_id)
+    with _server_db_lock:
+        entry = _server_db_pool.get(guild_id)
+        if entry is not None:
+            entry.conn.commit()
+    before = await asyncio.to_thread(storage.restore_guild, guild_id, upload_path)
+    close_server_db(guild_id)  # reopened (and migrated) on next use
+    # The per-message bypass checks read these mirrors, not the DB
+    load_bypass_users(guild_id)
+    return before
+
+
+def server_db_pool_stats() -> dict:
+    with _server_db_lock:
+        lookups = server_db_stats["hits"] + server_db_stats["misses"]
+        return {
+            **server_db_stats,
+            "open": len(_server_db_pool),
+            "checked_out": sum(entry.checkouts for entry in _server_db_checked_out.values()),
+            "hit_ratio": server_db_stats["hits"] / lookups if lookups else 0.0,
+        }
 
 
 # --- Command Decorator ---
@@ -307,7 +637,6 @@ def with_config(func):
             return
 
         ctx.config = get_server_config(guild_id)
-        ctx.server_db = get_server_db(guild_id)
 
         # 🔁 Override ctx.send with safe_send
         #ctx.send = lambda *a, **k: safe_send(ctx, *a, **k)
@@ -351,7 +680,9 @@ def with_config(func):
             except Exception as e:
                 print(f"[with_config log] Failed to log: {e}")
 
-        return await func(ctx, *args, **kwargs)
+        # Checked out for the whole command, so it stays open across its awaits
+        with checkout_server_db(guild_id) as ctx.server_db:
+            return await func(ctx, *args, **kwargs)
 
     return wrapper
 
@@ -368,7 +699,6 @@ def with_config_cog(func):
             return
 
         ctx.config = get_server_config(guild_id)
-        ctx.server_db = get_server_db(guild_id)
 
         # 🔁 Override ctx.send with safe_send
         #ctx.send = lambda *a, **k: safe_send(ctx, *a, **k)
@@ -413,11 +743,12 @@ def with_config_cog(func):
             except Exception as e:
                 print(f"[with_config_cog log] Failed to log: {e}")
 
-        # Delegate to original function
-        if ctx != self_or_ctx:
-            return await func(self_or_ctx, ctx, *args, **kwargs)
-        else:
-            return await func(ctx, *args, **kwargs)
+        # Delegate to original function, with the guild's DB checked out throughout
+        with checkout_server_db(guild_id) as ctx.server_db:
+            if ctx != self_or_ctx:
+                return await func(self_or_ctx, ctx, *args, **kwargs)
+            else:
+                return await func(ctx, *args, **kwargs)
 
     return wrapper
 
@@ -463,7 +794,6 @@ gagged_users = PerGuildDict(dict)              # {guild_id: {user_id: gag_type}}
 prison_users = PerGuildDict(dict)              # {guild_id: {user_id: channel_id}}
 cooldown_users = PerGuildDict(dict)
 last_message_times = PerGuildDict(dict)
-gagged_messages = PerGuildDict(dict)
 solitary_confinement = PerGuildDict(dict)
 enforced_words = PerGuildDict(lambda: {})
 enforcement_offenses = PerGuildDict(dict)
@@ -476,6 +806,95 @@ double_type_users = PerGuildDict(lambda: set())
 pending_confirm = PerGuildDict(dict)
 prefix = PerGuildDict(dict)
 word_length_limits = PerGuildDict(dict)
+allowed_users = PerGuildDict(dict)             # {guild_id: {user_id: frozenset(channel_ids)}} (bypass)
+nonbypass_users = PerGuildDict(lambda: set())  # {guild_id: {user_id}}
+
+
+def is_bypass_allowed(guild_id, user_id, channel_id) -> bool:
+    return channel_id in allowed_users.raw().get(guild_id, {}).get(user_id, ())
+
+
+def set_bypass_channel(guild_id, user_id, channel_id, allowed: bool):
+    channels = allowed_users[guild_id].get(user_id, frozenset())
+    channels = channels | {channel_id} if allowed else channels - {channel_id}
+    if channels:
+        allowed_users[guild_id][user_id] = channels
+    else:
+        allowed_users[guild_id].pop(user_id, None)
+
+
+def load_bypass_users(guild_id, conn=None):
+    """(Re)fill allowed_users and nonbypass_users for a guild from its DB (startup, after a restore)."""
+    conn = conn if conn is not None else get_server_db(guild_id)
+    allowed = {}
+    for user_id, channel_id in conn.execute("SELECT user_id, channel_id FROM allowed_users"):
+        allowed.setdefault(user_id, set()).add(channel_id)
+    allowed_users[guild_id] = {uid: frozenset(channels) for uid, channels in allowed.items()}
+    nonbypass_users[guild_id] = {
+        row[0] for row in conn.execute("SELECT user_id FROM nonbypass_users WHERE guild_id = ?", (guild_id,))
+    }
+
+
+# --- Restricted Users ---
+# A user in any of these per-guild sets needs the full on_message_or_edit path.
+# The commands that add or lift a restriction already keep the sets current in
+# memory, so the index is their union and can never drift from them.
+
+RESTRICTION_SETS = (
+    gagged_users, prison_users, enforced_words, banned_words, word_length_limits,
+    cooldown_users, double_type_users, line_writing_sessions, user_pishock_codes,
+)
+message_path_stats = {"fast": 0, "slow": 0}
+
+
+def is_restricted(guild_id, user_id) -> bool:
+    """True if user_id has any restriction in guild_id (no DB access)."""
+    for per_guild in RESTRICTION_SETS:
+        members = per_guild.raw().get(guild_id)
+        if members and user_id in members:
+            return True
+    return False
+
+
+def restricted_users(guild_id) -> set:
+    users = set()
+    for per_guild in RESTRICTION_SETS:
+        users.update(per_guild.raw().get(guild_id, ()))
+    return users
+
+
+def message_path_ratio() -> dict:
+    total = message_path_stats["fast"] + message_path_stats["slow"]
+    return {
+        **message_path_stats,
+        "fast_ratio": message_path_stats["fast"] / total if total else 0.0,
+    }
+
+
+# --- Word Matchers ---
+# One compiled automaton per (kind, guild, user) word list. enforce/unenforce/
+# ban/unban/red invalidate; the size check also catches any other edit path.
+
+WORD_LISTS = {"enforced": enforced_words, "banned": banned_words}
+_word_matchers = {}   # {(kind, guild_id, user_id): wordmatch.WordMatcher}
+word_matcher_stats = {"builds": 0, "invalidations": 0}
+
+
+def word_matcher(kind, guild_id, user_id) -> wordmatch.WordMatcher:
+    """Cached matcher for a user's list, in the guild's normalization mode."""
+    words = WORD_LISTS[kind].raw().get(guild_id, {}).get(user_id, {})
+    normalized = is_word_normalization_enabled(guild_id)
+    key = (kind, guild_id, user_id)
+    matcher = _word_matchers.get(key)
+    if matcher is None or len(matcher) != len(words) or matcher.normalized != normalized:
+        matcher = _word_matchers[key] = wordmatch.WordMatcher(words, normalized)
+        word_matcher_stats["builds"] += 1
+    return matcher
+
+
+def invalidate_word_matcher(kind, guild_id, user_id):
+    if _word_matchers.pop((kind, guild_id, user_id), None) is not None:
+        word_matcher_stats["invalidations"] += 1
 
 
 
@@ -519,23 +938,8 @@ def list_toggleable_cogs():
 
 def ensure_cog_columns_from_files():
     try:
-        cur = conn.cursor()
-        toggleable_cogs = list_toggleable_cogs()
-
-        # Get current columns
-        cur.execute("PRAGMA table_info(server_config)")
-        existing_columns = [row[1] for row in cur.fetchall()]
-
-        if "prefix" not in existing_columns:
-            cur.execute("ALTER TABLE server_config ADD COLUMN prefix TEXT DEFAULT '!'")
-            print("✅ Added column 'prefix' to server_config")
-
-        for cog in toggleable_cogs:
-            column_name = f"{cog}_enabled"
-            if column_name not in existing_columns:
-                cur.execute(f"ALTER TABLE server_config ADD COLUMN {column_name} INTEGER DEFAULT 1")
-                print(f"✅ Added column '{column_name}' for cog '{cog}'")
-
-        conn.commit()
+        for column_name in migrations.ensure_cog_columns(global_conn, list_toggleable_cogs()):
+            print(f"✅ Added column '{column_name}' to server_config")
+        refresh_cog_columns()
     except Exception as e:
         print(f"[ensure_cog_columns_from_files] Error: {e}")
@@ -0,0 +1,237 @@
+"""Online database snapshots and restores built on the SQLite backup API.
+
+Copies are taken with sqlite3.Connection.backup in page steps on a worker
+thread, so the event loop keeps running and the copy is transactionally
+consistent even while the bot writes to the WAL-mode source.
+
+Archive layout (content addressed, so unchanged databases cost nothing):
+
+    archive/objects/<sha256>.db.gz           one gzip'd copy per distinct DB
+    archive/snapshots/<stamp>_<label>.json   manifest: {name: {sha256, size}}
+
+    manifest = await snapshots.snapshot(snapshots.live_databases(), "sendfiles")
+    await asyncio.to_thread(snapshots.extract, manifest, "tmp_dir")
+    await snapshots.restore("db/upload.db", "db/servers/123.db")
+"""
+import os
+import gzip
+import json
+import time
+import shutil
+import sqlite3
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+ARCHIVE_DIR = "archive"
+OBJECTS_DIR = os.path.join(ARCHIVE_DIR, "objects")
+SNAPSHOTS_DIR = os.path.join(ARCHIVE_DIR, "snapshots")
+
+PAGES_PER_STEP = 256         # pages copied per backup step
+STEP_SLEEP = 0.005           # seconds the backup yields to writers between steps
+KEEP_SNAPSHOTS = 30          # manifests kept by prune()
+HASH_CHUNK = 1 << 20
+
+
+# --- Copies ---
+
+def backup_file(src_path: str, dest_path: str, pages: int = PAGES_PER_STEP) -> str:
+    """Consistent copy of a live database file into dest_path (overwritten)."""
+    src = sqlite3.connect(src_path, timeout=30)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            src.backup(dest, pages=pages, sleep=STEP_SLEEP)
+        finally:
+            dest.close()
+    finally:
+        src.close()
+    return dest_path
+
+
+def check_integrity(path: str):
+    """Raise ValueError unless path is a readable, intact SQLite database."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"not a SQLite database ({e})")
+    if not result or result[0] != "ok":
+        raise ValueError(f"integrity check failed: {result[0] if result else 'no result'}")
+
+
+def live_databases(db_dir: str = "db") -> dict:
+    """{archive name: path} for global.db, servers.db and every per-guild database."""
+    sources = {}
+    for filename in ("global.db", "servers.db"):
+        path = os.path.join(db_dir, filename)
+        if os.path.exists(path):
+            sources[filename] = path
+    servers_dir = os.path.join(db_dir, "servers")
+    if os.path.isdir(servers_dir):
+        for filename in sorted(os.listdir(servers_dir)):
+            if filename.endswith(".db"):
+                sources[f"servers/{filename}"] = os.path.join(servers_dir, filename)
+    return sources
+
+
+# --- Archive ---
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_path(sha: str) -> str:
+    return os.path.join(OBJECTS_DIR, f"{sha}.db.gz")
+
+
+def _store_object(path: str) -> tuple[str, bool]:
+    """Add a file to the object store; returns (sha256, newly_written)."""
+    sha = _sha256(path)
+    target = _object_path(sha)
+    if os.path.exists(target):
+        return sha, False
+    tmp = f"{target}.tmp"
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, HASH_CHUNK)
+    os.replace(tmp, target)
+    return sha, True
+
+
+def _write_manifest(manifest: dict) -> str:
+    os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+    path = os.path.join(SNAPSHOTS_DIR, f"{manifest['stamp']}_{manifest['label']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    manifest["path"] = path
+    return path
+
+
+def snapshot_sync(sources: dict, label: str = "manual") -> dict:
+    """Back up every {name: path} in sources and record one manifest for them."""
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    started = time.perf_counter()
+    label = "".join(ch for ch in label if ch.isalnum() or ch in "-_") or "manual"
+    manifest = {
+        "stamp": datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f"),
+        "label": label,
+        "files": {},
+        "errors": {},
+        "new_objects": 0,
+    }
+    with tempfile.TemporaryDirectory(dir=ARCHIVE_DIR) as tmp_dir:
+        for name, path in sources.items():
+            copy_path = os.path.join(tmp_dir, "copy.db")
+            try:
+                backup_file(path, copy_path)
+                sha, new = _store_object(copy_path)
+                manifest["files"][name] = {"sha256": sha, "size": os.path.getsize(copy_path)}
+                manifest["new_objects"] += int(new)
+            except Exception as e:
+                manifest["errors"][name] = str(e)
+                print(f"[snapshots] Failed to snapshot {path}: {e}")
+            finally:
+                if os.path.exists(copy_path):
+                    os.remove(copy_path)
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+    _write_manifest(manifest)
+    return manifest
+
+
+async def snapshot(sources: dict = None, label: str = "manual") -> dict:
+    if sources is None:
+        sources = live_databases()
+    return await asyncio.to_thread(snapshot_sync, sources, label)
+
+
+def extract(manifest: dict, dest_dir: str) -> dict:
+    """Decompress a snapshot into dest_dir; returns {name: extracted path}."""
+    paths = {}
+    for name, entry in manifest["files"].items():
+        dest = os.path.join(dest_dir, *name.split("/"))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with gzip.open(_object_path(entry["sha256"]), "rb") as src, open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst, HASH_CHUNK)
+        paths[name] = dest
+    return paths
+
+
+def list_snapshots() -> list:
+    """Manifest paths, newest first."""
+    if not os.path.isdir(SNAPSHOTS_DIR):
+        return []
+    names = [n for n in os.listdir(SNAPSHOTS_DIR) if n.endswith(".json")]
+    return [os.path.join(SNAPSHOTS_DIR, n) for n in sorted(names, reverse=True)]
+
+
+def load_manifest(path: str) -> dict:
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["path"] = path
+    return manifest
+
+
+def prune(keep: int = KEEP_SNAPSHOTS) -> int:
+    """Drop all but the newest `keep` manifests and any objects they no longer reference."""
+    manifests = list_snapshots()
+    for path in manifests[keep:]:
+        os.remove(path)
+    referenced = set()
+    for path in manifests[:keep]:
+        referenced.update(entry["sha256"] for entry in load_manifest(path)["files"].values())
+    removed = 0
+    if os.path.isdir(OBJECTS_DIR):
+        for filename in os.listdir(OBJECTS_DIR):
+            if filename.endswith(".db.gz") and filename[:-len(".db.gz")] not in referenced:
+                os.remove(os.path.join(OBJECTS_DIR, filename))
+                removed += 1
+    return removed
+
+
+# --- Restore ---
+
+def restore_sync(upload_path: str, dest_path: str, label: str = "pre-restore") -> dict:
+    """Replace dest_path's contents with upload_path after archiving the current data.
+
+    The new data is written with the backup API into the live file, so every
+    connection already open on it (WAL included) switches over in one step.
+    """
+    check_integrity(upload_path)
+    before = {}
+    if os.path.exists(dest_path):
+        name = os.path.relpath(dest_path, "db").replace(os.sep, "/")
+        before = snapshot_sync({name: dest_path}, label)
+    src = sqlite3.connect(f"file:{upload_path}?mode=ro", uri=True)
+    try:
+        dest = sqlite3.connect(dest_path, timeout=30)
+        try:
+            src.backup(dest, pages=PAGES_PER_STEP, sleep=STEP_SLEEP)
+        finally:
+            dest.close()
+    finally:
+        src.close()
+    return before
+
+
+async def restore(upload_path: str, dest_path: str, label: str = "pre-restore") -> dict:
+    return await asyncio.to_thread(restore_sync, upload_path, dest_path, label)
+
+
+def format_manifest(manifest: dict) -> str:
+    total = sum(entry["size"] for entry in manifest["files"].values())
+    line = (f"📸 Snapshot `{manifest['stamp']}` ({manifest['label']}): "
+            f"{len(manifest['files'])} DBs, {total / 1024:.0f} KiB, "
+            f"{manifest['new_objects']} new objects, {manifest['seconds']}s")
+    if manifest["errors"]:
+        line += f"\n⚠️ Failed: {', '.join(manifest['errors'])}"
+    return line
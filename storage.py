@@ -0,0 +1,522 @@
+"""Where per-guild data lives.
+
+Two interchangeable backends sit behind shared.get_server_db / shared.db:
+
+    files         db/servers/<guild_id>.db, one SQLite file per guild (default)
+    consolidated  db/servers.db, one WAL database in which every table is stored
+                  as guild_<table> with a guild_id column and guild-first
+                  composite keys and indexes
+
+Pick one with TETHERBOT_STORAGE=files|consolidated in tetherbot.env. In
+consolidated mode the original table names are views filtered on
+current_guild(), a SQL function each guild connection registers, with
+INSTEAD OF triggers that stamp guild_id on writes, so the bot's SQL runs
+unchanged on either backend.
+Generated ids stay per guild (MAX + 1). Views cannot be UPSERTed and do not
+report lastrowid, so guild SQL sticks to INSERT OR IGNORE/REPLACE + UPDATE and
+re-selects generated ids.
+
+Move data between the two with:
+
+    python storage.py migrate --to consolidated [--dry-run] [--overwrite]
+    python storage.py migrate --to files
+"""
+import os
+import sys
+import re
+import sqlite3
+import argparse
+import tempfile
+
+import migrations
+import snapshots
+
+SERVER_DB_DIR = os.path.join("db", "servers")
+CONSOLIDATED_DB_PATH = os.path.join("db", "servers.db")
+BUSY_TIMEOUT = 30
+
+PRUNE_COMMAND_LOGS = "DELETE FROM command_logs WHERE timestamp < ?"
+
+
+def _table_names(conn: sqlite3.Connection, schema: str = "main") -> list:
+    return [row[0] for row in conn.execute(
+        f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+
+
+def _copy_rows(src, dest, table: str, columns: list, select_sql: str, select_params=(), insert_prefix=()):
+    """Bulk-copy rows of `columns` from src into dest.table (optionally prefixed with fixed values)."""
+    rows = src.execute(select_sql, select_params)
+    names = [*(name for name, _ in insert_prefix), *columns]
+    placeholders = ", ".join("?" for _ in names)
+    prefix = tuple(value for _, value in insert_prefix)
+    dest.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})",
+        (prefix + tuple(row) for row in rows),
+    )
+
+
+# --- One file per guild ---
+
+class PerGuildFileStorage:
+    mode = "files"
+
+    def __init__(self, directory: str = SERVER_DB_DIR):
+        self.directory = directory
+
+    def path(self, guild_id: int) -> str:
+        return os.path.join(self.directory, f"{guild_id}.db")
+
+    def connect(self, guild_id: int, check_same_thread: bool = True) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.path(guild_id), timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrations.migrate_server_db(conn)
+        return conn
+
+    def connect_worker(self, guild_id: int) -> sqlite3.Connection:
+        """Connection for the AsyncDB worker of path(guild_id)."""
+        return self.connect(guild_id)
+
+    def bind_worker(self, worker, guild_id: int):
+        """The guild's handle on its file's AsyncDB worker; one file per guild, so the worker itself."""
+        return worker
+
+    def guild_ids(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(filename[:-3]) for filename in os.listdir(self.directory)
+            if filename.endswith(".db") and filename[:-3].isdigit()
+        )
+
+    def has_guild(self, guild_id: int) -> bool:
+        return os.path.exists(self.path(guild_id))
+
+    def migrate_all(self, dry_run: bool = False, workers: int = None) -> dict:
+        return migrations.migrate_all_servers(self.directory, dry_run=dry_run, workers=workers)
+
+    def prune_command_logs(self, cutoff) -> int:
+        deleted = 0
+        for guild_id in self.guild_ids():
+            try:
+                conn = sqlite3.connect(self.path(guild_id), timeout=BUSY_TIMEOUT)
+                try:
+                    with conn:
+                        deleted += conn.execute(PRUNE_COMMAND_LOGS, (cutoff,)).rowcount
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"[LOG CLEANUP ERROR] {guild_id}.db: {e}")
+        return deleted
+
+    def export_guild(self, guild_id: int, dest_path: str):
+        snapshots.backup_file(self.path(guild_id), dest_path)
+
+    def import_guild(self, guild_id: int, src_path: str):
+        """Replace the guild's data with a standalone per-guild DB file."""
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots.backup_file(src_path, self.path(guild_id))
+        self.connect(guild_id).close()  # bring an older upload to head
+
+    def restore_guild(self, guild_id: int, upload_path: str, label: str = "pre-restore") -> dict:
+        return snapshots.restore_sync(upload_path, self.path(guild_id), label)
+
+
+# --- One database for every guild ---
+
+BASE_PREFIX = "guild_"        # consolidated base tables are guild_<table>
+GUILD_FN = "current_guild()"  # per-connection SQL function the views filter on
+PRUNE_GUILD_COMMAND_LOGS = f"DELETE FROM {BASE_PREFIX}command_logs WHERE timestamp < ?"
+INDEX_KEY_RE = re.compile(r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+.*?\bON\s+\w+\s*\((.*)\)\s*$",
+                          re.IGNORECASE | re.DOTALL)
+CHECK_RE = re.compile(r"\bCHECK\s*\(", re.IGNORECASE)
+TABLE_CONSTRAINTS = ("PRIMARY", "UNIQUE", "CHECK", "FOREIGN", "CONSTRAINT")
+
+
+def _split_top_level(text: str) -> list:
+    """Split on commas that are not inside parentheses."""
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(text):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return parts
+
+
+def _check_clauses(definition: str) -> list:
+    """Every CHECK(...) in a column or constraint definition, parentheses balanced."""
+    clauses = []
+    for match in CHECK_RE.finditer(definition):
+        depth = 0
+        for i in range(match.end() - 1, len(definition)):
+            depth += {"(": 1, ")": -1}.get(definition[i], 0)
+            if depth == 0:
+                clauses.append(f"CHECK{definition[match.end() - 1:i + 1]}")
+                break
+    return clauses
+
+
+def table_checks(sql: str) -> tuple:
+    """({column: [CHECK(...), ...]}, [table-level CHECK(...), ...]) from a CREATE TABLE statement."""
+    columns, table = {}, []
+    body = sql[sql.index("(") + 1:sql.rindex(")")]
+    for definition in _split_top_level(body):
+        if not definition:
+            continue
+        first = definition.split(None, 1)[0]
+        if first.upper() in TABLE_CONSTRAINTS or first.upper().startswith("CHECK("):
+            table += _check_clauses(definition)
+        else:
+            clauses = _check_clauses(definition)
+            if clauses:
+                columns[first.strip('"`[]')] = clauses
+    return columns, table
+
+
+class _TableShape:
+    """Columns, keys and indexes of one server table, read from a head-version DB."""
+
+    def __init__(self, conn: sqlite3.Connection, name: str, sql: str):
+        self.name = name
+        self.base = f"{BASE_PREFIX}{name}"
+        info = conn.execute(f"PRAGMA table_info({name})").fetchall()  # cid, name, type, notnull, dflt, pk
+        self.columns = [(col[1], col[2], bool(col[3]), col[4]) for col in info]
+        self.column_names = [col[1] for col in info]
+        self.data_columns = [col for col in self.column_names if col != "guild_id"]
+        self.defaults = {col[1]: col[4] for col in info}
+        self.pk = [col[1] for col in sorted(info, key=lambda col: col[5]) if col[5]]
+        # CHECK constraints are not in table_info; copy them from the CREATE statement
+        self.column_checks, self.checks = table_checks(sql)
+        # Per-guild ids: AUTOINCREMENT keys become (guild_id, id) and are assigned MAX + 1
+        self.autoincrement = "AUTOINCREMENT" in sql.upper()
+        # (name, unique, key list SQL); CREATE INDEX keys are copied verbatim so
+        # expression and DESC keys such as LOWER(command) survive
+        self.indexes = []
+        for _, index_name, unique, origin, _ in conn.execute(f"PRAGMA index_list({name})"):
+            if origin == "pk":
+                continue
+            index_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (index_name,)).fetchone()[0]
+            match = INDEX_KEY_RE.match(index_sql or "")
+            if match:
+                key = match.group(1).strip()
+            else:  # UNIQUE constraint, no CREATE statement to copy
+                key = ", ".join(row[2] for row in conn.execute(f"PRAGMA index_info({index_name})"))
+            self.indexes.append((f"{BASE_PREFIX}{index_name}", bool(unique), key))
+
+    @property
+    def key_columns(self) -> list:
+        """Columns that identify one row of a guild (every data column when there is no key)."""
+        return [col for col in self.pk if col != "guild_id"] or self.data_columns
+
+    def column_decl(self, name: str) -> str:
+        _, decl_type, notnull, default = next(col for col in self.columns if col[0] == name)
+        decl = decl_type
+        if notnull:
+            decl += " NOT NULL"
+        if default is not None:
+            decl += f" DEFAULT {default}"
+        for check in self.column_checks.get(name, ()):
+            decl += f" {check}"
+        return decl
+
+    def create_sql(self) -> list:
+        columns = [] if "guild_id" in self.column_names else ["guild_id INTEGER NOT NULL"]
+        columns += [f"{name} {self.column_decl(name)}".rstrip() for name in self.column_names]
+        if self.pk:
+            columns.append(f"PRIMARY KEY ({', '.join(['guild_id'] + self.key_columns)})")
+        columns += self.checks
+
+        statements = [f"CREATE TABLE IF NOT EXISTS {self.base} ({', '.join(columns)})"]
+        if not self.pk:
+            statements.append(f"CREATE INDEX IF NOT EXISTS {self.base}_guild ON {self.base} (guild_id)")
+        for index_name, unique, index_key in self.indexes:
+            key = index_key if index_key.startswith("guild_id") else f"guild_id, {index_key}"
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            statements.append(f"CREATE {kind} IF NOT EXISTS {index_name} ON {self.base} ({key})")
+        return statements
+
+    def view_sql(self) -> list:
+        """The guild view over the base table plus its INSTEAD OF triggers."""
+        table, base = self.name, self.base
+
+        values = [GUILD_FN]
+        for col in self.data_columns:
+            default = self.defaults[col]
+            if self.autoincrement and self.pk == [col]:
+                values.append(
+                    f"COALESCE(NEW.{col}, (SELECT IFNULL(MAX({col}), 0) + 1 FROM {base} WHERE guild_id = {GUILD_FN}))"
+                )
+            elif default is not None:
+                values.append(f"COALESCE(NEW.{col}, {default})")
+            else:
+                values.append(f"NEW.{col}")
+        match = " AND ".join(f"{col} IS OLD.{col}" for col in self.key_columns)
+        assignments = ", ".join(f"{col} = NEW.{col}" for col in self.data_columns)
+
+        return [
+            f"DROP VIEW IF EXISTS {table}",
+            f"CREATE VIEW {table} AS SELECT {', '.join(self.column_names)} FROM {base} "
+            f"WHERE guild_id = {GUILD_FN}",
+            f"CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table} BEGIN "
+            f"INSERT INTO {base} (guild_id, {', '.join(self.data_columns)}) VALUES ({', '.join(values)}); END",
+            f"CREATE TRIGGER {table}_update INSTEAD OF UPDATE ON {table} BEGIN "
+            f"UPDATE {base} SET {assignments} WHERE guild_id = {GUILD_FN} AND {match}; END",
+            f"CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table} BEGIN "
+            f"DELETE FROM {base} WHERE guild_id = {GUILD_FN} AND {match}; END",
+        ]
+
+
+_shapes = None
+
+
+def server_table_shapes() -> dict:
+    """{table: _TableShape} for the server schema at the current migration head."""
+    global _shapes
+    if _shapes is None:
+        reference = sqlite3.connect(":memory:")
+        try:
+            migrations.migrate_server_db(reference)
+            _shapes = {
+                name: _TableShape(reference, name, sql)
+                for name, sql in reference.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )
+            }
+        finally:
+            reference.close()
+    return _shapes
+
+
+class _WorkerConnection(sqlite3.Connection):
+    """The consolidated file's AsyncDB worker connection, shared by every guild's jobs."""
+    guild_id = None  # current_guild() for the job being run; set by bind_worker()
+
+
+class ConsolidatedStorage:
+    mode = "consolidated"
+
+    def __init__(self, path: str = CONSOLIDATED_DB_PATH):
+        self.file = path
+        self._schema_ready = False
+        self._known_guilds = set()
+
+    def path(self, guild_id: int = None) -> str:
+        return self.file
+
+    def _open(self, check_same_thread: bool = True, factory=sqlite3.Connection) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.file, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread, factory=factory)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if not self._schema_ready:
+            self.ensure_schema(conn)
+        return conn
+
+    def ensure_schema(self, conn: sqlite3.Connection, dry_run: bool = False) -> list:
+        """Create/extend the guild_* tables to match the server migration head."""
+        head = migrations.head_version(migrations.SERVER_MIGRATIONS)
+        if migrations.get_version(conn) >= head:
+            self._schema_ready = True
+            return []
+        if dry_run:
+            return [(head, "consolidated schema")]
+
+        conn.execute("BEGIN")
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS storage_guilds (guild_id INTEGER PRIMARY KEY)")
+            existing = set(_table_names(conn))
+            for shape in server_table_shapes().values():
+                if shape.base in existing:
+                    for col in shape.column_names:
+                        migrations.add_column(conn, shape.base, col, shape.column_decl(col))
+                for statement in shape.create_sql() + shape.view_sql():
+                    conn.execute(statement)
+            # prune_command_logs() deletes across every guild at once
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {BASE_PREFIX}command_logs_timestamp "
+                         f"ON {BASE_PREFIX}command_logs (timestamp)")
+            conn.execute(f"PRAGMA user_version = {head}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self._schema_ready = True
+        return [(head, "consolidated schema")]
+
+    def connect(self, guild_id: int, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = self._open(check_same_thread)
+        guild_id = int(guild_id)
+        conn.create_function("current_guild", 0, lambda: guild_id, deterministic=True)
+        if guild_id not in self._known_guilds:
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO storage_guilds (guild_id) VALUES (?)", (guild_id,))
+            self._known_guilds.add(guild_id)
+        return conn
+
+    def connect_worker(self, guild_id: int = None) -> sqlite3.Connection:
+        """The single AsyncDB worker connection for the whole file; bind_worker() picks each job's guild."""
+        conn = self._open(factory=_WorkerConnection)
+        # Not deterministic: the value changes between jobs on the same connection
+        conn.create_function("current_guild", 0, lambda: conn.guild_id)
+        return conn
+
+    def bind_worker(self, worker, guild_id: int):
+        """The guild's handle on the file's one AsyncDB worker: every job selects the guild first."""
+        guild_id = int(guild_id)
+
+        def use_guild(conn):
+            conn.guild_id = guild_id
+        return worker.bind(use_guild)
+
+    def guild_ids(self) -> list:
+        if not os.path.exists(self.file):
+            return []
+        conn = self._open()
+        try:
+            return [row[0] for row in conn.execute("SELECT guild_id FROM storage_guilds ORDER BY guild_id")]
+        finally:
+            conn.close()
+
+    def has_guild(self, guild_id: int) -> bool:
+        return guild_id in self.guild_ids()
+
+    def migrate_all(self, dry_run: bool = False, workers: int = None) -> dict:
+        report = {"head": migrations.head_version(migrations.SERVER_MIGRATIONS),
+                  "checked": 0, "migrated": {}, "errors": {}}
+        try:
+            conn = sqlite3.connect(self.file, timeout=BUSY_TIMEOUT)
+            try:
+                applied = self.ensure_schema(conn, dry_run=dry_run)
+                report["checked"] = 1
+                if applied:
+                    report["migrated"][self.file] = applied
+            finally:
+                conn.close()
+        except Exception as e:
+            report["errors"][self.file] = str(e)
+        return report
+
+    def prune_command_logs(self, cutoff) -> int:
+        conn = self._open()
+        try:
+            with conn:
+                return conn.execute(PRUNE_GUILD_COMMAND_LOGS, (cutoff,)).rowcount
+        finally:
+            conn.close()
+
+    def export_guild(self, guild_id: int, dest_path: str):
+        """Write one guild's rows out as a standalone per-guild DB file."""
+        shapes = server_table_shapes()
+        src = self._open()
+        dest = sqlite3.connect(dest_path)
+        try:
+            migrations.migrate_server_db(dest)
+            with dest:
+                for table in _table_names(dest):
+                    if table not in shapes:
+                        continue
+                    columns = migrations.table_columns(dest, table)
+                    dest.execute(f"DELETE FROM {table}")
+                    _copy_rows(src, dest, table, columns,
+                               f"SELECT {', '.join(columns)} FROM {shapes[table].base} WHERE guild_id = ?",
+                               (guild_id,))
+        finally:
+            dest.close()
+            src.close()
+
+    def import_guild(self, guild_id: int, src_path: str):
+        """Replace the guild's rows with the contents of a standalone per-guild DB file."""
+        shapes = server_table_shapes()
+        src = sqlite3.connect(src_path, timeout=BUSY_TIMEOUT)
+        dest = self._open()
+        try:
+            migrations.migrate_server_db(src)
+            with dest:
+                dest.execute("INSERT OR IGNORE INTO storage_guilds (guild_id) VALUES (?)", (guild_id,))
+                for shape in shapes.values():
+                    dest.execute(f"DELETE FROM {shape.base} WHERE guild_id = ?", (guild_id,))
+                for table in _table_names(src):
+                    if table not in shapes:
+                        continue
+                    columns = [col for col in migrations.table_columns(src, table) if col != "guild_id"]
+                    _copy_rows(src, dest, shapes[table].base, columns,
+                               f"SELECT {', '.join(columns)} FROM {table}",
+                               insert_prefix=(("guild_id", guild_id),))
+        finally:
+            dest.close()
+            src.close()
+
+    def restore_guild(self, guild_id: int, upload_path: str, label: str = "pre-restore") -> dict:
+        snapshots.check_integrity(upload_path)
+        before = snapshots.snapshot_sync({os.path.basename(self.file): self.file}, label)
+        self.import_guild(guild_id, upload_path)
+        return before
+
+
+BACKENDS = {
+    PerGuildFileStorage.mode: PerGuildFileStorage,
+    ConsolidatedStorage.mode: ConsolidatedStorage,
+}
+
+
+def from_env():
+    mode = os.getenv("TETHERBOT_STORAGE", PerGuildFileStorage.mode).strip().lower()
+    if mode not in BACKENDS:
+        print(f"[storage] Unknown TETHERBOT_STORAGE '{mode}', using per-guild files")
+        mode = PerGuildFileStorage.mode
+    return BACKENDS[mode]()
+
+
+# --- Migration between backends ---
+
+def copy_guilds(source, target, dry_run: bool = False, overwrite: bool = False) -> dict:
+    """Copy every guild from one backend into the other. Source data is left untouched."""
+    report = {"copied": [], "skipped": [], "errors": {}}
+    existing = set(target.guild_ids())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for guild_id in source.guild_ids():
+            if guild_id in existing and not overwrite:
+                report["skipped"].append(guild_id)
+                continue
+            if dry_run:
+                report["copied"].append(guild_id)
+                continue
+            staged = os.path.join(tmp_dir, f"{guild_id}.db")
+            try:
+                source.export_guild(guild_id, staged)
+                target.import_guild(guild_id, staged)
+                report["copied"].append(guild_id)
+            except Exception as e:
+                report["errors"][guild_id] = str(e)
+            finally:
+                if os.path.exists(staged):
+                    os.remove(staged)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move TetherBot guild data between storage backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="Copy every guild into the other backend")
+    migrate_parser.add_argument("--to", choices=sorted(BACKENDS), required=True)
+    migrate_parser.add_argument("--dry-run", action="store_true", help="List guilds without copying")
+    migrate_parser.add_argument("--overwrite", action="store_true", help="Replace guilds the target already has")
+    args = parser.parse_args()
+
+    target = BACKENDS[args.to]()
+    source = next(backend() for mode, backend in BACKENDS.items() if mode != args.to)
+    report = copy_guilds(source, target, dry_run=args.dry_run, overwrite=args.overwrite)
+
+    verb = "would copy" if args.dry_run else "copied"
+    print(f"🗄️ {source.mode} → {target.mode}: {verb} {len(report['copied'])}, "
+          f"skipped {len(report['skipped'])} (already present), {len(report['errors'])} error(s)")
+    for guild_id, error in sorted(report["errors"].items()):
+        print(f"  ❌ {guild_id}: {error}")
+    if not args.dry_run and report["copied"]:
+        print(f"Set TETHERBOT_STORAGE={target.mode} in tetherbot.env to switch; "
+              f"the {source.mode} data was left in place.")
+    sys.exit(1 if report["errors"] else 0)
@@ -0,0 +1,90 @@
+"""Per-channel cache of the bot's own webhook (gag echoes, sayas).
+
+Resolving the webhook used to cost a channel.webhooks() round trip (plus a
+create_webhook the first time) on every gagged message and every reaction.
+WebhookRegistry resolves it once per channel and keeps the discord.Webhook,
+token included. Concurrent lookups for a channel share one resolution, so a
+burst of messages in a new channel creates one webhook, not several.
+
+The cache entry is dropped on on_webhooks_update for the channel and when a
+send answers 404 (webhook deleted); the next lookup resolves it again.
+
+    hook = await registry.get(parent_channel)
+    hook, msg = await registry.send(parent_channel, content="mmph", username=..., wait=True)
+
+Keys are the channel that owns the webhook: a thread's parent channel.
+"""
+import asyncio
+
+import discord
+
+
+class WebhookRegistry:
+    def __init__(self, name: str = "GagWebhook"):
+        self.name = name
+        self._hooks = {}    # {channel_id: discord.Webhook}
+        self._pending = {}  # {channel_id: asyncio.Task} resolutions in flight
+        self.stats = {"hits": 0, "resolved": 0, "created": 0, "shared": 0, "invalidated": 0}
+
+    def __len__(self):
+        return len(self._hooks)
+
+    def cached(self, channel_id):
+        return self._hooks.get(channel_id)
+
+    def invalidate(self, channel_id):
+        if self._hooks.pop(channel_id, None) is not None:
+            self.stats["invalidated"] += 1
+
+    async def get(self, channel) -> discord.Webhook:
+        """The bot's webhook on `channel`, creating it if there is none."""
+        hook = self._hooks.get(channel.id)
+        if hook is not None:
+            self.stats["hits"] += 1
+            return hook
+        task = self._pending.get(channel.id)
+        if task is None:
+            task = self._pending[channel.id] = asyncio.get_running_loop().create_task(self._resolve(channel))
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    async def _resolve(self, channel) -> discord.Webhook:
+        try:
+            me = channel.guild.me
+            hooks = [w for w in await channel.webhooks() if w.user and w.user.id == me.id]
+            # Prefer the named one; any bot-owned webhook (older setups) still works
+            hook = next((w for w in hooks if w.name == self.name), None) or next(iter(hooks), None)
+            if hook is None:
+                hook = await channel.create_webhook(name=self.name)
+                self.stats["created"] += 1
+            self.stats["resolved"] += 1
+            self._hooks[channel.id] = hook
+            return hook
+        finally:
+            self._pending.pop(channel.id, None)
+
+    async def find(self, channel, webhook_id):
+        """The webhook with this id on `channel` (for editing messages it sent), or None."""
+        hook = await self.get(channel)
+        if hook.id == webhook_id:
+            return hook
+        # Sent through a webhook that has since been replaced
+        return next((w for w in await channel.webhooks() if w.id == webhook_id), None)
+
+    async def send(self, channel, **kwargs):
+        """(webhook, webhook.send result) on `channel`'s webhook, re-resolving once if it was deleted."""
+        hook = await self.get(channel)
+        try:
+            return hook, await hook.send(**kwargs)
+        except discord.NotFound:
+            self.invalidate(channel.id)
+            hook = await self.get(channel)
+            return hook, await hook.send(**kwargs)
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (
+            f"🪝 **Webhooks:** {len(self._hooks)} cached | hits `{s['hits']}` resolved `{s['resolved']}` "
+            f"created `{s['created']}` shared lookups `{s['shared']}` invalidated `{s['invalidated']}`"
+        )
@@ -0,0 +1,137 @@
+"""Multi-word substring matching for enforced and banned words.
+
+WordMatcher compiles a word list into an Aho–Corasick automaton once, then
+reports every word that occurs anywhere in a message in a single pass over
+the text, independent of how many words are on the list. Matching has the
+same meaning as the `word in content` checks it replaces (plain substrings).
+Short lists skip the automaton: below AUTOMATON_MIN_WORDS the per-word C-level
+substring scan is faster than walking the text in Python.
+
+    matcher = WordMatcher(["please", "sir"])
+    matcher.find("yes sir, please")   # {"please", "sir"}
+
+Normalized mode (opt-in per guild) folds case, strips zero-width characters
+and accents, and maps homoglyphs and leetspeak to plain letters, on both the
+word list (once, when the matcher is built) and the message (one
+str.translate call), so "Pl3аse" with a Cyrillic "а" still matches "please".
+
+    matcher = WordMatcher(["please"], normalized=True)
+    matcher.find(normalize("Pl3\u0430se"))   # {"please"}
+"""
+import unicodedata
+
+AUTOMATON_MIN_WORDS = 128
+
+
+# --- Normalization ---
+
+ZERO_WIDTH = "\u00ad\u034f\u061c\u115f\u1160\u17b4\u17b5\u180e\u200b\u200c\u200d\u200e\u200f\u2060\u2061\u2062\u2063\u2064\ufeff"
+LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s", "|": "l", "!": "i"}
+# Letters that render like Latin ones (lowercase; input is lowercased first)
+CONFUSABLES = {
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p", "с": "c",
+    "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "i", "ї": "i", "ј": "j", "ԁ": "d", "ԛ": "q", "ԝ": "w",
+    # Greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ω": "w",
+    # Latin look-alikes
+    "ı": "i", "ł": "l", "ø": "o", "đ": "d", "ß": "ss", "æ": "ae", "œ": "oe",
+}
+
+
+def _build_table() -> dict:
+    table = {ord(ch): None for ch in ZERO_WIDTH}
+    # Accented Latin letters -> base letter
+    for cp in range(0x00C0, 0x0250):
+        base = unicodedata.normalize("NFKD", chr(cp))[:1].lower()
+        if base.isascii() and base.isalpha():
+            table[cp] = base
+    # Fullwidth ASCII (ａ, Ｚ, ０) -> ASCII
+    for cp in range(0xFF01, 0xFF5F):
+        table[cp] = chr(cp - 0xFEE0).lower()
+    for ch, plain in {**CONFUSABLES, **LEET}.items():
+        table[ord(ch)] = plain
+    # Leetspeak also applies to the fullwidth digits and symbols mapped above
+    for cp, plain in list(table.items()):
+        if plain in LEET:
+            table[cp] = LEET[plain]
+    # Combining marks left over from decomposed input
+    for cp in range(0x0300, 0x0370):
+        table[cp] = None
+    return table
+
+
+NORMALIZE_TABLE = _build_table()
+
+
+def normalize(text: str) -> str:
+    """Case-folded, zero-width-free, homoglyph- and leetspeak-mapped text."""
+    return text.lower().translate(NORMALIZE_TABLE)
+
+
+# --- Matching ---
+
+
+class WordMatcher:
+    """Finds listed words in text; find() returns the words as listed.
+
+    With normalized=True the words are matched in normalize()d form, and
+    find() expects normalize()d text.
+    """
+    __slots__ = ("words", "normalized", "_pairs", "_goto", "_fail", "_out")
+
+    def __init__(self, words, normalized: bool = False):
+        self.words = frozenset(w for w in words if w)
+        self.normalized = normalized
+        # (form matched against the text, word as listed)
+        self._pairs = tuple((normalize(w) if normalized else w, w) for w in self.words)
+        self._pairs = tuple(pair for pair in self._pairs if pair[0])
+        self._goto = [{}]    # state -> {char: state}
+        self._fail = [0]     # state -> longest proper suffix state
+        self._out = [()]     # state -> words ending here (including via fail links)
+        if len(self.words) < AUTOMATON_MIN_WORDS:
+            return
+
+        for key, word in self._pairs:
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (word,)
+
+        # Breadth-first so every fail target is finished before it is used
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self.words)
+
+    def find(self, text: str) -> set:
+        """Every listed word that occurs in text."""
+        if len(self.words) < AUTOMATON_MIN_WORDS:
+            return {word for key, word in self._pairs if key in text}
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
@@ -0,0 +1,109 @@
+"""Write-behind buffer for hot per-guild rows.
+
+For these rows the shared.* dicts are authoritative at runtime, so the DB only
+needs the latest value. Callers mark a row dirty together with the statement
+that persists it; a later mark of the same row replaces the earlier one. Each
+guild's dirty rows are flushed in one transaction on the periodic flush, or as
+soon as MAX_DIRTY_ROWS pile up for that guild.
+
+Keys are tuples that start with (table, user_id, ...) so forget() can drop
+pending rows before a direct DELETE/replace of the same data.
+"""
+import asyncio
+
+MAX_DIRTY_ROWS = 200
+
+
+class WriteBehind:
+    def __init__(self, get_db, max_rows: int = MAX_DIRTY_ROWS):
+        self._get_db = get_db          # guild_id -> async_db.AsyncDB
+        self._max_rows = max_rows
+        self._dirty = {}               # {guild_id: {key: (sql, params)}}
+        self._scheduled = set()        # guilds with an early flush queued
+        self.stats = {"marked": 0, "coalesced": 0, "flushes": 0, "flushed_rows": 0, "failed": 0}
+
+    def mark(self, guild_id: int, key: tuple, sql: str, params: tuple):
+        rows = self._dirty.setdefault(guild_id, {})
+        if key in rows:
+            self.stats["coalesced"] += 1
+        rows[key] = (sql, params)
+        self.stats["marked"] += 1
+
+        if len(rows) >= self._max_rows and guild_id not in self._scheduled:
+            self._scheduled.add(guild_id)
+            asyncio.get_running_loop().create_task(self.flush(guild_id))
+
+    def forget(self, guild_id: int, table: str = None, user_id: int = None):
+        """Drop pending rows for a table (and user), or for the whole guild if table is None."""
+        rows = self._dirty.get(guild_id)
+        if not rows:
+            return
+        if table is None:
+            del self._dirty[guild_id]
+            return
+        for key in [k for k in rows if k[0] == table and (user_id is None or k[1] == user_id)]:
+            del rows[key]
+
+    def pending(self, guild_id: int = None) -> int:
+        if guild_id is not None:
+            return len(self._dirty.get(guild_id, {}))
+        return sum(len(rows) for rows in self._dirty.values())
+
+    @staticmethod
+    def _group(rows: dict) -> dict:
+        grouped = {}
+        for sql, params in rows.values():
+            grouped.setdefault(sql, []).append(params)
+        return grouped
+
+    async def flush(self, guild_id: int) -> int:
+        self._scheduled.discard(guild_id)
+        rows = self._dirty.pop(guild_id, None)
+        if not rows:
+            return 0
+        grouped = self._group(rows)
+
+        def apply(conn):
+            for sql, seq_of_params in grouped.items():
+                conn.executemany(sql, seq_of_params)
+
+        try:
+            await self._get_db(guild_id).run_in_transaction(apply)
+        except Exception as e:
+            # Keep the rows, but never overwrite values marked since the flush started
+            pending = self._dirty.setdefault(guild_id, {})
+            for key, value in rows.items():
+                pending.setdefault(key, value)
+            self.stats["failed"] += 1
+            print(f"[write_behind] Flush failed for guild {guild_id}: {e}")
+            return 0
+
+        self.stats["flushes"] += 1
+        self.stats["flushed_rows"] += len(rows)
+        return len(rows)
+
+    async def flush_all(self) -> int:
+        total = 0
+        for guild_id in list(self._dirty):
+            total += await self.flush(guild_id)
+        return total
+
+    def flush_all_sync(self, connect_for) -> int:
+        """Flush without an event loop (process exit). connect_for(guild_id) -> new connection."""
+        total = 0
+        for guild_id in list(self._dirty):
+            rows = self._dirty.pop(guild_id)
+            if not rows:
+                continue
+            try:
+                conn = connect_for(guild_id)
+                try:
+                    with conn:
+                        for sql, seq_of_params in self._group(rows).items():
+                            conn.executemany(sql, seq_of_params)
+                finally:
+                    conn.close()
+                total += len(rows)
+            except Exception as e:
+                print(f"[write_behind] Final flush failed for guild {guild_id}: {e}")
+        return total